@@ -0,0 +1,102 @@
+"""So sánh AnnotationRenderer (layout cache + blend theo ROI) với annotate cũ
+(copy + addWeighted toàn frame mỗi bước).
+
+    python -m benchmarks.bench_annotation --spots 50 300 --frames 30
+"""
+import argparse
+import time
+
+import numpy as np
+
+from benchmarks.synthetic import make_polygons
+from src.utils.draw_utils import (
+    AnnotationRenderer,
+    draw_hud_bar,
+    draw_spot_borders_and_badges,
+    draw_spot_fills,
+)
+
+RESOLUTIONS = {'720p': (1280, 720), '1080p': (1920, 1080), '4K': (3840, 2160)}
+_STATUSES = ('occupied', 'free', 'unknown')
+
+
+def make_spots(spots: int, size, seed: int = 0):
+    # Shared synthetic lot, fitted under the HUD; spots are shrunk a little so
+    # neighbours do not overlap, as in a real lot.
+    w, h = size
+    polygons = make_polygons(spots, (w, h - 60), seed)
+    rng = np.random.default_rng(seed)
+    spots = []
+    for p in polygons:
+        points = np.asarray(p['points']) * 0.95 + [0, 60]
+        center = points.mean(axis=0)
+        spots.append({
+            'id': p['id'],
+            'polygon': (center + (points - center) * 0.9).round(1).tolist(),
+            'status': _STATUSES[rng.integers(len(_STATUSES))],
+        })
+    return spots
+
+
+def make_summary(spots):
+    occupied = sum(s['status'] == 'occupied' for s in spots)
+    free = sum(s['status'] == 'free' for s in spots)
+    return {
+        'total_spots': len(spots),
+        'occupied_count': occupied,
+        'free_count': free,
+        'unknown_count': len(spots) - occupied - free,
+        'occupancy_rate': occupied / max(len(spots), 1) * 100,
+    }
+
+
+def legacy_annotate(frame, spots, summary):
+    draw_spot_fills(frame, spots)
+    draw_spot_borders_and_badges(frame, spots)
+    draw_hud_bar(frame, summary)
+    return frame
+
+
+def _time_per_frame(fn, frames, spots, summary) -> float:
+    # Frame copies are made up front so only the annotation is timed.
+    work = [f.copy() for f in frames]
+    started = time.perf_counter()
+    for frame in work:
+        fn(frame, spots, summary)
+    return (time.perf_counter() - started) / len(work) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--spots', type=int, nargs='+', default=[50, 300])
+    parser.add_argument('--resolutions', nargs='+', default=list(RESOLUTIONS), choices=list(RESOLUTIONS))
+    parser.add_argument('--frames', type=int, default=30)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    print(f"{'res':>6} {'spots':>6} {'legacy ms':>10} {'cached ms':>10} {'speedup':>8} {'max diff':>9}")
+    for name in args.resolutions:
+        w, h = RESOLUTIONS[name]
+        frames = [rng.integers(0, 255, size=(h, w, 3), dtype=np.uint8) for _ in range(4)]
+        frames = (frames * (args.frames // len(frames) + 1))[:args.frames]
+        for n in args.spots:
+            spots = make_spots(n, (w, h))
+            summary = make_summary(spots)
+            renderer = AnnotationRenderer()
+
+            expected = legacy_annotate(frames[0].copy(), spots, summary)
+            got = renderer.render(frames[0].copy(), spots, summary)
+            # Borders/badges are drawn grouped by status, so only overlapping
+            # spots could differ from the old output.
+            max_diff = int(np.abs(expected.astype(np.int16) - got).max())
+
+            legacy_ms = _time_per_frame(legacy_annotate, frames, spots, summary)
+            cached_ms = _time_per_frame(renderer.render, frames, spots, summary)
+            print(
+                f"{name:>6} {n:>6} {legacy_ms:>10.2f} {cached_ms:>10.2f} "
+                f"{legacy_ms / cached_ms:>7.1f}x {max_diff:>9}"
+            )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,156 @@
+"""So sánh backend ONNX Runtime / OpenVINO với PyTorch: độ khớp kết quả và throughput.
+
+    python -m benchmarks.bench_backends --video parking.mp4 --polygons data/polygons/area_1.json
+    python -m benchmarks.bench_backends --backends onnx openvino --batch 1 8
+    python -m benchmarks.bench_backends --precisions fp32 int8_static fp16
+"""
+import argparse
+import time
+
+import cv2
+import numpy as np
+
+from src.domain.backends import load_backend
+from src.domain.parking_detector import ParkingDetector
+from src.domain.quantization import PRECISIONS
+from src.utils.configs import GENERAL_CONFIDENCE_THRESHOLD, IMAGE_SIZE, IOU_THRESHOLD, MODEL_PATH
+from src.utils.polygon_utils import load_polygons
+
+
+def read_frames(video: str, count: int, size=(1280, 720)):
+    if not video:
+        rng = np.random.default_rng(0)
+        return [rng.integers(0, 255, size=(size[1], size[0], 3), dtype=np.uint8) for _ in range(count)]
+    cap = cv2.VideoCapture(video)
+    total = int(cap.get(cv2.CAP_PROP_FRAME_COUNT) or 0)
+    step = max(1, total // count) if total else 1
+    frames = []
+    index = 0
+    while len(frames) < count:
+        ok, frame = cap.read()
+        if not ok:
+            break
+        if index % step == 0:
+            frames.append(frame)
+        index += 1
+    cap.release()
+    return frames
+
+
+def _iou(box, boxes):
+    x1 = np.maximum(box[0], boxes[:, 0])
+    y1 = np.maximum(box[1], boxes[:, 1])
+    x2 = np.minimum(box[2], boxes[:, 2])
+    y2 = np.minimum(box[3], boxes[:, 3])
+    inter = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+    area = (box[2] - box[0]) * (box[3] - box[1])
+    areas = (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+    return inter / np.maximum(area + areas - inter, 1e-9)
+
+
+def match_detections(reference: np.ndarray, candidate: np.ndarray, iou: float = 0.5):
+    # Greedy same-class IoU matching; returns (matched, |conf diff| of matches).
+    used = np.zeros(len(candidate), bool)
+    diffs = []
+    for row in reference[np.argsort(-reference[:, 4])]:
+        mask = (candidate[:, 5] == row[5]) & ~used
+        if not mask.any():
+            continue
+        ious = np.where(mask, _iou(row, candidate), 0)
+        best = int(ious.argmax())
+        if ious[best] >= iou:
+            used[best] = True
+            diffs.append(abs(float(row[4] - candidate[best, 4])))
+    return len(diffs), diffs
+
+
+def parity(reference, backend, frames, imgsz, conf, iou):
+    ref_total = cand_total = matched = 0
+    diffs = []
+    for frame in frames:
+        ref = reference.predict(frame, imgsz, conf, iou)[0].data
+        cand = backend.predict(frame, imgsz, conf, iou)[0].data
+        n, d = match_detections(ref, cand)
+        ref_total += len(ref)
+        cand_total += len(cand)
+        matched += n
+        diffs += d
+    return {
+        'recall': matched / ref_total if ref_total else 1.0,
+        'precision': matched / cand_total if cand_total else 1.0,
+        'conf_diff': max(diffs) if diffs else 0.0,
+        'detections': ref_total,
+    }
+
+
+def spot_agreement(model_path, backend, polygons, frames, conf):
+    reference = ParkingDetector(polygons, model_path=model_path, general_confidence=conf, backend='torch',
+                                precision='fp32')
+    candidate = ParkingDetector(polygons, model_path=model_path, general_confidence=conf, model=backend)
+    agree = total = 0
+    for frame in frames:
+        a = reference.detect(frame)['spots']
+        b = candidate.detect(frame)['spots']
+        agree += sum(x['status'] == y['status'] for x, y in zip(a, b))
+        total += len(a)
+    return agree / total if total else 1.0
+
+
+def throughput(backend, frames, batch, imgsz, conf, iou, warmup: int = 2) -> float:
+    batches = [frames[i:i + batch] for i in range(0, len(frames) - batch + 1, batch)] or [frames]
+    for chunk in batches[:warmup]:
+        backend.predict(chunk, imgsz, conf, iou)
+    started = time.perf_counter()
+    for chunk in batches:
+        backend.predict(chunk, imgsz, conf, iou)
+    return sum(len(c) for c in batches) / (time.perf_counter() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--model', default=MODEL_PATH)
+    parser.add_argument('--video', default=None, help='Video lấy frame mẫu (mặc định: ảnh ngẫu nhiên)')
+    parser.add_argument('--polygons', default=None, help='File polygon để so trạng thái từng ô')
+    parser.add_argument('--frames', type=int, default=32)
+    parser.add_argument('--backends', nargs='+', default=['onnx'], choices=['onnx', 'openvino'])
+    parser.add_argument('--precisions', nargs='+', default=['fp32'], choices=list(PRECISIONS))
+    parser.add_argument('--batch', type=int, nargs='+', default=[1, 8])
+    parser.add_argument('--imgsz', type=int, default=IMAGE_SIZE)
+    parser.add_argument('--conf', type=float, default=GENERAL_CONFIDENCE_THRESHOLD)
+    parser.add_argument('--device', default='cpu')
+    args = parser.parse_args()
+
+    frames = read_frames(args.video, args.frames)
+    polygons = load_polygons(args.polygons) if args.polygons else None
+    reference = load_backend(args.model, args.device, 'torch', 'fp32')
+    backends = {'torch': reference}
+    for name in args.backends:
+        for precision in args.precisions:
+            # Variants that fail the accuracy gate come back as fp32.
+            backend = load_backend(args.model, args.device, name, precision)
+            if backend.name != name or backend.precision != precision:
+                print(f"{name}/{precision}: không khả dụng hoặc bị gate từ chối, bỏ qua")
+                continue
+            backends[f"{name}/{precision}" if precision != 'fp32' else name] = backend
+
+    print(f"{len(frames)} frames {frames[0].shape[1]}x{frames[0].shape[0]}, imgsz={args.imgsz}, conf={args.conf}")
+    for name, backend in backends.items():
+        if name == 'torch':
+            continue
+        p = parity(reference, backend, frames, args.imgsz, args.conf, IOU_THRESHOLD)
+        line = (
+            f"{name:>20} parity: recall={p['recall']:.3f} precision={p['precision']:.3f} "
+            f"max|Δconf|={p['conf_diff']:.4f} ({p['detections']} torch detections)"
+        )
+        if polygons:
+            line += f" spot agreement={spot_agreement(args.model, backend, polygons, frames, args.conf):.3f}"
+        print(line)
+
+    print(f"{'backend':>20} " + " ".join(f"{'b=' + str(b) + ' img/s':>12}" for b in args.batch))
+    for name, backend in backends.items():
+        rates = [throughput(backend, frames, b, args.imgsz, args.conf, IOU_THRESHOLD) for b in args.batch]
+        print(f"{name:>20} " + " ".join(f"{r:>12.1f}" for r in rates))
+
+
+if __name__ == '__main__':
+    main()
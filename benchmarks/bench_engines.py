@@ -0,0 +1,155 @@
+"""So sánh throughput hai engine: detector (YOLO toàn frame + tâm box trong polygon) và classifier
+(warp từng ô về crop cố định, phân loại cả batch một lần) trên bãi xe giả lập.
+
+Mặc định dùng model giả lập (benchmarks.stub_model) cho cả hai engine: khi đó chỉ so được phần
+việc quanh model (warp crop, gán ô); truyền model thật để so cả thời gian infer và độ khớp từng ô.
+
+    python -m benchmarks.bench_engines --spots 100 600 2000 --resolutions 1080p 4K
+    python -m benchmarks.bench_engines --model models/best.pt --classifier models/spot_classifier.onnx --spots 600
+"""
+import argparse
+import json
+import os
+import time
+from typing import Dict, List
+
+import cv2
+import numpy as np
+
+from benchmarks.bench_pipeline import peak_rss_mb, percentiles
+from benchmarks.stub_model import StubBackend, StubClassifier
+from benchmarks.synthetic import RESOLUTIONS, make_polygons, occupancy_plan, render_frame
+from src.domain.backends import load_backend
+from src.domain.parking_detector import ENGINE_CLASSIFIER, ENGINE_DETECTOR, ParkingDetector
+from src.domain.spot_classifier import load_classifier
+from src.utils.configs import GENERAL_CONFIDENCE_THRESHOLD, IMAGE_SIZE
+
+STAGES = ('infer', 'spots', 'total')
+
+
+def make_frames(polygons: List[Dict], size, count: int, seed: int) -> List[np.ndarray]:
+    rng = np.random.default_rng(seed)
+    plan = occupancy_plan(len(polygons), seed=seed)
+    frames = []
+    for i in range(count):
+        frames.append(render_frame(polygons, size, plan, seed + i))
+        plan ^= rng.random(len(plan)) < 0.02
+    return frames
+
+
+def make_detector(args, engine: str, polygons: List[Dict], size) -> ParkingDetector:
+    if engine == ENGINE_CLASSIFIER:
+        model = load_classifier(args.classifier, args.device) if args.classifier else \
+            StubClassifier(args.crop_size, latency_ms=args.stub_latency_ms)
+    elif args.model:
+        model = load_backend(args.model, args.device, args.backend)
+    else:
+        model = StubBackend(polygons, size, latency_ms=args.stub_latency_ms, seed=args.seed)
+    return ParkingDetector(polygons, model_path=args.model or '', general_confidence=args.conf,
+                           device=args.device, image_size=args.imgsz, model=model, engine=engine,
+                           tiled=args.tiled)
+
+
+def run_engine(detector: ParkingDetector, frames: List[np.ndarray], warmup: int) -> Dict:
+    # _predict (classifier: warp + classify) then process_result (per-spot status).
+    timings = {stage: [] for stage in STAGES}
+    statuses = []
+    started = None
+    for i, frame in enumerate(frames):
+        t0 = time.perf_counter()
+        result = detector._predict(frame)[0]
+        t1 = time.perf_counter()
+        output = detector.process_result(frame, result)
+        t2 = time.perf_counter()
+        if i < warmup:
+            continue
+        if started is None:
+            started = t0
+        statuses.append([spot['status'] for spot in output['spots']])
+        for stage, (a, b) in zip(STAGES, ((t0, t1), (t1, t2), (t0, t2))):
+            timings[stage].append((b - a) * 1000)
+    elapsed = time.perf_counter() - started if started is not None else 0.0
+    measured = len(timings['total'])
+    return {
+        'frames': measured,
+        'fps': round(measured / elapsed, 2) if elapsed else 0.0,
+        'stages_ms': {stage: percentiles(samples) for stage, samples in timings.items()},
+        'statuses': statuses,
+    }
+
+
+def run_scenario(args, spots: int, resolution: str) -> Dict:
+    size = RESOLUTIONS[resolution]
+    polygons = make_polygons(spots, size, args.seed)
+    frames = make_frames(polygons, size, args.frames + args.warmup, args.seed)
+    scenario = {'spots': spots, 'resolution': resolution, 'engines': {}}
+    for engine in (ENGINE_DETECTOR, ENGINE_CLASSIFIER):
+        run = run_engine(make_detector(args, engine, polygons, size), frames, args.warmup)
+        scenario['engines'][engine] = run
+    detector, classifier = (scenario['engines'][e].pop('statuses') for e in (ENGINE_DETECTOR, ENGINE_CLASSIFIER))
+    if args.model and args.classifier:
+        # Only meaningful with real models: the stubs do not see the same lot.
+        a, b = np.asarray(detector), np.asarray(classifier)
+        scenario['spot_agreement'] = round(float((a == b).mean()), 4) if a.size else None
+    fps = [scenario['engines'][e]['fps'] for e in (ENGINE_DETECTOR, ENGINE_CLASSIFIER)]
+    scenario['speedup'] = round(fps[1] / fps[0], 2) if fps[0] else None
+    scenario['peak_rss_mb'] = peak_rss_mb()
+    return scenario
+
+
+def print_scenario(s: Dict) -> None:
+    for engine, run in s['engines'].items():
+        cells = " ".join(f"{run['stages_ms'][stage].get('p50', 0):>9.2f}" for stage in STAGES)
+        print(f"{s['spots']:>5} {s['resolution']:>6} {engine:>10} {cells} {run['fps']:>8.1f}")
+    agreement = f", khớp từng ô {s['spot_agreement']:.2%}" if s.get('spot_agreement') is not None else ""
+    print(f"{'':>12} classifier/detector fps x{s['speedup']}{agreement}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--spots', type=int, nargs='+', default=[100, 600, 2000])
+    parser.add_argument('--resolutions', nargs='+', default=['1080p'], choices=list(RESOLUTIONS))
+    parser.add_argument('--frames', type=int, default=30, help='Số frame đo cho mỗi tổ hợp')
+    parser.add_argument('--warmup', type=int, default=3)
+    parser.add_argument('--model', default=None, help='Model detect thật (mặc định: model giả lập)')
+    parser.add_argument('--backend', default='torch', choices=['torch', 'onnx', 'openvino'])
+    parser.add_argument('--classifier', default=None, help='Model phân loại thật, .pt hoặc .onnx (mặc định: giả lập)')
+    parser.add_argument('--crop-size', type=int, default=64, help='Model giả lập: cạnh crop')
+    parser.add_argument('--tiled', action='store_true', help='Engine detector chạy theo tile')
+    parser.add_argument('--device', default='cpu')
+    parser.add_argument('--imgsz', type=int, default=IMAGE_SIZE)
+    parser.add_argument('--conf', type=float, default=GENERAL_CONFIDENCE_THRESHOLD)
+    parser.add_argument('--stub-latency-ms', type=float, default=0.0, help='Model giả lập: thời gian mỗi lần gọi')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--json', default=None, help='Ghi kết quả ra file JSON')
+    args = parser.parse_args()
+
+    report = {
+        'meta': {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+            'cpus': os.cpu_count(),
+            'opencv': cv2.__version__,
+            'model': args.model or 'stub',
+            'classifier': args.classifier or 'stub',
+            'args': vars(args),
+        },
+        'scenarios': [],
+    }
+    print(f"p50 ms/frame ({args.frames} frames, model={report['meta']['model']}, "
+          f"classifier={report['meta']['classifier']})")
+    print(f"{'spots':>5} {'res':>6} {'engine':>10} " + " ".join(f"{stage:>9}" for stage in STAGES) + f" {'fps':>8}")
+    for resolution in args.resolutions:
+        for spots in sorted(args.spots):
+            scenario = run_scenario(args, spots, resolution)
+            report['scenarios'].append(scenario)
+            print_scenario(scenario)
+
+    if args.json:
+        os.makedirs(os.path.dirname(args.json) or '.', exist_ok=True)
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"\nĐã ghi {args.json}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,106 @@
+"""So sánh OccupancyEngine (vector hoá) với vòng lặp pointPolygonTest cũ, trên cùng bãi xe giả lập
+(benchmarks.synthetic) với các benchmark khác.
+
+    python -m benchmarks.bench_occupancy --spots 50 500 2000 --resolution 1080p
+"""
+import argparse
+import time
+
+import numpy as np
+
+from benchmarks.synthetic import RESOLUTIONS, make_polygons
+from src.domain.occupancy import OccupancyEngine
+from src.domain.parking_detector import ParkingDetector
+
+
+def make_detections(polygons, seed: int = 1):
+    rng = np.random.default_rng(seed)
+
+    def _det(center, class_name):
+        cx, cy = float(center[0]), float(center[1])
+        return {
+            'bbox': [cx - 20, cy - 35, cx + 20, cy + 35],
+            'center': [cx, cy],
+            'confidence': float(rng.uniform(0.3, 0.99)),
+            'class_id': 0 if class_name == 'car' else 1,
+            'class_name': class_name,
+        }
+
+    cars, free = [], []
+    for poly in polygons:
+        pts = np.asarray(poly['points'])
+        roll = rng.random()
+        center = pts.mean(axis=0) + rng.normal(0, 6, size=2)
+        if roll < 0.6:
+            cars.append(_det(center, 'car'))
+        elif roll < 0.9:
+            free.append(_det(center, 'free'))
+    extent = np.asarray([p['points'] for p in polygons]).reshape(-1, 2).max(axis=0)
+    for _ in range(max(1, len(polygons) // 20)):
+        cars.append(_det(rng.uniform(0, extent), 'car'))
+    rng.shuffle(cars)
+    rng.shuffle(free)
+    return {'cars': cars, 'free_spots': free}
+
+
+def legacy_assign(polygons, detections):
+    detector = ParkingDetector.__new__(ParkingDetector)
+    return [detector.check_polygon_occupancy(detections, poly) for poly in polygons]
+
+
+def engine_assign(engine, detections):
+    car_centers = np.array([d['center'] for d in detections['cars']]).reshape(-1, 2)
+    free_centers = np.array([d['center'] for d in detections['free_spots']]).reshape(-1, 2)
+    return engine.assign(car_centers, free_centers)
+
+
+def _check_parity(legacy, car_idx, free_idx, detections):
+    for i, info in enumerate(legacy):
+        if info['detection_type'] == 'car':
+            expected = detections['cars'][car_idx[i]] if car_idx[i] >= 0 else None
+        elif info['detection_type'] == 'free':
+            expected = detections['free_spots'][free_idx[i]] if free_idx[i] >= 0 else None
+        else:
+            expected = None if car_idx[i] < 0 and free_idx[i] < 0 else 'mismatch'
+        if expected is not info['detected_object']:
+            raise AssertionError(f"Spot {i}: engine disagrees with pointPolygonTest path")
+
+
+def _time(fn, repeat: int) -> float:
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - started)
+    return best * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--spots', type=int, nargs='+', default=[50, 500, 2000])
+    parser.add_argument('--resolution', default='1080p', choices=list(RESOLUTIONS))
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'spots':>6} {'dets':>6} {'legacy ms':>10} {'build ms':>9} {'engine ms':>10} {'speedup':>8}")
+    for spots in args.spots:
+        polygons = make_polygons(spots, RESOLUTIONS[args.resolution])
+        detections = make_detections(polygons)
+        engine = OccupancyEngine(polygons)
+
+        legacy = legacy_assign(polygons, detections)
+        car_idx, free_idx = engine_assign(engine, detections)
+        _check_parity(legacy, car_idx, free_idx, detections)
+
+        legacy_ms = _time(lambda: legacy_assign(polygons, detections), args.repeat)
+        build_ms = _time(lambda: OccupancyEngine(polygons), args.repeat)
+        engine_ms = _time(lambda: engine_assign(engine, detections), args.repeat)
+        n_dets = len(detections['cars']) + len(detections['free_spots'])
+        print(
+            f"{spots:>6} {n_dets:>6} {legacy_ms:>10.2f} {build_ms:>9.2f} "
+            f"{engine_ms:>10.3f} {legacy_ms / engine_ms:>7.1f}x"
+        )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,227 @@
+"""Benchmark end-to-end pipeline phân tích video trên bãi xe giả lập.
+
+Đo thời gian từng bước (decode, infer, parse, occupancy, annotate, encode) theo percentile,
+frames/sec và peak RSS cho mỗi tổ hợp số ô x độ phân giải; mặc định dùng model giả lập
+(benchmarks.stub_model) nên chạy được khi không có models/best.pt.
+
+    python -m benchmarks.bench_pipeline --spots 10 100 1000 5000 --resolutions 720p 1080p
+    python -m benchmarks.bench_pipeline --json runs/after.json --compare runs/before.json
+    python -m benchmarks.bench_pipeline --model models/best.pt --backend onnx --spots 50
+    python -m benchmarks.bench_pipeline --model models/best.pt --resolutions 4K --spots 600 --tiled
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import sys
+import tempfile
+import time
+from typing import Dict, List
+
+import cv2
+import numpy as np
+
+from benchmarks.stub_model import StubBackend
+from benchmarks.synthetic import RESOLUTIONS, make_polygons, write_polygon_file, write_video
+from src.domain.backends import load_backend
+from src.domain.parking_detector import ParkingDetector
+from src.utils.configs import GENERAL_CONFIDENCE_THRESHOLD, IMAGE_SIZE
+from src.utils.draw_utils import annotate_frame
+from src.utils.polygon_utils import load_polygons
+from src.utils.video_utils import FrameSampler, mjpeg_generator, open_video, release_video
+
+STAGES = ('decode', 'infer', 'parse', 'occupancy', 'annotate', 'encode', 'total')
+
+
+def peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in KiB on Linux and in bytes on macOS.
+    return round(peak / (1024 ** 2 if sys.platform == 'darwin' else 1024), 1)
+
+
+def percentiles(samples: List[float]) -> Dict[str, float]:
+    values = np.asarray(samples, np.float64)
+    if values.size == 0:
+        return {}
+    p50, p90, p99 = np.percentile(values, [50, 90, 99])
+    return {
+        'mean': round(float(values.mean()), 3),
+        'p50': round(float(p50), 3),
+        'p90': round(float(p90), 3),
+        'p99': round(float(p99), 3),
+        'max': round(float(values.max()), 3),
+    }
+
+
+def run_stages(detector: ParkingDetector, video_path: str, jpeg_quality: int, warmup: int) -> Dict:
+    # Same steps as mjpeg_generator, timed one by one.
+    timings = {stage: [] for stage in STAGES}
+    cap = open_video(video_path)
+    frames = 0
+    started = None
+    try:
+        sampler = iter(FrameSampler(cap))
+        while True:
+            t0 = time.perf_counter()
+            item = next(sampler, None)
+            if item is None:
+                break
+            _, frame = item
+            t1 = time.perf_counter()
+            result = detector._predict(frame)[0]
+            t2 = time.perf_counter()
+            detections = detector._parse_result(result)
+            t3 = time.perf_counter()
+            resolution = (frame.shape[1], frame.shape[0])
+            polygons = detector._rescale_polygons(resolution)
+            output = detector.build_result(detections, polygons, detector._occupancy_engine(resolution))
+            t4 = time.perf_counter()
+            annotated = annotate_frame(frame, output['spots'], output['summary'])
+            t5 = time.perf_counter()
+            cv2.imencode('.jpg', annotated, [cv2.IMWRITE_JPEG_QUALITY, jpeg_quality])
+            t6 = time.perf_counter()
+
+            frames += 1
+            if frames <= warmup:
+                continue
+            if started is None:
+                started = t0
+            for stage, (a, b) in zip(STAGES, ((t0, t1), (t1, t2), (t2, t3), (t3, t4), (t4, t5), (t5, t6), (t0, t6))):
+                timings[stage].append((b - a) * 1000)
+    finally:
+        release_video(cap)
+    measured = len(timings['total'])
+    elapsed = time.perf_counter() - started if started is not None else 0.0
+    return {
+        'frames': measured,
+        'fps': round(measured / elapsed, 2) if elapsed else 0.0,
+        'stages_ms': {stage: percentiles(samples) for stage, samples in timings.items()},
+    }
+
+
+def run_mjpeg(detector: ParkingDetector, video_path: str, jpeg_quality: int) -> float:
+    # The production generator end to end, as a cross-check of the staged loop.
+    frames = 0
+    started = time.perf_counter()
+    for _ in mjpeg_generator(video_path, detector, skip=0, jpeg_quality=jpeg_quality):
+        frames += 1
+    elapsed = time.perf_counter() - started
+    return round(frames / elapsed, 2) if elapsed else 0.0
+
+
+def make_detector(args, polygons: List[Dict], size) -> ParkingDetector:
+    if args.model:
+        model = load_backend(args.model, args.device, args.backend)
+    else:
+        model = StubBackend(polygons, size, occupied=args.occupied, free=args.free,
+                            extra=args.extra, latency_ms=args.stub_latency_ms, seed=args.seed)
+    return ParkingDetector(polygons, model_path=args.model or '', general_confidence=args.conf,
+                           device=args.device, image_size=args.imgsz, model=model,
+                           tiled=args.tiled, tile_size=args.tile_size)
+
+
+def run_scenario(args, spots: int, resolution: str, work_dir: str) -> Dict:
+    size = RESOLUTIONS[resolution]
+    name = f"lot_{spots}_{resolution}"
+    polygon_path = write_polygon_file(os.path.join(work_dir, f"{name}.json"), make_polygons(spots, size, args.seed))
+    video_path = write_video(os.path.join(work_dir, f"{name}.mp4"), load_polygons(polygon_path), size,
+                             args.frames + args.warmup, seed=args.seed)
+
+    started = time.perf_counter()
+    detector = make_detector(args, load_polygons(polygon_path), size)
+    setup_ms = (time.perf_counter() - started) * 1000
+
+    scenario = {'spots': spots, 'resolution': resolution, 'size': list(size), 'setup_ms': round(setup_ms, 2)}
+    scenario.update(run_stages(detector, video_path, args.jpeg_quality, args.warmup))
+    if args.mjpeg:
+        scenario['mjpeg_fps'] = run_mjpeg(detector, video_path, args.jpeg_quality)
+    scenario['peak_rss_mb'] = peak_rss_mb()
+    return scenario
+
+
+def print_scenario(s: Dict) -> None:
+    stages = s['stages_ms']
+    cells = " ".join(f"{stages[stage].get('p50', 0):>9.2f}" for stage in STAGES)
+    mjpeg = f"{s['mjpeg_fps']:>7.1f}" if 'mjpeg_fps' in s else f"{'-':>7}"
+    print(f"{s['spots']:>5} {s['resolution']:>6} {cells} {s['fps']:>7.1f} {mjpeg} {s['peak_rss_mb']:>8.1f}")
+
+
+def compare(current: Dict, baseline_path: str) -> None:
+    with open(baseline_path, encoding='utf-8') as f:
+        baseline = {(s['spots'], s['resolution']): s for s in json.load(f)['scenarios']}
+    print(f"\nSo với {baseline_path} (tỉ lệ mới/cũ, p50; <1 là nhanh hơn, fps >1 là tốt hơn)")
+    print(f"{'spots':>5} {'res':>6} " + " ".join(f"{stage:>9}" for stage in STAGES) + f" {'fps':>7}")
+    for s in current['scenarios']:
+        old = baseline.get((s['spots'], s['resolution']))
+        if old is None:
+            continue
+        ratios = []
+        for stage in STAGES:
+            new_p50 = s['stages_ms'][stage].get('p50')
+            old_p50 = old['stages_ms'].get(stage, {}).get('p50')
+            ratios.append(f"{new_p50 / old_p50:>9.2f}" if new_p50 and old_p50 else f"{'-':>9}")
+        fps = f"{s['fps'] / old['fps']:>7.2f}" if old.get('fps') else f"{'-':>7}"
+        print(f"{s['spots']:>5} {s['resolution']:>6} " + " ".join(ratios) + f" {fps}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--spots', type=int, nargs='+', default=[10, 100, 1000, 5000])
+    parser.add_argument('--resolutions', nargs='+', default=['720p', '1080p'], choices=list(RESOLUTIONS))
+    parser.add_argument('--frames', type=int, default=50, help='Số frame đo cho mỗi tổ hợp')
+    parser.add_argument('--warmup', type=int, default=3)
+    parser.add_argument('--model', default=None, help='Model thật (mặc định: model giả lập)')
+    parser.add_argument('--backend', default='torch', choices=['torch', 'onnx', 'openvino'])
+    parser.add_argument('--device', default='cpu')
+    parser.add_argument('--imgsz', type=int, default=IMAGE_SIZE)
+    parser.add_argument('--tiled', action='store_true',
+                        help='Infer theo tile quanh các ô (model giả lập không biết vị trí tile: chỉ đo thời gian)')
+    parser.add_argument('--tile-size', type=int, default=None, help='Cạnh tile (mặc định = --imgsz)')
+    parser.add_argument('--conf', type=float, default=GENERAL_CONFIDENCE_THRESHOLD)
+    parser.add_argument('--occupied', type=float, default=0.6, help='Model giả lập: tỉ lệ ô có xe')
+    parser.add_argument('--free', type=float, default=0.3, help='Model giả lập: tỉ lệ ô trống được phát hiện')
+    parser.add_argument('--extra', type=int, default=0, help='Model giả lập: số box thừa ngoài các ô')
+    parser.add_argument('--stub-latency-ms', type=float, default=0.0, help='Model giả lập: thời gian infer/ảnh')
+    parser.add_argument('--jpeg-quality', type=int, default=85)
+    parser.add_argument('--no-mjpeg', dest='mjpeg', action='store_false', help='Bỏ bước đo mjpeg_generator')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--json', default=None, help='Ghi kết quả ra file JSON')
+    parser.add_argument('--compare', default=None, help='File JSON của lần chạy trước để so sánh')
+    args = parser.parse_args()
+
+    report = {
+        'meta': {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpus': os.cpu_count(),
+            'numpy': np.__version__,
+            'opencv': cv2.__version__,
+            'model': args.model or 'stub',
+            'args': vars(args),
+        },
+        'scenarios': [],
+    }
+    print(f"p50 ms/frame ({args.frames} frames, model={report['meta']['model']})")
+    print(f"{'spots':>5} {'res':>6} " + " ".join(f"{stage:>9}" for stage in STAGES)
+          + f" {'fps':>7} {'mjpeg':>7} {'rss MB':>8}")
+    with tempfile.TemporaryDirectory(prefix='parking-bench-') as work_dir:
+        # Peak RSS is process-wide and only grows: small lots go first.
+        for resolution in args.resolutions:
+            for spots in sorted(args.spots):
+                scenario = run_scenario(args, spots, resolution, work_dir)
+                report['scenarios'].append(scenario)
+                print_scenario(scenario)
+
+    if args.json:
+        os.makedirs(os.path.dirname(args.json) or '.', exist_ok=True)
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"\nĐã ghi {args.json}")
+    if args.compare:
+        compare(report, args.compare)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+"""Model giả lập thay cho YOLO: trả detection cố định theo polygon, không cần models/best.pt."""
+import time
+from typing import Dict, List, Tuple
+
+import cv2
+import numpy as np
+
+from src.domain.backends import BackendResult
+
+
+class StubBackend:
+    # Same interface as the backends in src.domain.backends. Every spot gets a
+    # car box with probability `occupied`, otherwise a free box with
+    # probability `free`; `extra` boxes land anywhere in the frame. Detections
+    # are drawn once from `seed` at `resolution` and scaled to each image, so
+    # every run and every frame sees the same counts.
+    name = 'stub'
+    precision = 'fp32'
+    thread_safe = True
+    agreement = None
+
+    def __init__(self, polygons: List[Dict], resolution: Tuple[int, int], occupied: float = 0.6,
+                 free: float = 0.3, extra: int = 0, latency_ms: float = 0.0, seed: int = 0):
+        self.names: Dict[int, str] = {0: 'car', 1: 'free'}
+        self.resolution = resolution
+        self.latency_ms = latency_ms
+        rng = np.random.default_rng(seed)
+        rows = []
+        for poly in polygons:
+            pts = np.asarray(poly['points'], np.float32)
+            roll = rng.random()
+            if roll >= occupied + free:
+                continue
+            center = pts.mean(axis=0)
+            half = (pts.max(axis=0) - pts.min(axis=0)) * 0.4
+            rows.append([*(center - half), *(center + half), rng.uniform(0.55, 0.99), 0 if roll < occupied else 1])
+        w, h = resolution
+        for _ in range(extra):
+            x, y = rng.uniform(0, w - 40), rng.uniform(0, h - 70)
+            rows.append([x, y, x + 40, y + 70, rng.uniform(0.3, 0.99), rng.integers(2)])
+        self.data = np.asarray(rows, np.float32).reshape(-1, 6)
+
+    def predict(self, images, imgsz: int, conf: float, iou: float) -> List[BackendResult]:
+        if isinstance(images, np.ndarray):
+            images = [images]
+        if self.latency_ms:
+            time.sleep(self.latency_ms * len(images) / 1000.0)
+        results = []
+        for image in images:
+            h, w = image.shape[:2]
+            data = self.data[self.data[:, 4] >= conf].copy()
+            data[:, [0, 2]] *= w / self.resolution[0]
+            data[:, [1, 3]] *= h / self.resolution[1]
+            results.append(BackendResult(data, {'preprocess': 0.0, 'inference': self.latency_ms, 'postprocess': 0.0}))
+        return results
+
+
+class StubClassifier:
+    # Same interface as the classifiers in src.domain.spot_classifier. Reads
+    # the frames of benchmarks.synthetic: a spot is occupied when the centre
+    # of its crop is not asphalt-coloured, so the crop geometry is exercised
+    # for real and the answers match the rendered lot.
+    name = 'stub'
+    precision = 'fp32'
+    thread_safe = True
+    agreement = None
+
+    def __init__(self, input_size: int = 64, latency_ms: float = 0.0, asphalt=(78, 80, 82), tolerance: float = 25.0):
+        self.names: Dict[int, str] = {0: 'car', 1: 'free'}
+        self.input_size = input_size
+        self.latency_ms = latency_ms
+        self.asphalt = np.asarray(asphalt, np.float32)
+        self.tolerance = tolerance
+
+    def classify(self, crops: np.ndarray):
+        started = time.perf_counter()
+        if self.latency_ms:
+            time.sleep(self.latency_ms / 1000.0)
+        s = crops.shape[1]
+        centre = crops[:, s // 4: s - s // 4: 2, s // 4: s - s // 4: 2].reshape(len(crops), -1, crops.shape[-1])
+        distance = np.abs(centre.mean(axis=1) - self.asphalt).max(axis=1)
+        p_car = np.clip(0.5 + (distance - self.tolerance) / 50.0, 0.02, 0.98).astype(np.float32)
+        probs = np.stack([p_car, 1 - p_car], axis=1)
+        return probs, {'preprocess': 0.0, 'inference': (time.perf_counter() - started) * 1000, 'postprocess': 0.0}
+
+    def predict(self, images, imgsz: int = 0, conf: float = 0.0, iou: float = 0.0) -> List[BackendResult]:
+        if isinstance(images, np.ndarray):
+            images = [images]
+        crops = np.stack([cv2.resize(image, (self.input_size, self.input_size)) for image in images])
+        probs, speed = self.classify(crops)
+        return [BackendResult(row, dict(speed)) for row in probs]
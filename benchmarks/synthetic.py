@@ -0,0 +1,125 @@
+"""Sinh dữ liệu giả lập cho benchmark: bãi xe (polygon), frame và video.
+
+    python -m benchmarks.synthetic --spots 10 500 5000 --resolution 1080p --out /tmp/lots
+"""
+import argparse
+import json
+import os
+from typing import Dict, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+RESOLUTIONS = {'480p': (854, 480), '720p': (1280, 720), '1080p': (1920, 1080), '4K': (3840, 2160)}
+
+_ASPHALT = (72, 74, 76)
+_LINE = (210, 210, 210)
+_CAR_COLORS = ((40, 40, 160), (160, 160, 160), (30, 30, 30), (200, 200, 200), (150, 90, 30), (40, 120, 200))
+
+
+def make_lot(spots: int, seed: int = 0) -> List[Dict]:
+    # Grid of slightly jittered 55x85 spots in lot units; every benchmark builds
+    # its lots from this, scaled with make_polygons.
+    rng = np.random.default_rng(seed)
+    cols = int(np.ceil(np.sqrt(spots * 16 / 9)))
+    cell_w, cell_h = 60.0, 90.0
+    polygons = []
+    for i in range(spots):
+        r, c = divmod(i, cols)
+        x, y = 10 + c * cell_w, 10 + r * cell_h
+        jitter = rng.uniform(-4, 4, size=(4, 2))
+        pts = np.array([[x, y], [x + 55, y + 5], [x + 52, y + 85], [x - 3, y + 80]]) + jitter
+        polygons.append({'id': i + 1, 'points': pts.round(1).tolist()})
+    return polygons
+
+
+def make_polygons(spots: int, size: Tuple[int, int], seed: int = 0) -> List[Dict]:
+    # make_lot scaled to fill the frame, in polygon-file format.
+    w, h = size
+    polygons = make_lot(spots, seed)
+    pts = np.asarray([p['points'] for p in polygons])
+    extent = pts.reshape(-1, 2).max(axis=0) + 10
+    scale = min(w / extent[0], h / extent[1])
+    for p in polygons:
+        p['points'] = (np.asarray(p['points']) * scale).round(1).tolist()
+    return polygons
+
+
+def write_polygon_file(path: str, polygons: List[Dict]) -> str:
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(polygons, f)
+    return path
+
+
+def occupancy_plan(spots: int, occupied: float = 0.6, seed: int = 0) -> np.ndarray:
+    return np.random.default_rng(seed).random(spots) < occupied
+
+
+def render_frame(polygons: List[Dict], size: Tuple[int, int], plan: np.ndarray, seed: int = 0) -> np.ndarray:
+    # Asphalt, painted spot outlines and a filled box for each occupied spot;
+    # the noise keeps JPEG/video sizes close to a real camera frame.
+    w, h = size
+    rng = np.random.default_rng(seed)
+    frame = np.empty((h, w, 3), np.uint8)
+    frame[:] = _ASPHALT
+    frame += rng.integers(0, 12, size=(h, w, 1), dtype=np.uint8)
+    outlines = [np.asarray(p['points'], np.int32) for p in polygons]
+    cv2.polylines(frame, outlines, True, _LINE, 1, cv2.LINE_8)
+    for pts, taken in zip(outlines, plan):
+        if not taken:
+            continue
+        center = pts.mean(axis=0)
+        car = (center + (pts - center) * 0.7).astype(np.int32)
+        cv2.fillConvexPoly(frame, car, _CAR_COLORS[rng.integers(len(_CAR_COLORS))])
+    return frame
+
+
+def write_video(path: str, polygons: List[Dict], size: Tuple[int, int], frames: int, fps: float = 10.0,
+                occupied: float = 0.6, churn: float = 0.02, seed: int = 0) -> str:
+    # Each frame flips `churn` of the spots, so consecutive frames differ the
+    # way a slowly changing lot does.
+    fourcc = cv2.VideoWriter_fourcc(*('mp4v' if path.endswith('.mp4') else 'MJPG'))
+    writer = cv2.VideoWriter(path, fourcc, fps, size)
+    if not writer.isOpened():
+        raise RuntimeError(f"Cannot open video writer for {path}")
+    rng = np.random.default_rng(seed)
+    plan = occupancy_plan(len(polygons), occupied, seed)
+    try:
+        for i in range(frames):
+            writer.write(render_frame(polygons, size, plan, seed + i))
+            plan ^= rng.random(len(plan)) < churn
+    finally:
+        writer.release()
+    return path
+
+
+def make_lot_files(out_dir: str, spots: int, resolution: str, frames: int = 0,
+                   seed: int = 0) -> Tuple[str, Optional[str]]:
+    size = RESOLUTIONS[resolution]
+    polygons = make_polygons(spots, size, seed)
+    name = f"lot_{spots}_{resolution}"
+    polygon_path = write_polygon_file(os.path.join(out_dir, f"{name}.json"), polygons)
+    video_path = None
+    if frames > 0:
+        video_path = write_video(os.path.join(out_dir, f"{name}.mp4"), polygons, size, frames, seed=seed)
+    return polygon_path, video_path
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--spots', type=int, nargs='+', default=[10, 100, 1000, 5000])
+    parser.add_argument('--resolution', nargs='+', default=['1080p'], choices=list(RESOLUTIONS))
+    parser.add_argument('--frames', type=int, default=60, help='Số frame video (0 = chỉ sinh polygon)')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--out', default='benchmarks/data')
+    args = parser.parse_args()
+
+    for resolution in args.resolution:
+        for spots in args.spots:
+            polygon_path, video_path = make_lot_files(args.out, spots, resolution, args.frames, args.seed)
+            print(polygon_path, video_path or '')
+
+
+if __name__ == '__main__':
+    main()
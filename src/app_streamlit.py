@@ -2,7 +2,6 @@ import cv2
 import numpy as np
 import requests
 import streamlit as st
-import base64
 import streamlit.components.v1 as components
 
 API_BASE = "http://localhost:8000/api/v1/parking"
@@ -159,17 +158,17 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
-def numpy_to_base64(image_np: np.ndarray) -> str:
-    _, buffer = cv2.imencode('.jpg', image_np)
-    return base64.b64encode(buffer).decode('utf-8')
-
-def call_image_api(image_b64: str, conf_params: dict, polygon_id: str = None) -> dict:
-    payload = {
-        "image": image_b64,
-        "config": conf_params,
-        "polygon_id": polygon_id
-    }
-    r = requests.post(f"{API_BASE}/detect", json=payload, timeout=60)
+def call_image_api(image_bytes: bytes, content_type: str, conf_params: dict, polygon_id: str = None) -> dict:
+    params = {k: v for k, v in conf_params.items() if k != "device"}
+    if polygon_id:
+        params["polygon_id"] = polygon_id
+    r = requests.post(
+        f"{API_BASE}/detect",
+        data=image_bytes,
+        params=params,
+        headers={"Content-Type": content_type},
+        timeout=60,
+    )
     r.raise_for_status()
     return r.json()
 
@@ -256,8 +255,7 @@ if mode == "Phát hiện từ Ảnh":
         image_np = cv2.imdecode(np.frombuffer(image_bytes, np.uint8), cv2.IMREAD_COLOR)
         with st.spinner("🔍 Đang phân tích ảnh qua AI Server..."):
             try:
-                image_b64 = numpy_to_base64(image_np)
-                result = call_image_api(image_b64, current_config, selected_poly)
+                result = call_image_api(image_bytes, uploaded_file.type or "image/jpeg", current_config, selected_poly)
                 annotated_img = draw_spots(image_np.copy(), result["spots"])
                 col1, col2 = st.columns(2)
                 with col1:
@@ -290,11 +288,15 @@ elif mode == "Phát hiện từ Video":
         if st.button("▶️ Bắt đầu phân tích Video"):
             with st.spinner("📤 Đang gửi video lên server..."):
                 try:
-                    files = {"video": (uploaded_video.name, uploaded_video.getvalue(), "video/mp4")}
-                    data = {"polygon_id": selected_poly}
-                    r = requests.post(f"{API_BASE}/session/upload", files=files, data=data)
+                    r = requests.post(f"{API_BASE}/session",
+                                      params={"polygon_id": selected_poly, "filename": uploaded_video.name})
                     r.raise_for_status()
                     sid = r.json()["session_id"]
+                    # Truyền file object để requests gửi theo từng chunk, không copy toàn bộ video.
+                    uploaded_video.seek(0)
+                    r = requests.put(f"{API_BASE}/session/{sid}/video", data=uploaded_video,
+                                     headers={"Content-Type": uploaded_video.type or "video/mp4"})
+                    r.raise_for_status()
                     st.session_state["stream_sid"] = sid
                     st.success("✅ Upload thành công!")
                 except Exception as e:
@@ -310,5 +312,9 @@ elif mode == "Phát hiện từ Video":
             </div>
         """, unsafe_allow_html=True)
         if st.button("🛑 Dừng Video & Xoá Session"):
+            try:
+                requests.delete(f"{API_BASE}/session/{sid}", timeout=5)
+            except Exception:
+                pass
             del st.session_state["stream_sid"]
             st.rerun()
\ No newline at end of file
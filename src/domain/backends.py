@@ -0,0 +1,300 @@
+import ast
+import logging
+import os
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from ..utils.configs import (
+    INFERENCE_BACKEND as DEFAULT_BACKEND,
+    ORT_INTER_OP_THREADS as DEFAULT_INTER_OP_THREADS,
+    ORT_INTRA_OP_THREADS as DEFAULT_INTRA_OP_THREADS,
+    OPENVINO_THREADS as DEFAULT_OPENVINO_THREADS,
+    IMAGE_SIZE as DEFAULT_IMAGE_SIZE,
+    MODEL_PRECISION as DEFAULT_PRECISION,
+)
+
+logger = logging.getLogger(__name__)
+
+BACKENDS = ("torch", "onnx", "openvino")
+
+_MAX_DET = 300
+_MAX_NMS = 30000
+_EXPORT_LOCK = threading.Lock()
+
+
+class BackendResult:
+    # Detections of one image as (N, 6) [x1, y1, x2, y2, conf, cls] in original
+    # image pixels, plus per-image stage timings in ms (same keys as
+    # ultralytics' Results.speed).
+    __slots__ = ("data", "speed")
+
+    def __init__(self, data: np.ndarray, speed: Optional[Dict[str, float]] = None):
+        self.data = data
+        self.speed = speed or {}
+
+
+class UltralyticsBackend:
+    name = "torch"
+    # Ultralytics predictors keep per-call state.
+    thread_safe = False
+    # Per-spot agreement with fp32 measured by the quantization gate.
+    agreement: Optional[float] = None
+
+    def __init__(self, model_path: str, device: str = "cpu", half: bool = False):
+        from ultralytics import YOLO
+
+        self.model_path = model_path
+        self.device = device
+        self.half = half
+        self.precision = "fp16" if half else "fp32"
+        self.model = YOLO(model_path)
+        self.names: Dict[int, str] = self.model.names
+
+    def predict(self, images, imgsz: int, conf: float, iou: float) -> List[BackendResult]:
+        extra = {"half": True} if self.half else {}
+        results = self.model(images, verbose=False, device=self.device, imgsz=imgsz, conf=conf, iou=iou, **extra)
+        out = []
+        for result in results:
+            boxes = result.boxes
+            if boxes is None or len(boxes) == 0:
+                data = np.empty((0, 6), np.float32)
+            else:
+                # One device->host copy; drop the track id column if present.
+                data = boxes.data.cpu().numpy()
+                if data.shape[1] != 6:
+                    data = np.concatenate([data[:, :4], data[:, -2:]], axis=1)
+            out.append(BackendResult(data, dict(result.speed)))
+        return out
+
+
+def letterbox(image: np.ndarray, new_shape: Tuple[int, int], auto: bool, stride: int = 32):
+    # Same geometry as ultralytics' LetterBox (centered, gray 114 padding).
+    h, w = image.shape[:2]
+    r = min(new_shape[0] / h, new_shape[1] / w)
+    new_unpad = (int(round(w * r)), int(round(h * r)))
+    dw, dh = new_shape[1] - new_unpad[0], new_shape[0] - new_unpad[1]
+    if auto:
+        dw, dh = dw % stride, dh % stride
+    dw, dh = dw / 2, dh / 2
+    if (w, h) != new_unpad:
+        image = cv2.resize(image, new_unpad, interpolation=cv2.INTER_LINEAR)
+    top, bottom = int(round(dh - 0.1)), int(round(dh + 0.1))
+    left, right = int(round(dw - 0.1)), int(round(dw + 0.1))
+    return cv2.copyMakeBorder(image, top, bottom, left, right, cv2.BORDER_CONSTANT, value=(114, 114, 114))
+
+
+def preprocess(images, imgsz: int, auto: bool = False, stride: int = 32) -> np.ndarray:
+    # BGR uint8 images -> letterboxed RGB float32 NCHW blob in [0, 1].
+    batch = np.stack([letterbox(image, (imgsz, imgsz), auto=auto, stride=stride) for image in images])
+    blob = np.ascontiguousarray(batch[..., ::-1].transpose(0, 3, 1, 2), dtype=np.float32)
+    blob /= 255.0
+    return blob
+
+
+def scale_boxes(boxes: np.ndarray, input_shape: Tuple[int, int], image_shape: Tuple[int, int]) -> np.ndarray:
+    gain = min(input_shape[0] / image_shape[0], input_shape[1] / image_shape[1])
+    pad_x = round((input_shape[1] - image_shape[1] * gain) / 2 - 0.1)
+    pad_y = round((input_shape[0] - image_shape[0] * gain) / 2 - 0.1)
+    boxes[:, [0, 2]] = ((boxes[:, [0, 2]] - pad_x) / gain).clip(0, image_shape[1])
+    boxes[:, [1, 3]] = ((boxes[:, [1, 3]] - pad_y) / gain).clip(0, image_shape[0])
+    return boxes
+
+
+def _nms(pred: np.ndarray, conf: float, iou: float) -> np.ndarray:
+    # pred: (A, 4 + nc) raw YOLOv8-style head output, boxes as cx, cy, w, h.
+    scores = pred[:, 4:]
+    class_ids = scores.argmax(axis=1)
+    confidences = scores[np.arange(len(scores)), class_ids]
+    keep = confidences > conf
+    if not keep.any():
+        return np.empty((0, 6), np.float32)
+    boxes, confidences, class_ids = pred[keep, :4], confidences[keep], class_ids[keep]
+    if len(confidences) > _MAX_NMS:
+        top = np.argsort(-confidences)[:_MAX_NMS]
+        boxes, confidences, class_ids = boxes[top], confidences[top], class_ids[top]
+    xywh = boxes.copy()
+    xywh[:, :2] -= xywh[:, 2:] / 2
+    # Class-aware NMS, like ultralytics' default (agnostic=False).
+    kept = cv2.dnn.NMSBoxesBatched(xywh.tolist(), confidences.tolist(), class_ids.tolist(), conf, iou)
+    kept = np.asarray(kept, np.int64).reshape(-1)[:_MAX_DET]
+    out = np.empty((len(kept), 6), np.float32)
+    out[:, :2] = xywh[kept, :2]
+    out[:, 2:4] = xywh[kept, :2] + xywh[kept, 2:]
+    out[:, 4] = confidences[kept]
+    out[:, 5] = class_ids[kept]
+    return out
+
+
+class _ExportedBackend:
+    # Letterbox preprocessing and YOLO postprocessing around an exported graph
+    # (dynamic batch and input size). Subclasses provide _run(blob) -> output.
+    name = ""
+    thread_safe = True
+    agreement: Optional[float] = None
+
+    def __init__(self, artifact: str, names: Dict[int, str], stride: int, end2end: bool, precision: str = "fp32"):
+        self.artifact = artifact
+        self.precision = precision
+        self.names = names
+        self.stride = stride
+        self.end2end = end2end
+
+    def _run(self, blob: np.ndarray) -> np.ndarray:
+        raise NotImplementedError
+
+    def predict(self, images, imgsz: int, conf: float, iou: float) -> List[BackendResult]:
+        if isinstance(images, np.ndarray):
+            images = [images]
+        started = time.perf_counter()
+        # Minimal (stride-aligned) padding when all images share a shape, a
+        # square input otherwise - the same rule ultralytics uses for .pt models.
+        same_shape = len({image.shape for image in images}) == 1
+        blob = preprocess(images, imgsz, auto=same_shape, stride=self.stride)
+        preprocessed = time.perf_counter()
+
+        output = self._run(blob)
+        inferred = time.perf_counter()
+
+        input_shape = blob.shape[2:]
+        results = []
+        for image, pred in zip(images, output):
+            if self.end2end:
+                data = pred[pred[:, 4] > conf].astype(np.float32)
+            else:
+                data = _nms(pred.T, conf, iou)
+            scale_boxes(data[:, :4], input_shape, image.shape[:2])
+            results.append(data)
+        finished = time.perf_counter()
+
+        n = len(images)
+        speed = {
+            "preprocess": (preprocessed - started) * 1000 / n,
+            "inference": (inferred - preprocessed) * 1000 / n,
+            "postprocess": (finished - inferred) * 1000 / n,
+        }
+        return [BackendResult(data, dict(speed)) for data in results]
+
+
+class OnnxBackend(_ExportedBackend):
+    name = "onnx"
+
+    def __init__(
+        self,
+        artifact: str,
+        device: str = "cpu",
+        intra_op_threads: int = DEFAULT_INTRA_OP_THREADS,
+        inter_op_threads: int = DEFAULT_INTER_OP_THREADS,
+        precision: str = "fp32",
+    ):
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if intra_op_threads:
+            options.intra_op_num_threads = intra_op_threads
+        if inter_op_threads:
+            options.inter_op_num_threads = inter_op_threads
+        providers = ["CPUExecutionProvider"]
+        if device == "cuda" and "CUDAExecutionProvider" in ort.get_available_providers():
+            providers.insert(0, "CUDAExecutionProvider")
+        self.session = ort.InferenceSession(artifact, options, providers=providers)
+        self.input_name = self.session.get_inputs()[0].name
+
+        meta = self.session.get_modelmeta().custom_metadata_map
+        super().__init__(
+            artifact,
+            names=ast.literal_eval(meta.get("names", "{}")),
+            stride=int(meta.get("stride", 32)),
+            end2end=meta.get("end2end") == "True",
+            precision=precision,
+        )
+
+    def _run(self, blob: np.ndarray) -> np.ndarray:
+        return self.session.run(None, {self.input_name: blob})[0]
+
+
+class OpenVinoBackend(_ExportedBackend):
+    name = "openvino"
+    # A compiled model's implicit infer request is not reentrant.
+    thread_safe = False
+
+    def __init__(self, artifact: str, threads: int = DEFAULT_OPENVINO_THREADS, precision: str = "fp32"):
+        import openvino as ov
+        import yaml
+
+        config = {"INFERENCE_NUM_THREADS": threads} if threads else {}
+        if precision == "fp16":
+            config["INFERENCE_PRECISION_HINT"] = "f16"
+        xml = next(f for f in os.listdir(artifact) if f.endswith(".xml"))
+        self.compiled = ov.Core().compile_model(os.path.join(artifact, xml), "CPU", config)
+        with open(os.path.join(artifact, "metadata.yaml"), encoding="utf-8") as f:
+            meta = yaml.safe_load(f)
+        super().__init__(
+            artifact,
+            names={int(k): v for k, v in meta.get("names", {}).items()},
+            stride=int(meta.get("stride", 32)),
+            end2end=bool(meta.get("end2end", False)),
+            precision=precision,
+        )
+
+    def _run(self, blob: np.ndarray) -> np.ndarray:
+        return self.compiled(blob)[self.compiled.output(0)]
+
+
+def export_path(model_path: str, backend: str) -> str:
+    # Where ultralytics writes the export: best.onnx / best_openvino_model/.
+    stem = os.path.splitext(model_path)[0]
+    return stem + ".onnx" if backend == "onnx" else stem + "_openvino_model"
+
+
+def export_model(model_path: str, backend: str, image_size: int = DEFAULT_IMAGE_SIZE) -> str:
+    # Exports once and reuses the artifact next to the .pt until the .pt changes.
+    artifact = export_path(model_path, backend)
+    with _EXPORT_LOCK:
+        if os.path.exists(artifact) and os.path.getmtime(artifact) >= os.path.getmtime(model_path):
+            return artifact
+        from ultralytics import YOLO
+
+        logger.info(f"Exporting {model_path} to {backend} (imgsz={image_size})")
+        started = time.perf_counter()
+        exported = YOLO(model_path).export(
+            format=backend, imgsz=image_size, dynamic=True, verbose=False
+        )
+        if os.path.abspath(exported) != os.path.abspath(artifact):
+            os.replace(exported, artifact)
+        logger.info(f"Exported {artifact} in {time.perf_counter() - started:.1f}s")
+        return artifact
+
+
+def load_backend(model_path: str, device: str = "cpu", backend: str = DEFAULT_BACKEND,
+                 precision: str = DEFAULT_PRECISION):
+    from .spot_classifier import CLASSIFIER_BACKEND, load_classifier
+
+    if backend == CLASSIFIER_BACKEND:
+        return load_classifier(model_path, device)
+    if backend not in BACKENDS:
+        raise ValueError(f"Backend must be one of {BACKENDS}, got {backend}")
+    if backend == "torch":
+        reference = UltralyticsBackend(model_path, device)
+    else:
+        try:
+            artifact = export_model(model_path, backend)
+            reference = OnnxBackend(artifact, device) if backend == "onnx" else OpenVinoBackend(artifact)
+        except Exception as e:
+            # A missing runtime or a failed export should not take the service down.
+            logger.warning(f"{backend} backend unavailable ({e}), falling back to torch")
+            reference = UltralyticsBackend(model_path, device)
+    if precision == "fp32":
+        return reference
+
+    from .quantization import load_variant
+
+    try:
+        return load_variant(model_path, device, reference, precision)
+    except Exception as e:
+        logger.warning(f"{precision} {reference.name} variant not used ({e}), running fp32")
+        return reference
@@ -0,0 +1,229 @@
+import contextvars
+import logging
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, InvalidStateError
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from ..utils.configs import (
+    BATCH_MAX_SIZE as DEFAULT_MAX_BATCH_SIZE,
+    BATCH_MAX_WAIT_MS as DEFAULT_MAX_WAIT_MS,
+)
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+
+class _BatchItem:
+    __slots__ = ("detector", "image", "transform", "future", "enqueued_at", "context")
+
+    def __init__(self, detector, image: np.ndarray, transform=None):
+        self.detector = detector
+        self.image = image
+        self.transform = transform
+        self.future: Future = Future()
+        self.enqueued_at = time.perf_counter()
+        # Post-processing runs in the submitter's context (request metrics labels).
+        self.context = contextvars.copy_context()
+
+
+# The caller may have cancelled the future (client went away) while the batch ran.
+def _resolve(item: _BatchItem, result) -> None:
+    try:
+        item.future.set_result(result)
+    except InvalidStateError:
+        pass
+
+
+def _fail(item: _BatchItem, exc: Exception) -> None:
+    try:
+        item.future.set_exception(exc)
+    except InvalidStateError:
+        pass
+
+
+class BatchScheduler:
+    # With an InferencePool as executor every image takes a pool slot when it is
+    # submitted and frees it when its future completes, so a full pool rejects
+    # requests up front (PoolSaturatedError) instead of growing the queue.
+    #
+    # Items whose detectors have equal `inference_key`s share a batch, which
+    # runs the first detector's `_predict` for every image. The key must
+    # therefore cover every detector input `_predict` reads (model, settings,
+    # polygons when crops or tiles derive from them); only `process_result`
+    # runs per detector.
+
+    def __init__(
+        self,
+        max_batch_size: int = DEFAULT_MAX_BATCH_SIZE,
+        max_wait_ms: float = DEFAULT_MAX_WAIT_MS,
+        executor=None,
+    ):
+        if not isinstance(max_batch_size, int) or max_batch_size < 1:
+            raise ValueError(f"max_batch_size must be a positive integer, got {max_batch_size}")
+        if max_wait_ms < 0:
+            raise ValueError(f"max_wait_ms must be non-negative, got {max_wait_ms}")
+
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.executor = executor
+
+        self._queue: "queue.Queue" = queue.Queue()
+        self._carry: deque = deque()
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+        self._batches = 0
+        self._items = 0
+        self._batch_sizes: Dict[int, int] = {}
+        self._max_queue_wait = 0.0
+
+    def start(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._thread = threading.Thread(target=self._run, name="batch-scheduler", daemon=True)
+        self._thread.start()
+        logger.info(
+            f"BatchScheduler started (max_batch_size={self.max_batch_size}, "
+            f"max_wait={self.max_wait * 1000:.1f}ms)"
+        )
+
+    def stop(self, timeout: float = 5.0) -> None:
+        if self._thread is None:
+            return
+        self._queue.put(_STOP)
+        self._thread.join(timeout)
+        self._thread = None
+        logger.info("BatchScheduler stopped")
+
+    def submit(self, detector, image: np.ndarray, transform=None, force: bool = False) -> Future:
+        if self._thread is None:
+            raise RuntimeError("BatchScheduler is not running")
+        admit = getattr(self.executor, "_admit", None)
+        if admit is not None:
+            admit(force)
+        item = _BatchItem(detector, image, transform)
+        if admit is not None:
+            item.future.add_done_callback(self.executor._on_done)
+        self._queue.put(item)
+        return item.future
+
+    def submit_many(self, items: List[tuple], force: bool = False) -> List[Future]:
+        # All or nothing: if one image is rejected the ones already queued are
+        # cancelled (freeing their slots) and the rejection is raised.
+        futures = []
+        try:
+            for item in items:
+                futures.append(self.submit(*item, force=force))
+        except BaseException:
+            for future in futures:
+                future.cancel()
+            raise
+        return futures
+
+    def stats(self) -> dict:
+        with self._lock:
+            avg = (self._items / self._batches) if self._batches else 0.0
+            return {
+                "max_batch_size": self.max_batch_size,
+                "max_wait_ms": round(self.max_wait * 1000, 2),
+                "pending": self._queue.qsize() + len(self._carry),
+                "batches": self._batches,
+                "items": self._items,
+                "avg_batch_size": round(avg, 2),
+                "batch_size_counts": dict(sorted(self._batch_sizes.items())),
+                "max_queue_wait_ms": round(self._max_queue_wait * 1000, 2),
+            }
+
+    def _next_item(self, timeout: Optional[float]):
+        if self._carry:
+            return self._carry.popleft()
+        try:
+            return self._queue.get(timeout=timeout) if timeout is not None else self._queue.get()
+        except queue.Empty:
+            return None
+
+    def _collect(self, first: _BatchItem) -> List[_BatchItem]:
+        batch = [first]
+        key = first.detector.inference_key
+        deadline = first.enqueued_at + self.max_wait
+        skipped = []
+
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0 and not self._carry and self._queue.empty():
+                break
+            item = self._next_item(max(remaining, 0.0))
+            if item is None:
+                break
+            if item is _STOP:
+                self._queue.put(_STOP)
+                break
+            if item.detector.inference_key == key:
+                batch.append(item)
+            else:
+                skipped.append(item)
+
+        # Items for a different model/config keep their arrival order for the next round.
+        self._carry.extendleft(reversed(skipped))
+        return batch
+
+    def _run(self) -> None:
+        while True:
+            first = self._next_item(None)
+            if first is _STOP:
+                break
+            if first is None:
+                continue
+            batch = self._collect(first)
+            if self.executor is None:
+                self._execute(batch)
+                continue
+            try:
+                # Items were admitted one by one at submit time.
+                self.executor.submit(self._execute, batch, admitted=True)
+            except Exception as exc:
+                logger.warning(f"Rejected batch of {len(batch)} images: {exc}")
+                for item in batch:
+                    _fail(item, exc)
+
+    def _execute(self, batch: List[_BatchItem]) -> None:
+        batch = [item for item in batch if not item.future.cancelled()]
+        if not batch:
+            return
+        started = time.perf_counter()
+        with self._lock:
+            self._batches += 1
+            self._items += len(batch)
+            self._batch_sizes[len(batch)] = self._batch_sizes.get(len(batch), 0) + 1
+            self._max_queue_wait = max(
+                self._max_queue_wait, max(started - item.enqueued_at for item in batch)
+            )
+
+        try:
+            # Same inference_key, so any detector of the batch predicts for all.
+            results = batch[0].context.run(batch[0].detector._predict, [item.image for item in batch])
+        except Exception as exc:
+            logger.error(f"Batched inference failed ({len(batch)} images): {exc}")
+            for item in batch:
+                _fail(item, exc)
+            return
+
+        for item, result in zip(batch, results):
+            try:
+                output = item.context.run(item.detector.process_result, item.image, result, item.transform)
+            except Exception as exc:
+                logger.warning(f"Failed to post-process batched result: {exc}")
+                _fail(item, exc)
+                continue
+            _resolve(item, output)
+
+        logger.debug(
+            f"Batch of {len(batch)} images done in "
+            f"{(time.perf_counter() - started) * 1000:.1f}ms"
+        )
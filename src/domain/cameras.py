@@ -0,0 +1,374 @@
+import contextvars
+import logging
+import os
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, Dict, List, Optional, Tuple, Union
+
+import cv2
+import numpy as np
+
+from ..utils import metrics
+from ..utils.configs import (
+    CAMERA_MAX_IN_FLIGHT as DEFAULT_MAX_IN_FLIGHT,
+    CAMERA_RECONNECT_DELAY as DEFAULT_RECONNECT_DELAY,
+    CAMERA_SCHEDULER_POLICY as DEFAULT_POLICY,
+)
+
+logger = logging.getLogger(__name__)
+
+_POLICIES = ("round_robin", "priority")
+
+
+class LatestFrameReader:
+    # Background reader for one live source. Frames are grab()-ed continuously so
+    # the source never backs up, but only converted to BGR (retrieve) when the
+    # scheduler asked for one; only the latest retrieved frame is kept. Local
+    # files stand in for cameras: they are paced at their own FPS and can loop.
+
+    def __init__(self, source: Union[int, str], loop: bool = False,
+                 reconnect_delay: float = DEFAULT_RECONNECT_DELAY, name: str = "camera"):
+        self.source = source
+        self.loop = loop
+        self.reconnect_delay = reconnect_delay
+        self.name = name
+        self.is_file = isinstance(source, str) and os.path.isfile(source)
+        self.status = "connecting"
+        self.error: Optional[str] = None
+        self.frames_grabbed = 0
+        self.reconnects = 0
+        self.on_frame: Optional[Callable[[], None]] = None
+
+        self._lock = threading.Lock()
+        self._wanted = threading.Event()
+        self._stop = threading.Event()
+        self._frame: Optional[np.ndarray] = None
+        self._frame_index = -1
+        self._captured_at = 0.0
+        self._seq = 0
+        self._thread = threading.Thread(target=metrics.bind_context(self._run), name=f"{name}-reader", daemon=True)
+        self._thread.start()
+
+    def request(self) -> None:
+        self._wanted.set()
+
+    def latest(self) -> Tuple[int, Optional[np.ndarray], int, float]:
+        with self._lock:
+            return self._seq, self._frame, self._frame_index, self._captured_at
+
+    def _open(self) -> Optional[cv2.VideoCapture]:
+        cap = cv2.VideoCapture(self.source)
+        if cap.isOpened():
+            return cap
+        cap.release()
+        return None
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            cap = self._open()
+            if cap is None:
+                self.status = "reconnecting"
+                self.error = f"Không thể mở nguồn: {self.source}"
+                self.reconnects += 1
+                self._stop.wait(self.reconnect_delay)
+                continue
+            self.status = "live"
+            self.error = None
+            try:
+                ended = self._read_loop(cap)
+            finally:
+                cap.release()
+            if ended:
+                self.status = "ended"
+                return
+            if not self._stop.is_set():
+                self.status = "reconnecting"
+                self.reconnects += 1
+                self._stop.wait(self.reconnect_delay)
+        self.status = "stopped"
+
+    def _read_loop(self, cap: cv2.VideoCapture) -> bool:
+        # Returns True when a non-looping file reached its end.
+        fps = cap.get(cv2.CAP_PROP_FPS) or 0.0
+        interval = 1.0 / fps if self.is_file and fps > 0 else 0.0
+        next_at = time.monotonic()
+        frame_index = 0
+        while not self._stop.is_set():
+            if interval:
+                delay = next_at - time.monotonic()
+                if delay > 0:
+                    self._stop.wait(delay)
+                next_at = max(next_at + interval, time.monotonic() - interval)
+            if not cap.grab():
+                if self.is_file:
+                    if not self.loop:
+                        return True
+                    cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+                    if cap.grab():
+                        frame_index = 0
+                    else:
+                        return True
+                else:
+                    self.error = "Mất kết nối nguồn"
+                    return False
+            self.frames_grabbed += 1
+            if self._wanted.is_set():
+                with metrics.timed("decode"):
+                    ok, frame = cap.retrieve()
+                if ok and frame is not None:
+                    with self._lock:
+                        self._frame = frame
+                        self._frame_index = frame_index
+                        self._captured_at = time.time()
+                        self._seq += 1
+                    self._wanted.clear()
+                    if self.on_frame is not None:
+                        self.on_frame()
+            frame_index += 1
+        return False
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join(timeout=5.0)
+
+
+class Camera:
+    __slots__ = (
+        "camera_id", "source", "polygon_id", "detector", "target_fps", "priority",
+        "reader", "next_due", "in_flight", "last_seq", "latest", "analyzed",
+        "failed", "skipped", "total_latency", "created_at", "context",
+    )
+
+    def __init__(self, camera_id: str, source: Union[int, str], detector, target_fps: float,
+                 priority: int = 0, polygon_id: Optional[str] = None, loop: bool = False):
+        self.camera_id = camera_id
+        self.source = source
+        self.polygon_id = polygon_id
+        self.detector = detector
+        self.target_fps = target_fps
+        self.priority = priority
+        self.reader = LatestFrameReader(source, loop=loop, name=f"camera-{camera_id}")
+        self.next_due = time.monotonic()
+        self.in_flight = False
+        self.last_seq = 0
+        self.latest: Optional[dict] = None
+        self.analyzed = 0
+        self.failed = 0
+        self.skipped = 0
+        self.total_latency = 0.0
+        self.created_at = time.time()
+        # Analysis of this camera's frames is labelled like the request that added it.
+        self.context = contextvars.copy_context()
+
+    @property
+    def period(self) -> float:
+        return 1.0 / self.target_fps
+
+    def to_dict(self) -> dict:
+        latest = self.latest
+        return {
+            "camera_id": self.camera_id,
+            "source": str(self.source),
+            "polygon_id": self.polygon_id,
+            "status": self.reader.status,
+            "error": self.reader.error,
+            "target_fps": self.target_fps,
+            "priority": self.priority,
+            "frames_grabbed": self.reader.frames_grabbed,
+            "reconnects": self.reader.reconnects,
+            "analyzed": self.analyzed,
+            "failed": self.failed,
+            "skipped": self.skipped,
+            "avg_latency_ms": round(self.total_latency / self.analyzed * 1000, 2) if self.analyzed else 0.0,
+            "last_analyzed_at": latest["analyzed_at"] if latest else None,
+            "summary": latest["summary"] if latest else None,
+        }
+
+
+class CameraManager:
+    # Registered live sources plus one scheduler thread that hands due cameras
+    # to `submit(detector, frame) -> Future` (the shared model via the batch
+    # scheduler / inference pool) at each camera's target rate, with at most
+    # max_in_flight inferences outstanding. Latest results are kept per camera.
+
+    def __init__(
+        self,
+        submit: Callable[[object, np.ndarray], Future],
+        max_in_flight: int = DEFAULT_MAX_IN_FLIGHT,
+        policy: str = DEFAULT_POLICY,
+    ):
+        if policy not in _POLICIES:
+            raise ValueError(f"policy must be one of {_POLICIES}, got {policy}")
+        if max_in_flight < 1:
+            raise ValueError(f"max_in_flight must be >= 1, got {max_in_flight}")
+        self.submit = submit
+        self.max_in_flight = max_in_flight
+        self.policy = policy
+
+        self._cameras: Dict[str, Camera] = {}
+        self._order: List[str] = []
+        self._rr_index = 0
+        self._in_flight = 0
+        self._cond = threading.Condition()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="camera-scheduler", daemon=True)
+        self._thread.start()
+        logger.info(f"CameraManager started (policy={self.policy}, max_in_flight={self.max_in_flight})")
+
+    def stop(self) -> None:
+        self._stop.set()
+        with self._cond:
+            self._cond.notify_all()
+            cameras = list(self._cameras.values())
+            self._cameras.clear()
+            self._order.clear()
+        if self._thread is not None:
+            self._thread.join(timeout=5.0)
+            self._thread = None
+        for camera in cameras:
+            camera.reader.stop()
+        logger.info("CameraManager stopped")
+
+    def add(self, camera: Camera) -> Camera:
+        with self._cond:
+            if camera.camera_id in self._cameras:
+                camera.reader.stop()
+                raise ValueError(f"Camera {camera.camera_id} already exists")
+            self._cameras[camera.camera_id] = camera
+            self._order.append(camera.camera_id)
+            camera.reader.on_frame = self._wake
+            self._cond.notify_all()
+        logger.info(f"Camera {camera.camera_id} added ({camera.source}, {camera.target_fps} fps)")
+        return camera
+
+    def remove(self, camera_id: str) -> bool:
+        with self._cond:
+            camera = self._cameras.pop(camera_id, None)
+            if camera is None:
+                return False
+            self._order.remove(camera_id)
+        camera.reader.stop()
+        logger.info(f"Camera {camera_id} removed")
+        return True
+
+    def _wake(self) -> None:
+        with self._cond:
+            self._cond.notify_all()
+
+    def get(self, camera_id: str) -> Optional[Camera]:
+        return self._cameras.get(camera_id)
+
+    def list(self) -> List[Camera]:
+        with self._cond:
+            return [self._cameras[camera_id] for camera_id in self._order]
+
+    def latest(self, camera_id: str) -> Optional[dict]:
+        camera = self._cameras.get(camera_id)
+        return camera.latest if camera is not None else None
+
+    def _pick(self, now: float) -> Tuple[Optional[Camera], float]:
+        # Returns a camera with a fresh frame ready to analyze, and how long to
+        # sleep otherwise. Due cameras get a frame requested from their reader.
+        wait = 0.5
+        ready: List[Camera] = []
+        for camera_id in self._order:
+            camera = self._cameras[camera_id]
+            if camera.in_flight:
+                continue
+            if now < camera.next_due:
+                wait = min(wait, camera.next_due - now)
+                continue
+            seq = camera.reader.latest()[0]
+            if seq > camera.last_seq:
+                ready.append(camera)
+            else:
+                # The reader wakes the scheduler once the frame is retrieved.
+                camera.reader.request()
+        if not ready:
+            return None, wait
+        if self.policy == "priority":
+            return max(ready, key=lambda c: (c.priority, now - c.next_due)), 0.0
+        n = len(self._order)
+        ready_ids = {c.camera_id for c in ready}
+        for i in range(n):
+            camera_id = self._order[(self._rr_index + i) % n]
+            if camera_id in ready_ids:
+                self._rr_index = (self._rr_index + i + 1) % n
+                return self._cameras[camera_id], 0.0
+        return ready[0], 0.0
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            with self._cond:
+                if self._in_flight >= self.max_in_flight or not self._cameras:
+                    self._cond.wait(0.5)
+                    continue
+                now = time.monotonic()
+                camera, wait = self._pick(now)
+                if camera is None:
+                    self._cond.wait(wait)
+                    continue
+                seq, frame, frame_index, captured_at = camera.reader.latest()
+                # Missed deadlines are not caught up in a burst.
+                missed = int((now - camera.next_due) // camera.period)
+                camera.skipped += max(0, missed)
+                camera.next_due = max(camera.next_due + camera.period, now)
+                camera.last_seq = seq
+                camera.in_flight = True
+                self._in_flight += 1
+            self._dispatch(camera, frame, frame_index, captured_at)
+
+    def _dispatch(self, camera: Camera, frame: np.ndarray, frame_index: int, captured_at: float) -> None:
+        started = time.perf_counter()
+        try:
+            future = camera.context.run(self.submit, camera.detector, frame)
+        except Exception as exc:
+            logger.warning(f"Camera {camera.camera_id}: inference rejected: {exc}")
+            self._done(camera, None, exc, started, frame_index, captured_at)
+            return
+        future.add_done_callback(
+            lambda f: self._done(camera, f, None, started, frame_index, captured_at)
+        )
+
+    def _done(self, camera: Camera, future: Optional[Future], error: Optional[Exception],
+              started: float, frame_index: int, captured_at: float) -> None:
+        if future is not None and error is None:
+            error = future.exception()
+        if error is None:
+            result = future.result()
+            latency = time.perf_counter() - started
+            result["camera_id"] = camera.camera_id
+            result["frame_number"] = frame_index
+            result["captured_at"] = captured_at
+            result["analyzed_at"] = time.time()
+            result["latency_ms"] = round(latency * 1000, 2)
+            # Replaced as a whole, so readers never see a half-updated result.
+            camera.latest = result
+            camera.analyzed += 1
+            camera.total_latency += latency
+        else:
+            camera.failed += 1
+            logger.warning(f"Camera {camera.camera_id}: inference failed: {error}")
+        with self._cond:
+            camera.in_flight = False
+            self._in_flight -= 1
+            self._cond.notify_all()
+
+    def stats(self) -> dict:
+        with self._cond:
+            cameras = list(self._cameras.values())
+            return {
+                "cameras": len(cameras),
+                "policy": self.policy,
+                "in_flight": self._in_flight,
+                "max_in_flight": self.max_in_flight,
+                "live": sum(1 for c in cameras if c.reader.status == "live"),
+                "analyzed": sum(c.analyzed for c in cameras),
+            }
@@ -0,0 +1,89 @@
+from typing import Dict, List, Optional
+
+import numpy as np
+
+
+class Detections:
+    # Structure-of-arrays container for the detections of one image:
+    # boxes (N, 4) xyxy, confidences (N,), class_ids (N,). Dicts are only built
+    # by to_list()/to_dict() when a result leaves the API.
+
+    __slots__ = ("boxes", "confidences", "class_ids", "names")
+
+    def __init__(
+        self,
+        boxes: np.ndarray,
+        confidences: np.ndarray,
+        class_ids: np.ndarray,
+        names: Optional[Dict[int, str]] = None,
+    ):
+        self.boxes = np.asarray(boxes, dtype=np.float32).reshape(-1, 4)
+        self.confidences = np.asarray(confidences, dtype=np.float32).reshape(-1)
+        self.class_ids = np.asarray(class_ids, dtype=np.int64).reshape(-1)
+        self.names = names or {}
+
+    @classmethod
+    def empty(cls, names: Optional[Dict[int, str]] = None) -> "Detections":
+        return cls(np.empty((0, 4)), np.empty(0), np.empty(0), names)
+
+    @classmethod
+    def concat(cls, parts: List["Detections"], names: Optional[Dict[int, str]] = None) -> "Detections":
+        parts = [p for p in parts if len(p)]
+        if not parts:
+            return cls.empty(names)
+        return cls(
+            np.concatenate([p.boxes for p in parts]),
+            np.concatenate([p.confidences for p in parts]),
+            np.concatenate([p.class_ids for p in parts]),
+            names or parts[0].names,
+        )
+
+    def __len__(self) -> int:
+        return len(self.confidences)
+
+    def __getitem__(self, key):
+        # Backwards compatible view of the old {'cars': [...], 'free_spots': [...]} dict.
+        if key == 'cars':
+            return self.of_class('car').to_list()
+        if key == 'free_spots':
+            return self.of_class('free').to_list()
+        raise KeyError(key)
+
+    @property
+    def centers(self) -> np.ndarray:
+        return np.stack(
+            [(self.boxes[:, 0] + self.boxes[:, 2]) / 2, (self.boxes[:, 1] + self.boxes[:, 3]) / 2],
+            axis=1,
+        )
+
+    def class_name(self, index: int) -> str:
+        class_id = int(self.class_ids[index])
+        return self.names.get(class_id, f"class_{class_id}")
+
+    def select(self, mask: np.ndarray) -> "Detections":
+        return Detections(self.boxes[mask], self.confidences[mask], self.class_ids[mask], self.names)
+
+    def class_mask(self, class_name: str) -> np.ndarray:
+        ids = [i for i, name in self.names.items() if name == class_name]
+        return np.isin(self.class_ids, ids)
+
+    def of_class(self, class_name: str) -> "Detections":
+        return self.select(self.class_mask(class_name))
+
+    def to_list(self) -> List[Dict]:
+        boxes = self.boxes.tolist()
+        confidences = self.confidences.tolist()
+        class_ids = self.class_ids.tolist()
+        return [
+            {
+                'bbox': box,
+                'center': [(box[0] + box[2]) / 2, (box[1] + box[3]) / 2],
+                'confidence': conf,
+                'class_id': class_id,
+                'class_name': self.names.get(class_id, f"class_{class_id}"),
+            }
+            for box, conf, class_id in zip(boxes, confidences, class_ids)
+        ]
+
+    def to_dict(self) -> Dict[str, List[Dict]]:
+        return {'cars': self['cars'], 'free_spots': self['free_spots']}
@@ -0,0 +1,79 @@
+import logging
+import threading
+from collections import OrderedDict
+from typing import Callable, Hashable, Optional
+
+from ..utils.configs import DETECTOR_CACHE_SIZE as DEFAULT_CACHE_SIZE
+
+logger = logging.getLogger(__name__)
+
+
+class DetectorRegistry:
+    def __init__(self, max_size: int = DEFAULT_CACHE_SIZE):
+        if not isinstance(max_size, int) or max_size < 1:
+            raise ValueError(f"max_size must be a positive integer, got {max_size}")
+        self.max_size = max_size
+        self._entries: "OrderedDict[Hashable, object]" = OrderedDict()
+        self._versions = {}
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    def get_or_create(
+        self,
+        source: str,
+        version: Hashable,
+        params: Hashable,
+        factory: Callable[[], object],
+    ):
+        key = (source, params)
+        with self._lock:
+            if self._versions.get(source, version) != version:
+                self._invalidate_locked(source)
+            detector = self._entries.get(key)
+            if detector is not None:
+                self._entries.move_to_end(key)
+                self._hits += 1
+                return detector
+            self._misses += 1
+
+        detector = factory()
+
+        with self._lock:
+            existing = self._entries.get(key)
+            if existing is not None:
+                return existing
+            self._entries[key] = detector
+            self._versions[source] = version
+            while len(self._entries) > self.max_size:
+                evicted, _ = self._entries.popitem(last=False)
+                self._evictions += 1
+                logger.debug(f"Evicted detector {evicted}")
+        return detector
+
+    def _invalidate_locked(self, source: str) -> None:
+        stale = [k for k in self._entries if k[0] == source]
+        for k in stale:
+            del self._entries[k]
+        self._versions.pop(source, None)
+        if stale:
+            logger.info(f"Polygon file changed, dropped {len(stale)} cached detector(s) for {source}")
+
+    def invalidate(self, source: Optional[str] = None) -> None:
+        with self._lock:
+            if source is None:
+                self._entries.clear()
+                self._versions.clear()
+            else:
+                self._invalidate_locked(source)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "hits": self._hits,
+                "misses": self._misses,
+                "evictions": self._evictions,
+            }
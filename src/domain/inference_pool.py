@@ -0,0 +1,221 @@
+import asyncio
+import logging
+import math
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Callable, Dict, Optional
+
+import numpy as np
+
+from ..utils import metrics
+from ..utils.configs import (
+    INFERENCE_MAX_QUEUE as DEFAULT_MAX_QUEUE,
+    INFERENCE_POOL_MODE as DEFAULT_MODE,
+    INFERENCE_WORKERS as DEFAULT_WORKERS,
+)
+
+logger = logging.getLogger(__name__)
+
+_POOL_MODES = ("thread", "process")
+
+
+class PoolSaturatedError(RuntimeError):
+    def __init__(self, queue_depth: int, retry_after: int):
+        super().__init__(f"Inference pool saturated ({queue_depth} tasks queued)")
+        self.queue_depth = queue_depth
+        self.retry_after = retry_after
+
+
+_WORKER_DETECTORS: Dict[tuple, object] = {}
+
+
+def _init_process_worker(model_path: str, device: str) -> None:
+    from .model_registry import MODEL_REGISTRY
+
+    # Each worker process has its own registry: warm it up and watch the model
+    # file so a replaced model is picked up here too.
+    MODEL_REGISTRY.warmup(MODEL_REGISTRY.entry(model_path, device))
+    MODEL_REGISTRY.start()
+
+
+def _detect_in_process(params: dict, image: np.ndarray, transform=None) -> dict:
+    from .parking_detector import ParkingDetector
+
+    key = tuple(value for name, value in params.items() if name != "polygons")
+    detector = _WORKER_DETECTORS.get(key)
+    if detector is None:
+        detector = ParkingDetector(**params)
+        _WORKER_DETECTORS[key] = detector
+    return detector.detect(image, transform)
+
+
+class InferencePool:
+    def __init__(
+        self,
+        max_workers: int = DEFAULT_WORKERS,
+        max_queue: int = DEFAULT_MAX_QUEUE,
+        mode: str = DEFAULT_MODE,
+        model_path: Optional[str] = None,
+        device: str = "cpu",
+    ):
+        if not isinstance(max_workers, int) or max_workers < 1:
+            raise ValueError(f"max_workers must be a positive integer, got {max_workers}")
+        if not isinstance(max_queue, int) or max_queue < 0:
+            raise ValueError(f"max_queue must be a non-negative integer, got {max_queue}")
+        if mode not in _POOL_MODES:
+            raise ValueError(f"Pool mode must be one of {_POOL_MODES}, got {mode}")
+        if mode == "process" and not model_path:
+            raise ValueError("Process pool requires model_path to preload the model in each worker")
+
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.mode = mode
+
+        # The thread pool always exists: streaming generators and batch execution
+        # need shared in-process state and cannot be shipped to another process.
+        self._threads = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="inference")
+        self._processes: Optional[ProcessPoolExecutor] = None
+        if mode == "process":
+            self._processes = ProcessPoolExecutor(
+                max_workers=max_workers,
+                initializer=_init_process_worker,
+                initargs=(model_path, device),
+            )
+
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._running = 0
+        self._submitted = 0
+        self._completed = 0
+        self._rejected = 0
+        self._total_wait = 0.0
+        self._max_wait = 0.0
+        self._total_run = 0.0
+
+        logger.info(f"InferencePool started (mode={mode}, workers={max_workers}, max_queue={max_queue})")
+
+    @property
+    def capacity(self) -> int:
+        return self.max_workers + self.max_queue
+
+    def is_saturated(self) -> bool:
+        with self._lock:
+            return self._in_flight >= self.capacity
+
+    def retry_after(self) -> int:
+        with self._lock:
+            avg_run = (self._total_run / self._completed) if self._completed else 1.0
+            depth = max(0, self._in_flight - self._running)
+        return max(1, math.ceil(avg_run * (depth + 1) / self.max_workers))
+
+    def _admit(self, force: bool) -> None:
+        with self._lock:
+            if not force and self._in_flight >= self.capacity:
+                self._rejected += 1
+                depth = self._in_flight - self._running
+                rejected = True
+            else:
+                self._in_flight += 1
+                self._submitted += 1
+                rejected = False
+        if rejected:
+            raise PoolSaturatedError(depth, self.retry_after())
+
+    def _on_done(self, _future: Future) -> None:
+        with self._lock:
+            self._in_flight -= 1
+
+    def submit(self, fn: Callable, *args, force: bool = False, admitted: bool = False) -> Future:
+        # admitted=True: the slots were taken earlier (micro-batched images hold
+        # one each), so this task neither takes nor frees one.
+        if not admitted:
+            self._admit(force)
+        submitted_at = time.perf_counter()
+        # The task runs in the submitter's context (request metrics labels).
+        fn = metrics.bind_context(fn)
+
+        def _task():
+            started = time.perf_counter()
+            wait = started - submitted_at
+            with self._lock:
+                self._running += 1
+                self._total_wait += wait
+                self._max_wait = max(self._max_wait, wait)
+            try:
+                return fn(*args)
+            finally:
+                with self._lock:
+                    self._running -= 1
+                    self._completed += 1
+                    self._total_run += time.perf_counter() - started
+
+        future = self._threads.submit(_task)
+        if not admitted:
+            future.add_done_callback(self._on_done)
+        return future
+
+    def submit_detect(self, detector, image: np.ndarray, transform=None, force: bool = False) -> Future:
+        if self._processes is None:
+            return self.submit(detector.detect, image, transform, force=force)
+
+        self._admit(force)
+        params = {
+            "polygons": detector.original_polygons,
+            "model_path": detector.model_path,
+            "car_confidence": detector.car_confidence,
+            "free_confidence": detector.free_confidence,
+            "general_confidence": detector.general_confidence,
+            "device": detector.device,
+            "image_size": detector.image_size,
+            "backend": detector.backend,
+            "precision": detector.precision,
+            "tiled": detector.tiled,
+            "tile_size": detector.tile_size,
+            "tile_overlap": detector.tile_overlap,
+            "engine": detector.engine,
+            "classifier_path": detector.classifier_path,
+            "polygon_key": detector.polygon_key,
+        }
+        submitted_at = time.perf_counter()
+        future = self._processes.submit(_detect_in_process, params, image, transform)
+
+        def _finish(_future: Future) -> None:
+            elapsed = time.perf_counter() - submitted_at
+            with self._lock:
+                self._completed += 1
+                self._total_run += elapsed
+            self._on_done(_future)
+
+        future.add_done_callback(_finish)
+        return future
+
+    async def run(self, fn: Callable, *args, force: bool = False):
+        return await asyncio.wrap_future(self.submit(fn, *args, force=force))
+
+    async def run_detect(self, detector, image: np.ndarray, transform=None) -> dict:
+        return await asyncio.wrap_future(self.submit_detect(detector, image, transform))
+
+    def stats(self) -> dict:
+        with self._lock:
+            started = self._completed + self._running
+            return {
+                "mode": self.mode,
+                "workers": self.max_workers,
+                "max_queue": self.max_queue,
+                "in_flight": self._in_flight,
+                "running": self._running,
+                "queue_depth": max(0, self._in_flight - self._running),
+                "submitted": self._submitted,
+                "completed": self._completed,
+                "rejected": self._rejected,
+                "avg_wait_ms": round(self._total_wait / started * 1000, 2) if started else 0.0,
+                "max_wait_ms": round(self._max_wait * 1000, 2),
+                "avg_run_ms": round(self._total_run / self._completed * 1000, 2) if self._completed else 0.0,
+            }
+
+    def shutdown(self, wait: bool = True) -> None:
+        self._threads.shutdown(wait=wait, cancel_futures=True)
+        if self._processes is not None:
+            self._processes.shutdown(wait=wait, cancel_futures=True)
+        logger.info("InferencePool stopped")
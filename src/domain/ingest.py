@@ -0,0 +1,180 @@
+import logging
+import threading
+import time
+from typing import Optional, Tuple
+
+import cv2
+import numpy as np
+
+from ..utils.configs import (
+    INGEST_BASELINE_EVERY,
+    INGEST_CROP_TO_POLYGONS,
+    INGEST_REDUCED_DECODE,
+    INGEST_ROI_MARGIN,
+)
+from ..utils import metrics
+from ..utils.image_utils import choose_reduced_decode, decode_image_bytes, is_jpeg, read_image_size
+from .detections import Detections
+
+logger = logging.getLogger(__name__)
+
+
+class FrameTransform:
+    # Maps pixel coordinates of the (reduced and/or cropped) inference image back
+    # to the full-resolution frame: full = inference * scale + offset.
+    __slots__ = ("original_size", "scale", "offset")
+
+    def __init__(
+        self,
+        original_size: Tuple[int, int],
+        scale: Tuple[float, float] = (1.0, 1.0),
+        offset: Tuple[float, float] = (0.0, 0.0),
+    ):
+        self.original_size = (int(original_size[0]), int(original_size[1]))
+        self.scale = (float(scale[0]), float(scale[1]))
+        self.offset = (float(offset[0]), float(offset[1]))
+
+    def __getstate__(self):
+        return (self.original_size, self.scale, self.offset)
+
+    def __setstate__(self, state):
+        self.original_size, self.scale, self.offset = state
+
+    @property
+    def is_identity(self) -> bool:
+        return self.scale == (1.0, 1.0) and self.offset == (0.0, 0.0)
+
+    def apply(self, detections: Detections) -> Detections:
+        if self.is_identity or len(detections) == 0:
+            return detections
+        sx, sy = self.scale
+        ox, oy = self.offset
+        boxes = detections.boxes * np.array([sx, sy, sx, sy], dtype=np.float32)
+        boxes += np.array([ox, oy, ox, oy], dtype=np.float32)
+        return Detections(boxes, detections.confidences, detections.class_ids, detections.names)
+
+
+class _IngestStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.images = 0
+        self.reduced = 0
+        self.cropped = 0
+        self.decode_ms = 0.0
+        self.baseline_samples = 0
+        self.baseline_decode_ms = 0.0
+        self.sampled_decode_ms = 0.0
+
+    def record(self, decode_ms: float, factor: int, cropped: bool, baseline_ms: Optional[float]) -> None:
+        with self._lock:
+            self.images += 1
+            self.reduced += factor > 1
+            self.cropped += cropped
+            self.decode_ms += decode_ms
+            if baseline_ms is not None:
+                self.baseline_samples += 1
+                self.baseline_decode_ms += baseline_ms
+                self.sampled_decode_ms += decode_ms
+
+    def due_for_baseline(self) -> bool:
+        with self._lock:
+            return INGEST_BASELINE_EVERY > 0 and self.reduced % INGEST_BASELINE_EVERY == 0
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            avg_saved = (
+                (self.baseline_decode_ms - self.sampled_decode_ms) / self.baseline_samples
+                if self.baseline_samples else None
+            )
+            return {
+                "images": self.images,
+                "reduced_decodes": self.reduced,
+                "cropped": self.cropped,
+                "avg_decode_ms": round(self.decode_ms / self.images, 2) if self.images else 0.0,
+                "baseline_samples": self.baseline_samples,
+                "avg_decode_ms_saved": round(avg_saved, 2) if avg_saved is not None else None,
+            }
+
+
+_STATS = _IngestStats()
+
+
+def ingest_stats() -> dict:
+    return _STATS.snapshot()
+
+
+def _roi_in_full_frame(detector, size: Tuple[int, int]) -> Optional[Tuple[int, int, int, int]]:
+    x0, y0, x1, y1 = detector.polygon_bounds(size, INGEST_ROI_MARGIN)
+    if x1 - x0 >= size[0] and y1 - y0 >= size[1]:
+        return None
+    return x0, y0, x1, y1
+
+
+def ingest_image(
+    buf,
+    detector,
+    reduced_decode: bool = INGEST_REDUCED_DECODE,
+    crop_to_polygons: bool = INGEST_CROP_TO_POLYGONS,
+) -> Tuple[np.ndarray, Optional[FrameTransform], dict]:
+    if detector.full_frame_input:
+        reduced_decode = crop_to_polygons = False
+    header_size = read_image_size(buf)
+
+    flag, factor = cv2.IMREAD_COLOR, 1
+    roi = None
+    if header_size is not None:
+        if crop_to_polygons:
+            roi = _roi_in_full_frame(detector, header_size)
+        if reduced_decode and is_jpeg(buf):
+            region = (roi[2] - roi[0], roi[3] - roi[1]) if roi else header_size
+            flag, factor = choose_reduced_decode(region, detector.image_size)
+
+    started = time.perf_counter()
+    image = decode_image_bytes(buf, flag)
+    decode_ms = (time.perf_counter() - started) * 1000
+    metrics.observe_stage("decode", decode_ms / 1000)
+
+    baseline_ms = None
+    if factor > 1 and _STATS.due_for_baseline():
+        started = time.perf_counter()
+        decode_image_bytes(buf, cv2.IMREAD_COLOR)
+        baseline_ms = (time.perf_counter() - started) * 1000
+
+    dec_h, dec_w = image.shape[:2]
+    if header_size is None:
+        original_size = (dec_w * factor, dec_h * factor)
+    elif abs(dec_w * factor - header_size[0]) < factor and abs(dec_h * factor - header_size[1]) < factor:
+        original_size = header_size
+    else:
+        # imdecode đã xoay ảnh theo EXIF orientation.
+        original_size = (header_size[1], header_size[0])
+        if crop_to_polygons:
+            roi = _roi_in_full_frame(detector, original_size)
+
+    scale_x = original_size[0] / dec_w
+    scale_y = original_size[1] / dec_h
+    offset = (0.0, 0.0)
+    if roi is not None:
+        cx0 = int(roi[0] / scale_x)
+        cy0 = int(roi[1] / scale_y)
+        cx1 = min(dec_w, int(np.ceil(roi[2] / scale_x)))
+        cy1 = min(dec_h, int(np.ceil(roi[3] / scale_y)))
+        image = np.ascontiguousarray(image[cy0:cy1, cx0:cx1])
+        offset = (cx0 * scale_x, cy0 * scale_y)
+
+    transform = FrameTransform(original_size, (scale_x, scale_y), offset)
+    _STATS.record(decode_ms, factor, roi is not None, baseline_ms)
+
+    report = {
+        "original_size": list(original_size),
+        "decoded_size": [dec_w, dec_h],
+        "reduction_factor": factor,
+        "roi": list(roi) if roi is not None else None,
+        "inference_size": [image.shape[1], image.shape[0]],
+        "decode_ms": round(decode_ms, 2),
+        "decode_pixels_saved": round(1 - (dec_w * dec_h) / (original_size[0] * original_size[1]), 4),
+    }
+    if baseline_ms is not None:
+        report["full_decode_ms"] = round(baseline_ms, 2)
+        report["decode_ms_saved"] = round(baseline_ms - decode_ms, 2)
+    return image, (None if transform.is_identity else transform), report
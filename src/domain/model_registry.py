@@ -0,0 +1,293 @@
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextlib import nullcontext
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from ..utils.configs import (
+    INFERENCE_BACKEND as DEFAULT_BACKEND,
+    IMAGE_SIZE as DEFAULT_IMAGE_SIZE,
+    MODEL_CACHE_MAX_BYTES as DEFAULT_MAX_BYTES,
+    MODEL_CACHE_MAX_MODELS as DEFAULT_MAX_MODELS,
+    MODEL_PRECISION as DEFAULT_PRECISION,
+    MODEL_WARMUP_RUNS as DEFAULT_WARMUP_RUNS,
+    MODEL_WATCH_INTERVAL as DEFAULT_WATCH_INTERVAL,
+)
+from .backends import load_backend
+
+logger = logging.getLogger(__name__)
+
+ModelSpec = Tuple[str, str, str, str]   # (model_path, device, backend, precision)
+
+
+def _rss_bytes() -> int:
+    try:
+        import psutil
+
+        return psutil.Process().memory_info().rss
+    except ImportError:
+        pass
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return 0
+
+
+def model_lock(model):
+    # Ultralytics predictors keep per-call state, so calls on a shared model are
+    # serialized; onnxruntime sessions can run concurrently.
+    return nullcontext() if getattr(model, "thread_safe", False) else threading.Lock()
+
+
+class ModelEntry:
+    # `current` is a (model, lock) pair replaced in one assignment on reload, so
+    # a caller that already read it finishes on the old model. It is None once
+    # the entry was evicted; holders then ask the registry again.
+    __slots__ = (
+        "spec", "current", "mtime", "pending_mtime", "loaded_at", "load_seconds",
+        "memory_bytes", "warmup_ms", "last_used", "reloads", "last_error", "reload_lock",
+    )
+
+    def __init__(self, spec: Optional[ModelSpec], model=None):
+        self.spec = spec
+        self.current = (model, model_lock(model)) if model is not None else None
+        self.mtime: Optional[float] = None
+        self.pending_mtime: Optional[float] = None
+        self.loaded_at: Optional[float] = None
+        self.load_seconds = 0.0
+        self.memory_bytes = 0
+        self.warmup_ms: Optional[float] = None
+        self.last_used = time.monotonic()
+        self.reloads = 0
+        self.last_error: Optional[str] = None
+        self.reload_lock = threading.Lock()
+
+    @property
+    def model(self):
+        current = self.current
+        return current[0] if current is not None else None
+
+    def to_dict(self) -> dict:
+        model = self.model
+        model_path, device, backend, precision = self.spec or (None, None, None, None)
+        return {
+            "model_path": model_path,
+            "device": device,
+            "backend": model.name if model is not None else backend,
+            "precision": model.precision if model is not None else precision,
+            "spot_agreement": getattr(model, "agreement", None),
+            "loaded": model is not None,
+            "loaded_at": self.loaded_at,
+            "load_s": round(self.load_seconds, 2),
+            "memory_mb": round(self.memory_bytes / 1024 ** 2, 1),
+            "warmup_ms": self.warmup_ms,
+            "idle_s": round(time.monotonic() - self.last_used, 1),
+            "reloads": self.reloads,
+            "last_error": self.last_error,
+        }
+
+
+class ModelRegistry:
+    # Loaded inference backends keyed by (path, device, backend, precision).
+    # Least recently used models are dropped once more than max_models are
+    # loaded or their measured memory exceeds max_bytes. A watcher thread
+    # reloads a model when its file changes; reload() does the same on demand.
+    # The replacement is loaded and warmed up before it is swapped in.
+
+    def __init__(
+        self,
+        max_models: int = DEFAULT_MAX_MODELS,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+        watch_interval: float = DEFAULT_WATCH_INTERVAL,
+        warmup_runs: int = DEFAULT_WARMUP_RUNS,
+        image_size: int = DEFAULT_IMAGE_SIZE,
+    ):
+        if max_models < 1:
+            raise ValueError(f"max_models must be >= 1, got {max_models}")
+        self.max_models = max_models
+        self.max_bytes = max_bytes
+        self.watch_interval = watch_interval
+        self.warmup_runs = warmup_runs
+        self.image_size = image_size
+        self._entries: "OrderedDict[ModelSpec, ModelEntry]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._evictions = 0
+
+    def entry(self, model_path: str, device: str = "cpu", backend: str = DEFAULT_BACKEND,
+              precision: str = DEFAULT_PRECISION) -> ModelEntry:
+        spec = (model_path, device, backend, precision)
+        with self._lock:
+            entry = self._entries.get(spec)
+            if entry is not None and entry.current is not None:
+                self._entries.move_to_end(spec)
+                entry.last_used = time.monotonic()
+                return entry
+
+        if not os.path.exists(model_path):
+            raise FileNotFoundError(f"Model file not found at: {model_path}")
+
+        # One load at a time keeps the RSS delta attributable to this model.
+        with self._load_lock:
+            with self._lock:
+                entry = self._entries.get(spec)
+                if entry is not None and entry.current is not None:
+                    return entry
+            entry = ModelEntry(spec)
+            try:
+                self._load_into(entry)
+            except Exception as e:
+                logger.error(f"Failed to load model: {e}")
+                raise
+            with self._lock:
+                self._entries[spec] = entry
+                self._evict_locked()
+        return entry
+
+    def get(self, model_path: str, device: str = "cpu", backend: str = DEFAULT_BACKEND,
+            precision: str = DEFAULT_PRECISION):
+        return self.entry(model_path, device, backend, precision).model
+
+    def _load_into(self, entry: ModelEntry, warmup: bool = False) -> None:
+        model_path, device, backend, precision = entry.spec
+        logger.info(f"Loading new model from {model_path} (backend: {backend}, precision: {precision})")
+        mtime = os.path.getmtime(model_path)
+        rss_before = _rss_bytes()
+        started = time.perf_counter()
+        model = load_backend(model_path, device, backend, precision)
+        load_seconds = time.perf_counter() - started
+        memory = max(0, _rss_bytes() - rss_before)
+        if warmup:
+            entry.warmup_ms = self._warmup(model)
+        entry.current = (model, model_lock(model))
+        entry.mtime = entry.pending_mtime = mtime
+        entry.loaded_at = time.time()
+        entry.load_seconds = load_seconds
+        entry.memory_bytes = memory
+        entry.last_error = None
+        logger.info(
+            f"Model loaded (backend: {model.name}, precision: {model.precision}) "
+            f"in {load_seconds:.2f}s, +{memory / 1024 ** 2:.0f} MB"
+        )
+
+    def _warmup(self, model, image_size: Optional[int] = None, batch_size: int = 1) -> Optional[float]:
+        # First calls pay for lazy init / graph optimization; run them here.
+        if self.warmup_runs <= 0:
+            return None
+        size = image_size or self.image_size
+        frame = np.full((size, size, 3), 114, np.uint8)
+        timings = []
+        for _ in range(self.warmup_runs):
+            started = time.perf_counter()
+            model.predict([frame] * batch_size, imgsz=size, conf=0.25, iou=0.7)
+            timings.append((time.perf_counter() - started) * 1000)
+        return round(timings[-1], 2)
+
+    def warmup(self, entry: ModelEntry, image_size: Optional[int] = None, batch_size: int = 1) -> Optional[float]:
+        model = entry.model
+        if model is None:
+            return None
+        with entry.current[1]:
+            entry.warmup_ms = self._warmup(model, image_size, batch_size)
+        logger.info(f"Model {entry.spec[0]} warmed up ({entry.warmup_ms} ms/inference)")
+        return entry.warmup_ms
+
+    def _evict_locked(self) -> None:
+        while len(self._entries) > 1 and (
+            len(self._entries) > self.max_models
+            or sum(e.memory_bytes for e in self._entries.values()) > self.max_bytes
+        ):
+            spec, entry = self._entries.popitem(last=False)
+            entry.current = None
+            self._evictions += 1
+            logger.info(f"Evicted model {spec} ({entry.memory_bytes / 1024 ** 2:.0f} MB)")
+
+    def reload(self, model_path: Optional[str] = None) -> List[ModelEntry]:
+        with self._lock:
+            entries = [e for e in self._entries.values()
+                       if e.current is not None and (model_path is None or e.spec[0] == model_path)]
+        for entry in entries:
+            self._reload(entry)
+        return entries
+
+    def _reload(self, entry: ModelEntry) -> bool:
+        with entry.reload_lock:
+            try:
+                with self._load_lock:
+                    self._load_into(entry, warmup=True)
+            except Exception as e:
+                # The old model keeps serving.
+                entry.last_error = str(e)
+                logger.error(f"Reloading {entry.spec[0]} failed, keeping the loaded model: {e}")
+                return False
+            entry.reloads += 1
+            with self._lock:
+                self._evict_locked()
+            return True
+
+    def check_files(self) -> int:
+        # A changed file is reloaded once its mtime has been stable for one
+        # poll, so a model that is still being copied is not picked up.
+        reloaded = 0
+        with self._lock:
+            entries = [e for e in self._entries.values() if e.current is not None]
+        for entry in entries:
+            try:
+                mtime = os.path.getmtime(entry.spec[0])
+            except OSError:
+                continue
+            if mtime == entry.mtime:
+                continue
+            if mtime != entry.pending_mtime:
+                entry.pending_mtime = mtime
+                continue
+            logger.info(f"Model file {entry.spec[0]} changed, reloading")
+            reloaded += self._reload(entry)
+        return reloaded
+
+    def start(self) -> None:
+        if self.watch_interval <= 0 or (self._thread is not None and self._thread.is_alive()):
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._watch_loop, name="model-watcher", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5.0)
+            self._thread = None
+
+    def _watch_loop(self) -> None:
+        while not self._stop.wait(self.watch_interval):
+            try:
+                self.check_files()
+            except Exception as exc:
+                logger.warning(f"Model watcher failed: {exc}")
+
+    def clear(self) -> None:
+        with self._lock:
+            for entry in self._entries.values():
+                entry.current = None
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            entries = list(self._entries.values())
+        return {
+            "models": [e.to_dict() for e in reversed(entries)],
+            "max_models": self.max_models,
+            "memory_mb": round(sum(e.memory_bytes for e in entries) / 1024 ** 2, 1),
+            "max_memory_mb": round(self.max_bytes / 1024 ** 2, 1),
+            "evictions": self._evictions,
+        }
+
+
+MODEL_REGISTRY = ModelRegistry()
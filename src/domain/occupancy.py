@@ -0,0 +1,103 @@
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+
+class OccupancyEngine:
+    # Assigns detection centers to parking spots for one polygon set at one
+    # resolution. Matches ParkingDetector.check_polygon_occupancy: polygons are
+    # truncated to int32 like cv2.pointPolygonTest input, points on an edge count
+    # as inside, and each spot keeps the first detection (in detection order)
+    # whose center falls inside it.
+
+    def __init__(self, polygons: List[Dict]):
+        self.spot_count = len(polygons)
+        max_vertices = max((len(p['points']) for p in polygons), default=0)
+
+        vertices = np.zeros((self.spot_count, max(max_vertices, 1), 2), dtype=np.float64)
+        for i, poly in enumerate(polygons):
+            pts = np.asarray(poly['points'], dtype=np.float64).reshape(-1, 2)
+            if len(pts) == 0:
+                continue
+            pts = np.trunc(pts)
+            vertices[i, :len(pts)] = pts
+            # Pad with the last vertex: the extra edges have zero length and never count.
+            vertices[i, len(pts):] = pts[-1]
+
+        self._x1 = vertices[:, :, 0]
+        self._y1 = vertices[:, :, 1]
+        self._x2 = np.roll(self._x1, -1, axis=1)
+        self._y2 = np.roll(self._y1, -1, axis=1)
+
+        self._min_x = self._x1.min(axis=1) if self.spot_count else np.empty(0)
+        self._max_x = self._x1.max(axis=1) if self.spot_count else np.empty(0)
+        self._min_y = self._y1.min(axis=1) if self.spot_count else np.empty(0)
+        self._max_y = self._y1.max(axis=1) if self.spot_count else np.empty(0)
+
+    def bounds(self) -> Tuple[float, float, float, float]:
+        if self.spot_count == 0:
+            return 0.0, 0.0, 0.0, 0.0
+        return (
+            float(self._min_x.min()), float(self._min_y.min()),
+            float(self._max_x.max()), float(self._max_y.max()),
+        )
+
+    def _candidate_pairs(self, centers: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        px = centers[:, 0]
+        py = centers[:, 1]
+        in_bbox = (
+            (px[None, :] >= self._min_x[:, None]) & (px[None, :] <= self._max_x[:, None])
+            & (py[None, :] >= self._min_y[:, None]) & (py[None, :] <= self._max_y[:, None])
+        )
+        return np.nonzero(in_bbox)
+
+    def contains(self, centers: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        # Returns (spot_idx, detection_idx) for every center lying in a spot polygon.
+        centers = np.asarray(centers, dtype=np.float64).reshape(-1, 2)
+        if self.spot_count == 0 or len(centers) == 0:
+            empty = np.empty(0, dtype=np.intp)
+            return empty, empty
+
+        spot_idx, det_idx = self._candidate_pairs(centers)
+        if len(spot_idx) == 0:
+            return spot_idx, det_idx
+
+        px = centers[det_idx, 0][:, None]
+        py = centers[det_idx, 1][:, None]
+        x1 = self._x1[spot_idx]
+        y1 = self._y1[spot_idx]
+        x2 = self._x2[spot_idx]
+        y2 = self._y2[spot_idx]
+
+        dy = y2 - y1
+        straddles = (y1 > py) != (y2 > py)
+        safe_dy = np.where(straddles, dy, 1.0)
+        x_cross = x1 + (py - y1) * (x2 - x1) / safe_dy
+        crossings = np.count_nonzero(straddles & (px < x_cross), axis=1)
+
+        cross = (x2 - x1) * (py - y1) - dy * (px - x1)
+        on_edge = (
+            (np.abs(cross) <= 1e-9)
+            & (px >= np.minimum(x1, x2)) & (px <= np.maximum(x1, x2))
+            & (py >= np.minimum(y1, y2)) & (py <= np.maximum(y1, y2))
+        ).any(axis=1)
+
+        inside = (crossings % 2 == 1) | on_edge
+        return spot_idx[inside], det_idx[inside]
+
+    def first_match(self, centers: np.ndarray) -> np.ndarray:
+        # For each spot, index of the first center inside it, or -1.
+        centers = np.asarray(centers, dtype=np.float64).reshape(-1, 2)
+        first = np.full(self.spot_count, len(centers), dtype=np.intp)
+        spot_idx, det_idx = self.contains(centers)
+        if len(spot_idx):
+            np.minimum.at(first, spot_idx, det_idx)
+        first[first == len(centers)] = -1
+        return first
+
+    def assign(self, car_centers: np.ndarray, free_centers: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        # Cars take precedence: a spot's free match is only used when it has no car.
+        car_idx = self.first_match(car_centers)
+        free_idx = self.first_match(free_centers)
+        free_idx[car_idx >= 0] = -1
+        return car_idx, free_idx
@@ -1,9 +1,21 @@
 import os
+import hashlib
 import logging
+import time
 from typing import List, Dict, Tuple, Optional
 import numpy as np
 import cv2
-from ultralytics import YOLO
+
+from ..utils import metrics, profiling
+from ..utils.video_utils import FrameSampler
+from .backends import BackendResult
+from .detections import Detections
+from .ingest import FrameTransform
+from .model_registry import MODEL_REGISTRY, ModelEntry
+from .occupancy import OccupancyEngine
+from .spot_classifier import CLASSIFIER_BACKEND, SpotCropper
+from .temporal import TemporalOccupancyTracker
+from .tiling import TilePlan, plan_tiles
 
 from ..utils.configs import (
     CONFIDENCE_THRESHOLD as DEFAULT_CONFIDENCE,
@@ -13,36 +25,49 @@ from ..utils.configs import (
     FRAME_SKIP as DEFAULT_FRAME_SKIP,
     DEVICE as DEFAULT_DEVICE,
     IMAGE_SIZE as DEFAULT_IMAGE_SIZE,
-    MODEL_PATH as DEFAULT_MODEL_PATH
+    INFERENCE_BACKEND as DEFAULT_BACKEND,
+    MODEL_PRECISION as DEFAULT_PRECISION,
+    IOU_THRESHOLD as DEFAULT_IOU,
+    MODEL_PATH as DEFAULT_MODEL_PATH,
+    TILING_ENABLED as DEFAULT_TILED,
+    TILE_SIZE as DEFAULT_TILE_SIZE,
+    TILE_OVERLAP as DEFAULT_TILE_OVERLAP,
+    TILE_MAX_BATCH as DEFAULT_TILE_MAX_BATCH,
+    SPOT_ENGINE as DEFAULT_ENGINE,
+    CLASSIFIER_PATH as DEFAULT_CLASSIFIER_PATH,
+    CLASSIFIER_CROP_SIZE as DEFAULT_CROP_SIZE,
+    CLASSIFIER_MAX_BATCH as DEFAULT_CLASSIFIER_MAX_BATCH,
 )
 
 logger = logging.getLogger(__name__)
 
-_MODEL_CACHE = {}
-
-def get_or_load_model(model_path: str, device: str = "cpu") -> YOLO:
-    cache_key = f"{model_path}_{device}"
-  
-    if cache_key in _MODEL_CACHE:
-        logger.info(f"Using cached model from {model_path}")
-        return _MODEL_CACHE[cache_key]
-    
-    if not os.path.exists(model_path):
-        raise FileNotFoundError(f"Model file not found at: {model_path}")
-    
-    logger.info(f"Loading new model from {model_path}")
-    try:
-        model = YOLO(model_path)
-        _MODEL_CACHE[cache_key] = model
-        logger.info(f"Model loaded and cached successfully (key: {cache_key})")
-        return model
-    except Exception as e:
-        logger.error(f"Failed to load model: {e}")
-        raise
+_MAX_CACHED_RESOLUTIONS = 8
+# Spot croppers hold a remap table of count * crop_size^2 pixels each.
+_MAX_CACHED_CROPPERS = 2
+
+ENGINE_DETECTOR = "detector"
+ENGINE_CLASSIFIER = "classifier"
+ENGINES = (ENGINE_DETECTOR, ENGINE_CLASSIFIER)
+
+def get_or_load_model(model_path: str, device: str = "cpu", backend: str = DEFAULT_BACKEND,
+                      precision: str = DEFAULT_PRECISION):
+    return MODEL_REGISTRY.get(model_path, device, backend, precision)
+
+def _frame_resolution(image: np.ndarray, transform: Optional[FrameTransform]) -> Tuple[int, int]:
+    if transform is not None:
+        return transform.original_size
+    h, w = image.shape[:2]
+    return (w, h)
+
+def _object_info(detections: Detections, index: int) -> Dict:
+    return {
+        'bbox': detections.boxes[index].tolist(),
+        'confidence': float(detections.confidences[index]),
+        'class_name': detections.class_name(index)
+    }
 
 def clear_model_cache():
-    global _MODEL_CACHE
-    _MODEL_CACHE.clear()
+    MODEL_REGISTRY.clear()
     logger.info("Model cache cleared")
 
 class ParkingDetector:
@@ -56,9 +81,23 @@ class ParkingDetector:
         general_confidence: Optional[float] = None,
         frame_skip: int = DEFAULT_FRAME_SKIP,
         device: str = DEFAULT_DEVICE,
-        image_size: int = DEFAULT_IMAGE_SIZE
+        image_size: int = DEFAULT_IMAGE_SIZE,
+        backend: str = DEFAULT_BACKEND,
+        precision: str = DEFAULT_PRECISION,
+        model=None,
+        tiled: bool = DEFAULT_TILED,
+        tile_size: Optional[int] = DEFAULT_TILE_SIZE,
+        tile_overlap: float = DEFAULT_TILE_OVERLAP,
+        engine: str = DEFAULT_ENGINE,
+        classifier_path: str = DEFAULT_CLASSIFIER_PATH,
+        polygon_key: Optional[Tuple] = None,
     ):
-        if not os.path.exists(model_path):
+        if engine not in ENGINES:
+            raise ValueError(f"Engine must be one of {ENGINES}, got {engine}")
+        if engine == ENGINE_CLASSIFIER:
+            # The spot classifier takes the place of the detection model.
+            model_path, backend, precision = classifier_path, CLASSIFIER_BACKEND, "fp32"
+        if model is None and not os.path.exists(model_path):
             raise FileNotFoundError(f"Model file not found at: {model_path}")
         if not polygons or len(polygons) == 0:
             raise ValueError("Polygons list cannot be empty")
@@ -68,6 +107,10 @@ class ParkingDetector:
             raise ValueError(f"Device must be 'cuda' or 'cpu', got {device}")
         if not isinstance(image_size, int) or not (320 <= image_size <= 1920):
             raise ValueError(f"Image size must be integer between 320-1920 pixels, got {image_size}")
+        if tile_size is not None and (not isinstance(tile_size, int) or tile_size < 160):
+            raise ValueError(f"Tile size must be integer of at least 160 pixels, got {tile_size}")
+        if not 0 <= tile_overlap < 0.9:
+            raise ValueError(f"Tile overlap must be between 0 and 0.9, got {tile_overlap}")
         
         self.car_confidence = car_confidence if car_confidence is not None else DEFAULT_CAR_CONFIDENCE
         self.free_confidence = free_confidence if free_confidence is not None else DEFAULT_FREE_CONFIDENCE
@@ -86,13 +129,34 @@ class ParkingDetector:
         self.frame_skip = frame_skip
         self.device = device
         self.image_size = image_size
+        self.backend = backend
+        self.precision = precision
+        self.engine = engine
+        self.classifier_path = classifier_path
+        # Identifies the polygon set (e.g. file path + version) without hashing it per call.
+        self.polygon_key = polygon_key if polygon_key is not None else \
+            hashlib.sha1(repr(polygons).encode()).hexdigest()
+        # Tiling only applies to full-frame detection.
+        self.tiled = bool(tiled) and engine == ENGINE_DETECTOR
+        self.tile_size = tile_size if tile_size is not None else image_size
+        self.tile_overlap = tile_overlap
         
-        self.model = get_or_load_model(model_path, device)
+        # An explicit backend object bypasses the shared registry (quantization gate).
+        if model is not None:
+            self._model_entry = ModelEntry(None, model)
+        else:
+            self._model_entry = MODEL_REGISTRY.entry(model_path, device, backend, precision)
         
         self.original_polygons = [p.copy() for p in polygons]
         self.design_resolution = self._estimate_design_resolution()
         self.current_polygons = self.original_polygons
         self.current_resolution = self.design_resolution
+        self._resolution_cache: Dict[Tuple[int, int], List[Dict]] = {
+            self.design_resolution: self.original_polygons
+        }
+        self._engine_cache: Dict[Tuple[int, int], OccupancyEngine] = {}
+        self._tile_cache: Dict[Tuple[int, int], TilePlan] = {}
+        self._crop_cache: Dict[Tuple[Tuple[int, int], int], SpotCropper] = {}
 
         logger.info(
             f"ParkingDetector initialized:\n"
@@ -101,7 +165,10 @@ class ParkingDetector:
             f"  - Free confidence: {self.free_confidence}\n"
             f"  - General confidence: {self.general_confidence}\n"
             f"  - Device: {device}\n"
+            f"  - Engine: {engine}\n"
+            f"  - Backend: {self.model.name} ({self.model.precision})\n"
             f"  - Image size: {image_size}\n"
+            f"  - Tiling: {f'{self.tile_size}px tiles, {tile_overlap:.0%} overlap' if self.tiled else 'off'}\n"
             f"  - Estimated Design Resolution: {self.design_resolution}"
         )
 
@@ -124,102 +191,272 @@ class ParkingDetector:
         
         return (int(max_x + 20), int(max_y + 20))
 
-    def _rescale_polygons(self, new_resolution: Tuple[int, int]):
-        if new_resolution == self.current_resolution:
-            return
-        
+    def _polygons_for_resolution(self, resolution: Tuple[int, int]) -> List[Dict]:
+        cached = self._resolution_cache.get(resolution)
+        if cached is not None:
+            return cached
+
         base_w = max(1, self.design_resolution[0])
         base_h = max(1, self.design_resolution[1])
         
-        scale_x = new_resolution[0] / base_w
-        scale_y = new_resolution[1] / base_h
+        scale_x = resolution[0] / base_w
+        scale_y = resolution[1] / base_h
         
-        logger.info(f"Auto-rescaling polygons: {self.design_resolution} -> {new_resolution} (Scale: {scale_x:.2f}x, {scale_y:.2f}x)")
+        logger.info(f"Auto-rescaling polygons: {self.design_resolution} -> {resolution} (Scale: {scale_x:.2f}x, {scale_y:.2f}x)")
         
         new_polygons = []
         for poly in self.original_polygons:
             new_poly = poly.copy()
             new_poly['points'] = [[p[0] * scale_x, p[1] * scale_y] for p in poly['points']]
             new_polygons.append(new_poly)
-            
+
+        if len(self._resolution_cache) >= _MAX_CACHED_RESOLUTIONS:
+            self._resolution_cache.pop(next(iter(self._resolution_cache)), None)
+        self._resolution_cache[resolution] = new_polygons
+        return new_polygons
+
+    def _occupancy_engine(self, resolution: Tuple[int, int]) -> OccupancyEngine:
+        engine = self._engine_cache.get(resolution)
+        if engine is None:
+            engine = OccupancyEngine(self._polygons_for_resolution(resolution))
+            if len(self._engine_cache) >= _MAX_CACHED_RESOLUTIONS:
+                self._engine_cache.pop(next(iter(self._engine_cache)), None)
+            self._engine_cache[resolution] = engine
+        return engine
+
+    def _tile_plan(self, resolution: Tuple[int, int]) -> TilePlan:
+        plan = self._tile_cache.get(resolution)
+        if plan is None:
+            plan = plan_tiles(self._polygons_for_resolution(resolution), resolution,
+                              self.tile_size, self.tile_overlap)
+            if len(self._tile_cache) >= _MAX_CACHED_RESOLUTIONS:
+                self._tile_cache.pop(next(iter(self._tile_cache)), None)
+            self._tile_cache[resolution] = plan
+        return plan
+
+    def _spot_cropper(self, resolution: Tuple[int, int], model) -> SpotCropper:
+        crop_size = getattr(model, "input_size", None) or DEFAULT_CROP_SIZE
+        key = (resolution, crop_size)
+        cropper = self._crop_cache.get(key)
+        if cropper is None:
+            cropper = SpotCropper(self._polygons_for_resolution(resolution), resolution, crop_size)
+            if len(self._crop_cache) >= _MAX_CACHED_CROPPERS:
+                self._crop_cache.pop(next(iter(self._crop_cache)), None)
+            self._crop_cache[key] = cropper
+        return cropper
+
+    def _rescale_polygons(self, new_resolution: Tuple[int, int]) -> List[Dict]:
+        new_polygons = self._polygons_for_resolution(new_resolution)
+        if new_resolution == self.current_resolution:
+            return new_polygons
+        
         self.current_polygons = new_polygons
         self.current_resolution = new_resolution
         self.polygons = new_polygons
+        return new_polygons
+
+    def polygon_bounds(self, resolution: Tuple[int, int], margin: float = 0.0) -> Tuple[int, int, int, int]:
+        x0, y0, x1, y1 = self._occupancy_engine(resolution).bounds()
+        mx = (x1 - x0) * margin
+        my = (y1 - y0) * margin
+        w, h = resolution
+        return (
+            max(0, int(x0 - mx)), max(0, int(y0 - my)),
+            min(w, int(np.ceil(x1 + mx)) + 1), min(h, int(np.ceil(y1 + my)) + 1),
+        )
+
+    def _current(self):
+        # (model, lock) read once per call: a hot reload swaps the pair, and a
+        # call already holding the old one finishes on it.
+        current = self._model_entry.current
+        if current is None:
+            # Evicted from the registry; load it again.
+            self._model_entry = MODEL_REGISTRY.entry(self.model_path, self.device, self.backend, self.precision)
+            current = self._model_entry.current
+        return current
+
+    @property
+    def model(self):
+        return self._current()[0]
 
-    def detect_objects(self, image: np.ndarray) -> Dict[str, List[Dict]]:
+    @property
+    def full_frame_input(self) -> bool:
+        # Tiles and spot crops only cover the spots and need full-resolution
+        # pixels, so ingest must not reduce or crop the decode.
+        return self.tiled or self.engine == ENGINE_CLASSIFIER
+
+    @property
+    def inference_key(self) -> Tuple:
+        # Spot crops and tile plans come from this detector's polygons, so only
+        # the same lot can share a classifier or tiled batch.
+        return (id(self.model), self.device, self.image_size, self.general_confidence, self.engine,
+                self.full_frame_input and self.polygon_key,
+                self.tiled and (self.tile_size, self.tile_overlap))
+
+    def _predict(self, images) -> List[BackendResult]:
+        if self.engine == ENGINE_CLASSIFIER:
+            return self._predict_spots([images] if isinstance(images, np.ndarray) else list(images))
+        if self.tiled:
+            return self._predict_tiled([images] if isinstance(images, np.ndarray) else list(images))
+        model, lock = self._current()
+        with lock, metrics.timed("inference"):
+            results = model.predict(
+                images,
+                imgsz=self.image_size,
+                conf=self.general_confidence,
+                iou=DEFAULT_IOU,
+            )
+            profiling.add_model_speed(results)
+        return results
+
+    def _predict_tiled(self, images: List[np.ndarray]) -> List[BackendResult]:
+        # The tiles of all images go through the model together; each image gets
+        # back one result with its merged boxes in full-frame pixels, so callers
+        # (batch scheduler, process_result) cannot tell it from a plain pass.
+        plans = [self._tile_plan((image.shape[1], image.shape[0])) for image in images]
+        crops = [crop for image, plan in zip(images, plans) for crop in plan.crops(image)]
+        model, lock = self._current()
+        with lock, metrics.timed("inference"):
+            tile_results = []
+            for start in range(0, len(crops), DEFAULT_TILE_MAX_BATCH):
+                tile_results.extend(model.predict(
+                    crops[start:start + DEFAULT_TILE_MAX_BATCH],
+                    imgsz=self.image_size,
+                    conf=self.general_confidence,
+                    iou=DEFAULT_IOU,
+                ))
+            profiling.add_model_speed(tile_results)
+
+        results = []
+        with profiling.span("tile_merge", tiles=len(crops)):
+            start = 0
+            for plan in plans:
+                parts = tile_results[start:start + len(plan)]
+                start += len(plan)
+                speed: Dict[str, float] = {}
+                for part in parts:
+                    for key, ms in part.speed.items():
+                        if ms is not None:
+                            speed[key] = speed.get(key, 0.0) + ms
+                results.append(BackendResult(plan.merge([part.data for part in parts]), speed))
+        return results
+
+    def _predict_spots(self, images: List[np.ndarray]) -> List[BackendResult]:
+        # One row per spot in polygon order: [x1, y1, x2, y2, conf, cls] with the
+        # spot's bounding box and the top class. The crops of all images are
+        # classified together. Images are full frames: ingest neither reduces
+        # nor crops them for this engine.
+        model, lock = self._current()
+        croppers = [self._spot_cropper((image.shape[1], image.shape[0]), model) for image in images]
+        with lock, metrics.timed("inference"):
+            with profiling.span("crop", spots=sum(c.count for c in croppers)):
+                crops = np.concatenate([c.crops(image) for c, image in zip(croppers, images)])
+            probs, speed = [], {}
+            for start in range(0, len(crops), DEFAULT_CLASSIFIER_MAX_BATCH):
+                part, part_speed = model.classify(crops[start:start + DEFAULT_CLASSIFIER_MAX_BATCH])
+                probs.append(part)
+                for key, ms in part_speed.items():
+                    speed[key] = speed.get(key, 0.0) + ms
+            probs = np.concatenate(probs) if probs else np.empty((0, len(model.names)), np.float32)
+            for key, ms in speed.items():
+                profiling.add_span(f"model.{key}", ms, crops=len(crops))
+
+        results = []
+        start = 0
+        for cropper in croppers:
+            part = probs[start:start + cropper.count]
+            start += cropper.count
+            class_ids = part.argmax(axis=1)
+            data = np.empty((cropper.count, 6), np.float32)
+            data[:, :4] = cropper.boxes
+            data[:, 4] = part[np.arange(cropper.count), class_ids]
+            data[:, 5] = class_ids
+            results.append(BackendResult(data, {k: ms / len(images) for k, ms in speed.items()}))
+        return results
+
+    def _class_thresholds(self, class_ids: np.ndarray) -> np.ndarray:
+        names = self.model.names
+        car_ids = [i for i, name in names.items() if name == 'car']
+        free_ids = [i for i, name in names.items() if name == 'free']
+        thresholds = np.full(len(class_ids), np.inf, dtype=np.float32)
+        thresholds[np.isin(class_ids, car_ids)] = self.car_confidence
+        thresholds[np.isin(class_ids, free_ids)] = self.free_confidence
+        return thresholds
+
+    def _parse_result(self, result: BackendResult) -> Detections:
+        with metrics.timed("postprocess"):
+            return self._parse_data(result.data)
+
+    def _spot_result(
+        self,
+        result: Optional[BackendResult],
+        polygons: List[Dict],
+        transform: Optional[FrameTransform] = None,
+    ) -> dict:
+        # Rows are already per spot, so no center-in-polygon search: a spot is
+        # occupied/free when its class clears the car/free threshold.
+        unassigned = np.full(len(polygons), -1, np.intp)
+        if result is None or len(result.data) != len(polygons):
+            return self.build_result(Detections.empty(self.model.names), polygons, assignment=(unassigned, unassigned))
+        with metrics.timed("postprocess"):
+            data = result.data
+            spots = Detections(data[:, :4], data[:, 4], data[:, 5], self.model.names)
+            keep = spots.confidences >= self._class_thresholds(spots.class_ids)
+            car = keep & spots.class_mask('car')
+            free = keep & spots.class_mask('free')
+            detections = spots.select(car | free)
+            car_idx, free_idx = unassigned.copy(), unassigned.copy()
+            car_idx[car] = np.arange(int(car.sum()))
+            free_idx[free] = np.arange(int(free.sum()))
+        if transform is not None:
+            detections = transform.apply(detections)
+        return self.build_result(detections, polygons, assignment=(car_idx, free_idx))
+
+    def _parse_data(self, data: np.ndarray) -> Detections:
+        if len(data) == 0:
+            return Detections.empty(self.model.names)
+
+        # [x1, y1, x2, y2, conf, cls] for all boxes of the image.
+        confidences = data[:, -2]
+        class_ids = data[:, -1].astype(np.int64)
+        thresholds = self._class_thresholds(class_ids)
+        keep = confidences >= thresholds
+
+        detections = Detections(data[keep, :4], confidences[keep], class_ids[keep], self.model.names)
+        if logger.isEnabledFor(logging.DEBUG):
+            dropped = Detections(data[~keep, :4], confidences[~keep], class_ids[~keep], self.model.names)
+            logger.debug(
+                f"Found {int(detections.class_mask('car').sum())} cars and "
+                f"{int(detections.class_mask('free').sum())} free spots "
+                f"(filtered: {int(dropped.class_mask('car').sum())} cars, "
+                f"{int(dropped.class_mask('free').sum())} free spots)"
+            )
+        return detections
+
+    def detect_objects(self, image: np.ndarray) -> Detections:
+        names = self.model.names
         if image is None:
             logger.error("Image is None")
-            return {'cars': [], 'free_spots': []}
+            return Detections.empty(names)
         if not isinstance(image, np.ndarray):
             logger.error(f"Image must be numpy array, got {type(image)}")
-            return {'cars': [], 'free_spots': []}
+            return Detections.empty(names)
         if image.size == 0:
             logger.error("Image is empty")
-            return {'cars': [], 'free_spots': []}
+            return Detections.empty(names)
         
         logger.debug(f"Running YOLO detection on image shape: {image.shape}")
         try:
-            results = self.model(
-                image,
-                verbose=False,
-                device=self.device,
-                imgsz=self.image_size,
-                conf=self.general_confidence,  
-                iou=0.7,  
-            )
+            results = self._predict(image)
         except Exception as e:
             logger.error(f"Failed to run YOLO: {e}")
-            return {'cars': [], 'free_spots': []}
-        
-        cars = []
-        free_spots = []
-        filtered_count = {'car': 0, 'free': 0}
+            return Detections.empty(names)
         
         try:
-            for result in results:
-                boxes = result.boxes
-                if boxes is None or len(boxes) == 0:
-                    continue
-                    
-                for box in boxes:
-                    x1, y1, x2, y2 = box.xyxy[0].cpu().numpy()
-                    confidence = float(box.conf[0])
-                    class_id = int(box.cls[0])
-                    class_name = self.model.names.get(class_id, f"class_{class_id}")
-                    
-                    if class_name == 'car':
-                        if confidence < self.car_confidence:
-                            filtered_count['car'] += 1
-                            continue  
-                    elif class_name == 'free':
-                        if confidence < self.free_confidence:
-                            filtered_count['free'] += 1
-                            continue  
-                    else:
-                        continue
-                    
-                    detection = {
-                        'bbox': [float(x1), float(y1), float(x2), float(y2)],
-                        'center': [(float(x1) + float(x2)) / 2, (float(y1) + float(y2)) / 2],
-                        'confidence': confidence,
-                        'class_id': class_id,
-                        'class_name': class_name
-                    }
-                    
-                    if class_name == 'car':
-                        cars.append(detection)
-                    elif class_name == 'free':
-                        free_spots.append(detection)
-                        
+            return Detections.concat([self._parse_result(result) for result in results], names)
         except Exception as e:
             logger.error(f"Failed to process detections: {e}")
-            return {'cars': [], 'free_spots': []}
-        
-        logger.debug(
-            f"Found {len(cars)} cars and {len(free_spots)} free spots "
-            f"(filtered: {filtered_count['car']} cars, {filtered_count['free']} free spots)"
-        )
-        return {'cars': cars, 'free_spots': free_spots}
+            return Detections.empty(names)
 
     def point_in_polygon(
         self,
@@ -267,19 +504,62 @@ class ParkingDetector:
             'detection_type': None
         }
 
-    def detect(self, image: np.ndarray) -> dict:
+    def detect(self, image: np.ndarray, transform: Optional[FrameTransform] = None) -> dict:
         if image is None:
             return {'spots': [], 'summary': {}}
             
-        h, w = image.shape[:2]
-        self._rescale_polygons((w, h))
+        resolution = _frame_resolution(image, transform)
+        polygons = self._rescale_polygons(resolution)
 
         logger.info(f"Starting detection on image: {image.shape}")
+
+        if self.engine == ENGINE_CLASSIFIER:
+            try:
+                result = self._predict(image)[0]
+            except Exception as e:
+                logger.error(f"Failed to classify spots: {e}")
+                result = None
+            return self._spot_result(result, polygons, transform)
  
         detections = self.detect_objects(image)
+        if transform is not None:
+            detections = transform.apply(detections)
+        return self.build_result(detections, polygons, self._occupancy_engine(resolution))
+
+    def detect_batch(self, images: List[np.ndarray]) -> List[dict]:
+        if not images:
+            return []
+        logger.info(f"Starting batched detection on {len(images)} images")
+        results = self._predict(list(images))
+        return [self.process_result(image, result) for image, result in zip(images, results)]
+
+    def process_result(self, image: np.ndarray, result, transform: Optional[FrameTransform] = None) -> dict:
+        resolution = _frame_resolution(image, transform)
+        polygons = self._rescale_polygons(resolution)
+        if self.engine == ENGINE_CLASSIFIER:
+            return self._spot_result(result, polygons, transform)
+        detections = self._parse_result(result)
+        if transform is not None:
+            detections = transform.apply(detections)
+        return self.build_result(detections, polygons, self._occupancy_engine(resolution))
+
+    def build_result(
+        self,
+        detections: Detections,
+        polygons: Optional[List[Dict]] = None,
+        engine: Optional[OccupancyEngine] = None,
+        assignment: Optional[Tuple[np.ndarray, np.ndarray]] = None,
+    ) -> dict:
+        started = time.perf_counter()
+        if polygons is None:
+            polygons = self.polygons
+        if engine is None and assignment is None:
+            engine = OccupancyEngine(polygons)
+        cars = detections.of_class('car')
+        free_spots = detections.of_class('free')
         logger.info(
-            f"Detected {len(detections['cars'])} cars and "
-            f"{len(detections['free_spots'])} free spots"
+            f"Detected {len(cars)} cars and "
+            f"{len(free_spots)} free spots"
         )
         
         spots = []
@@ -287,8 +567,32 @@ class ParkingDetector:
         free_count = 0
         unknown_count = 0
         
-        for polygon in self.polygons:
-            occupancy_info = self.check_polygon_occupancy(detections, polygon)
+        # (car_idx, free_idx) per spot, indexing cars / free_spots; -1 = none.
+        car_idx, free_idx = assignment if assignment is not None else engine.assign(cars.centers, free_spots.centers)
+        assigned = time.perf_counter()
+
+        for i, polygon in enumerate(polygons):
+            if car_idx[i] >= 0:
+                occupancy_info = {
+                    'is_occupied': True,
+                    'status': 'occupied',
+                    'detected_object': _object_info(cars, car_idx[i]),
+                    'detection_type': 'car'
+                }
+            elif free_idx[i] >= 0:
+                occupancy_info = {
+                    'is_occupied': False,
+                    'status': 'free',
+                    'detected_object': _object_info(free_spots, free_idx[i]),
+                    'detection_type': 'free'
+                }
+            else:
+                occupancy_info = {
+                    'is_occupied': False,
+                    'status': 'unknown',
+                    'detected_object': None,
+                    'detection_type': None
+                }
             
             spot_data = {
                 'id': polygon.get('id', len(spots) + 1),
@@ -299,11 +603,7 @@ class ParkingDetector:
             }
    
             if occupancy_info['detected_object']:
-                spot_data['detected_object'] = {
-                    'bbox': occupancy_info['detected_object']['bbox'],
-                    'confidence': occupancy_info['detected_object']['confidence'],
-                    'class_name': occupancy_info['detected_object']['class_name']
-                }
+                spot_data['detected_object'] = occupancy_info['detected_object']
             
             spots.append(spot_data)
             if occupancy_info['status'] == 'occupied':
@@ -313,7 +613,7 @@ class ParkingDetector:
             else:
                 unknown_count += 1
         
-        total_spots = len(self.polygons)
+        total_spots = len(polygons)
         vacant_count = free_count + unknown_count
         occupancy_rate = (occupied_count / total_spots * 100) if total_spots > 0 else 0
         
@@ -323,6 +623,15 @@ class ParkingDetector:
             f"({occupancy_rate:.1f}% occupancy)"
         )
         
+        finished = time.perf_counter()
+        span = metrics.observe_stage("occupancy", finished - started, spots=total_spots)
+        if span is not None:
+            # Spots are assigned in one vectorized pass, so the per-polygon cost
+            # is reported as an average per spot.
+            span.add("assign", (assigned - started) * 1000, detections=len(cars) + len(free_spots))
+            span.add("build_spots", (finished - assigned) * 1000)
+            span.info["us_per_spot"] = round(span.ms * 1000 / span.count / max(total_spots, 1), 3)
+        metrics.count_frames()
         return {
             'spots': spots,
             'summary': {
@@ -333,55 +642,70 @@ class ParkingDetector:
                 'vacant_count': vacant_count,
                 'occupancy_rate': round(occupancy_rate, 2)
             },
-            'detections': {
-                'cars': detections['cars'],
-                'free_spots': detections['free_spots']
-            }
+            'detections': detections
         }
 
-    def detect_video(self, video_path: str, skip_frames: int = None):
+    def detect_video(
+        self,
+        video_path: str,
+        skip_frames: int = None,
+        sample_interval_ms: Optional[float] = None,
+        temporal: bool = False,
+        batch_size: int = 1,
+        return_frame: bool = False,
+    ):
         if skip_frames is None:
             skip_frames = self.frame_skip
-        logger.info(f"Processing video: {video_path} (skip={skip_frames})")
+        logger.info(
+            f"Processing video: {video_path} (skip={skip_frames}, "
+            f"sample_interval_ms={sample_interval_ms}, temporal={temporal}, batch_size={batch_size})"
+        )
         cap = None
+        sampler = None
+        tracker = TemporalOccupancyTracker(self) if temporal else None
+        # Temporal mode decides per frame whether to infer, so it cannot batch.
+        batch_size = 1 if tracker is not None else max(1, batch_size)
+        processed_count = 0
+        pending = []
+
+        def _finish(frame_count, frame, result):
+            result['frame_number'] = frame_count
+            result['frames_read'] = sampler.frames_read
+            if return_frame:
+                result['frame'] = frame
+            return result
+
         try:
             cap = cv2.VideoCapture(video_path)
             if not cap.isOpened():
                 logger.error(f"failed to open video: {video_path}")
                 raise ValueError(f"failed to open video: {video_path}")
             logger.info("video opened!")
-            frame_count = 0
-            processed_count = 0
-            consecutive_errors = 0
-            max_errors = 10
-            
-            while cap.isOpened():
+            sampler = FrameSampler(cap, skip_frames, sample_interval_ms)
+
+            for frame_count, frame in sampler:
+                if batch_size > 1:
+                    pending.append((frame_count, frame))
+                    if len(pending) < batch_size:
+                        continue
+                    for result in self._detect_video_batch(pending, _finish):
+                        yield result
+                        processed_count += 1
+                    pending = []
+                    continue
                 try:
-                    ret, frame = cap.read()
-                    if not ret:
-                        logger.debug(f"end of video at frame: {frame_count}")
-                        break
-                    consecutive_errors=0
-                    if frame_count % (skip_frames+1)==0:
-                        try:
-                            result=self.detect(frame)
-                            result['frame_number']=frame_count
-                            yield result
-                            processed_count+=1
-                        except Exception as e:
-                            logger.warning(f"failed to process frame {frame_count}:{e}")
-                    frame_count+=1
+                    if tracker is not None:
+                        result = tracker.update(frame, frame_count)
+                    else:
+                        result = self.detect(frame)
+                    yield _finish(frame_count, frame, result)
+                    processed_count+=1
                 except Exception as e:
-                    consecutive_errors+=1
-                    logger.warning(
-                        f"error reading frame {frame_count}:{e}"
-                        f"({consecutive_errors}/{max_errors} errors)"
-                    )
-                    if consecutive_errors>=max_errors:
-                        logger.error("too many errors,stopping video processing")
-                        break
-                    frame_count+=1
-                    continue
+                    logger.warning(f"failed to process frame {frame_count}:{e}")
+
+            for result in self._detect_video_batch(pending, _finish):
+                yield result
+                processed_count += 1
         except Exception as e:
             logger.error(f"unexpected error: {e}")
             raise
@@ -391,5 +715,17 @@ class ParkingDetector:
                 logger.info("video released")
             logger.info(
                 f"video processing completed: {processed_count} frames processed "
-                f"({frame_count} total frames)"
-            )
\ No newline at end of file
+                f"({sampler.frames_read if sampler else 0} total frames)"
+            )
+            if tracker is not None:
+                logger.info(f"temporal tracking: {tracker.stats()}")
+
+    def _detect_video_batch(self, pending: List[Tuple[int, np.ndarray]], finish) -> List[dict]:
+        if not pending:
+            return []
+        try:
+            results = self.detect_batch([frame for _, frame in pending])
+        except Exception as e:
+            logger.warning(f"failed to process frames {pending[0][0]}-{pending[-1][0]}:{e}")
+            return []
+        return [finish(frame_count, frame, result) for (frame_count, frame), result in zip(pending, results)]
@@ -0,0 +1,302 @@
+import hashlib
+import json
+import logging
+import os
+import shutil
+import time
+from typing import List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from ..utils.configs import (
+    IMAGE_SIZE as DEFAULT_IMAGE_SIZE,
+    INGEST_ROI_MARGIN as DEFAULT_ROI_MARGIN,
+    POLYGONS_DIR as DEFAULT_POLYGONS_DIR,
+    QUANT_CALIBRATION_DIR as DEFAULT_CALIBRATION_DIR,
+    QUANT_CALIBRATION_FRAMES as DEFAULT_CALIBRATION_FRAMES,
+    QUANT_MIN_AGREEMENT as DEFAULT_MIN_AGREEMENT,
+)
+from ..utils.polygon_utils import load_polygons
+from .backends import OnnxBackend, OpenVinoBackend, UltralyticsBackend, preprocess
+
+logger = logging.getLogger(__name__)
+
+PRECISIONS = ("fp32", "fp16", "int8_dynamic", "int8_static")
+
+_IMAGE_EXTS = (".jpg", ".jpeg", ".png", ".bmp")
+_VIDEO_EXTS = (".mp4", ".avi", ".mov", ".mkv")
+
+
+class VariantRejectedError(RuntimeError):
+    def __init__(self, precision: str, agreement: float, min_agreement: float):
+        super().__init__(
+            f"{precision} variant agrees with fp32 on {agreement:.2%} of spots "
+            f"(minimum {min_agreement:.2%})"
+        )
+        self.precision = precision
+        self.agreement = agreement
+        self.min_agreement = min_agreement
+
+
+def _data_files(directory: str, exts) -> List[str]:
+    if not os.path.isdir(directory):
+        return []
+    return sorted(
+        os.path.join(directory, name) for name in os.listdir(directory)
+        if name.lower().endswith(exts)
+    )
+
+
+def load_calibration_frames(directory: str = DEFAULT_CALIBRATION_DIR,
+                            max_frames: int = DEFAULT_CALIBRATION_FRAMES) -> List[np.ndarray]:
+    # Sample images and frames spread evenly over the videos in the directory.
+    images = _data_files(directory, _IMAGE_EXTS)
+    videos = _data_files(directory, _VIDEO_EXTS)
+    frames = [f for f in (cv2.imread(path) for path in images[:max_frames]) if f is not None]
+    if videos and len(frames) < max_frames:
+        per_video = max(1, (max_frames - len(frames)) // len(videos))
+        for path in videos:
+            cap = cv2.VideoCapture(path)
+            total = int(cap.get(cv2.CAP_PROP_FRAME_COUNT) or 0)
+            for index in np.linspace(0, max(total - 1, 0), per_video).astype(int):
+                cap.set(cv2.CAP_PROP_POS_FRAMES, int(index))
+                ok, frame = cap.read()
+                if ok:
+                    frames.append(frame)
+            cap.release()
+    return frames[:max_frames]
+
+
+def load_polygon_sets(directory: str = DEFAULT_POLYGONS_DIR) -> List[List[dict]]:
+    sets = []
+    for path in _data_files(directory, (".json",)):
+        try:
+            polygons = load_polygons(path)
+        except Exception as e:
+            logger.warning(f"Skipping polygon file {path}: {e}")
+            continue
+        if polygons:
+            sets.append(polygons)
+    return sets
+
+
+def _fingerprint(paths: List[str]) -> str:
+    h = hashlib.sha1()
+    for path in paths:
+        st = os.stat(path)
+        h.update(f"{os.path.basename(path)}:{st.st_size}:{st.st_mtime_ns};".encode())
+    return h.hexdigest()
+
+
+def _detectors(model, model_path: str, device: str, polygon_sets):
+    from .parking_detector import ParkingDetector
+
+    return [ParkingDetector(polygons, model_path=model_path, device=device, model=model)
+            for polygons in polygon_sets]
+
+
+def calibration_inputs(frames: List[np.ndarray], reference_detectors) -> List[np.ndarray]:
+    # Full frames plus the polygon-ROI crops that INGEST_CROP_TO_POLYGONS sends
+    # to the model, so activation ranges cover both kinds of input.
+    inputs = list(frames)
+    for frame in frames:
+        h, w = frame.shape[:2]
+        for detector in reference_detectors:
+            x0, y0, x1, y1 = detector.polygon_bounds((w, h), DEFAULT_ROI_MARGIN)
+            if (x1 - x0) * (y1 - y0) < 0.9 * w * h and x1 - x0 > 32 and y1 - y0 > 32:
+                inputs.append(np.ascontiguousarray(frame[y0:y1, x0:x1]))
+    return inputs
+
+
+def spot_agreement(reference_detectors, candidate_detectors, frames: List[np.ndarray]) -> Tuple[float, int]:
+    # Share of (frame, polygon set, spot) whose status matches the fp32 model.
+    agree = total = 0
+    for frame in frames:
+        ref_result = reference_detectors[0]._predict(frame)[0]
+        cand_result = candidate_detectors[0]._predict(frame)[0]
+        for ref, cand in zip(reference_detectors, candidate_detectors):
+            a = ref.process_result(frame, ref_result)['spots']
+            b = cand.process_result(frame, cand_result)['spots']
+            agree += sum(x['status'] == y['status'] for x, y in zip(a, b))
+            total += len(a)
+    return (agree / total if total else 0.0), total
+
+
+class _CalibrationReader:
+    def __init__(self, input_name: str, inputs: List[np.ndarray], imgsz: int):
+        self._items = iter(inputs)
+        self.input_name = input_name
+        self.imgsz = imgsz
+
+    def get_next(self) -> Optional[dict]:
+        image = next(self._items, None)
+        if image is None:
+            return None
+        return {self.input_name: preprocess([image], self.imgsz)}
+
+
+def _head_nodes(model) -> List[str]:
+    # Box decoding / DFL of the detection head (last /model.N/ block, outside
+    # its cv* conv branches) stays in float: int8 there shifts box coordinates.
+    names = [node.name for node in model.graph.node if node.name.startswith("/model.")]
+    if not names:
+        return []
+    head = "/".join(names[-1].split("/")[:2]) + "/"
+    return [n for n in names if n.startswith(head) and "/cv" not in n and "/one2one_cv" not in n]
+
+
+def _copy_metadata(source: str, target: str) -> None:
+    import onnx
+
+    src = onnx.load(source, load_external_data=False)
+    model = onnx.load(target)
+    del model.metadata_props[:]
+    model.metadata_props.extend(src.metadata_props)
+    onnx.save(model, target)
+
+
+def build_onnx_variant(artifact: str, precision: str, target: str,
+                       inputs: List[np.ndarray], imgsz: int = DEFAULT_IMAGE_SIZE) -> str:
+    import onnx
+
+    if precision == "fp16":
+        from onnxruntime.transformers.float16 import convert_float_to_float16
+
+        model = convert_float_to_float16(onnx.load(artifact), keep_io_types=True)
+        onnx.save(model, target)
+    elif precision == "int8_dynamic":
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+
+        quantize_dynamic(artifact, target, weight_type=QuantType.QUInt8)
+    else:
+        from onnxruntime.quantization import CalibrationDataReader, QuantFormat, QuantType, quantize_static
+
+        class Reader(_CalibrationReader, CalibrationDataReader):
+            pass
+
+        model = onnx.load(artifact)
+        quantize_static(
+            artifact, target,
+            Reader(model.graph.input[0].name, inputs, imgsz),
+            quant_format=QuantFormat.QDQ,
+            per_channel=True,
+            activation_type=QuantType.QUInt8,
+            weight_type=QuantType.QInt8,
+            nodes_to_exclude=_head_nodes(model),
+        )
+    _copy_metadata(artifact, target)
+    return target
+
+
+def build_openvino_variant(artifact: str, precision: str, target: str,
+                           inputs: List[np.ndarray], imgsz: int = DEFAULT_IMAGE_SIZE) -> str:
+    if precision != "int8_static":
+        raise ValueError(f"OpenVINO builds only int8_static variants (fp16 is a compile hint), got {precision}")
+    import nncf
+    import openvino as ov
+
+    xml = next(f for f in os.listdir(artifact) if f.endswith(".xml"))
+    model = ov.Core().read_model(os.path.join(artifact, xml))
+    dataset = nncf.Dataset(inputs, lambda image: preprocess([image], imgsz))
+    quantized = nncf.quantize(model, dataset, preset=nncf.QuantizationPreset.MIXED)
+    os.makedirs(target, exist_ok=True)
+    ov.save_model(quantized, os.path.join(target, xml))
+    shutil.copy(os.path.join(artifact, "metadata.yaml"), target)
+    return target
+
+
+def variant_path(artifact: str, precision: str) -> str:
+    # best.onnx -> best.int8_static.onnx, best_openvino_model -> best_openvino_model_int8_static
+    stem, ext = os.path.splitext(artifact)
+    return f"{stem}.{precision}{ext}" if ext else f"{artifact}_{precision}"
+
+
+def _open_variant(reference, precision: str, artifact: Optional[str], device: str):
+    if isinstance(reference, UltralyticsBackend):
+        return UltralyticsBackend(reference.model_path, device, half=True)
+    if isinstance(reference, OnnxBackend):
+        return OnnxBackend(artifact, device, precision=precision)
+    if precision == "fp16":
+        return OpenVinoBackend(reference.artifact, precision="fp16")
+    return OpenVinoBackend(artifact, precision=precision)
+
+
+def load_variant(
+    model_path: str,
+    device: str,
+    reference,
+    precision: str,
+    calibration_dir: str = DEFAULT_CALIBRATION_DIR,
+    polygons_dir: str = DEFAULT_POLYGONS_DIR,
+    min_agreement: float = DEFAULT_MIN_AGREEMENT,
+):
+    # Builds (once) a reduced-precision variant of the fp32 `reference` backend,
+    # measures per-spot agreement against it on the calibration frames and the
+    # polygon sets, and raises VariantRejectedError below min_agreement. The
+    # verdict is cached in a .gate.json next to the variant until the model,
+    # the calibration frames or the polygon files change.
+    if precision not in PRECISIONS or precision == "fp32":
+        raise ValueError(f"Precision must be one of {PRECISIONS[1:]}, got {precision}")
+    if isinstance(reference, UltralyticsBackend) and not (precision == "fp16" and device == "cuda"):
+        raise ValueError(f"torch backend supports only fp16 on cuda, got {precision} on {device}")
+
+    source = getattr(reference, "artifact", model_path)
+    # torch and OpenVINO fp16 are runtime settings; the other variants are new files.
+    runtime_only = isinstance(reference, UltralyticsBackend) or (
+        precision == "fp16" and isinstance(reference, OpenVinoBackend))
+    artifact = None if runtime_only else variant_path(source, precision)
+    report_path = f"{variant_path(source, precision)}.gate.json"
+    data_files = _data_files(calibration_dir, _IMAGE_EXTS + _VIDEO_EXTS) + _data_files(polygons_dir, (".json",))
+    if not data_files:
+        raise RuntimeError(f"No calibration frames or polygon files in {calibration_dir} / {polygons_dir}")
+    fingerprint = _fingerprint([model_path] + data_files)
+
+    report = None
+    if os.path.exists(report_path) and (artifact is None or os.path.exists(artifact)):
+        with open(report_path, encoding="utf-8") as f:
+            report = json.load(f)
+        if report.get("fingerprint") != fingerprint:
+            report = None
+
+    if report is None:
+        frames = load_calibration_frames(calibration_dir)
+        polygon_sets = load_polygon_sets(polygons_dir)
+        if not frames or not polygon_sets:
+            raise RuntimeError(f"Need calibration frames in {calibration_dir} and polygons in {polygons_dir}")
+        started = time.perf_counter()
+        reference_detectors = _detectors(reference, model_path, device, polygon_sets)
+        # Every other frame calibrates, the rest (or all, if there are few) validate.
+        calibration = frames[::2]
+        validation = frames[1::2] or frames
+        if artifact is not None:
+            inputs = calibration_inputs(calibration, reference_detectors)
+            logger.info(f"Building {precision} variant {artifact} from {len(inputs)} calibration inputs")
+            if isinstance(reference, OnnxBackend):
+                build_onnx_variant(source, precision, artifact, inputs, reference_detectors[0].image_size)
+            else:
+                build_openvino_variant(source, precision, artifact, inputs, reference_detectors[0].image_size)
+        candidate = _open_variant(reference, precision, artifact, device)
+        candidate_detectors = _detectors(candidate, model_path, device, polygon_sets)
+        agreement, spots = spot_agreement(reference_detectors, candidate_detectors, validation)
+        report = {
+            "precision": precision,
+            "backend": reference.name,
+            "agreement": agreement,
+            "spots": spots,
+            "frames": len(validation),
+            "fingerprint": fingerprint,
+            "elapsed_s": round(time.perf_counter() - started, 1),
+        }
+        with open(report_path, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        logger.info(f"{precision} variant gate: {agreement:.2%} spot agreement over {spots} spots")
+    else:
+        candidate = None
+
+    if report["agreement"] < min_agreement:
+        raise VariantRejectedError(precision, report["agreement"], min_agreement)
+    if candidate is None:
+        candidate = _open_variant(reference, precision, artifact, device)
+    candidate.agreement = report["agreement"]
+    return candidate
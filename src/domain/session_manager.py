@@ -0,0 +1,313 @@
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Dict, Optional
+
+from ..utils.configs import (
+    SESSION_DISK_QUOTA as DEFAULT_DISK_QUOTA,
+    SESSION_IDLE_TTL as DEFAULT_IDLE_TTL,
+    SESSION_MAX_STREAMS as DEFAULT_MAX_STREAMS,
+    SESSION_REAP_INTERVAL as DEFAULT_REAP_INTERVAL,
+)
+from ..utils.upload_utils import remove_file
+
+logger = logging.getLogger(__name__)
+
+
+class StreamLimitError(RuntimeError):
+    def __init__(self, max_streams: int, retry_after: int = 5):
+        super().__init__(f"Too many active streams (max {max_streams})")
+        self.max_streams = max_streams
+        self.retry_after = retry_after
+
+
+class VideoSession:
+    __slots__ = (
+        "session_id", "path", "polygon_id", "filename", "upload", "created_at",
+        "last_access", "active_streams", "frames_processed", "stream_started_at",
+        "stream_frames",
+    )
+
+    def __init__(self, session_id: str, path: str, polygon_id: Optional[str] = None,
+                 filename: Optional[str] = None, upload=None):
+        self.session_id = session_id
+        self.path = path
+        self.polygon_id = polygon_id
+        self.filename = filename
+        self.upload = upload
+        self.created_at = time.time()
+        self.last_access = time.monotonic()
+        self.active_streams = 0
+        self.frames_processed = 0
+        self.stream_started_at: Optional[float] = None
+        self.stream_frames = 0
+
+    @property
+    def state(self) -> str:
+        if self.active_streams:
+            return "streaming"
+        if self.upload is None:
+            return "created"
+        if self.upload.error:
+            return "failed"
+        return "ready" if self.upload.done else "uploading"
+
+    @property
+    def size_bytes(self) -> int:
+        try:
+            return os.path.getsize(self.path)
+        except OSError:
+            return 0
+
+    @property
+    def busy(self) -> bool:
+        return self.active_streams > 0 or (self.upload is not None and not self.upload.done)
+
+    def touch(self) -> None:
+        self.last_access = time.monotonic()
+
+    def idle_seconds(self) -> float:
+        last = self.last_access
+        if self.upload is not None and not self.upload.done:
+            last = max(last, self.upload.updated_at)
+        return time.monotonic() - last
+
+    def record_frame(self) -> None:
+        self.frames_processed += 1
+        self.stream_frames += 1
+        self.last_access = time.monotonic()
+
+    def fps(self) -> float:
+        if not self.active_streams or self.stream_started_at is None:
+            return 0.0
+        elapsed = time.monotonic() - self.stream_started_at
+        return round(self.stream_frames / elapsed, 2) if elapsed > 0 else 0.0
+
+    def to_dict(self) -> dict:
+        return {
+            "session_id": self.session_id,
+            "state": self.state,
+            "polygon_id": self.polygon_id,
+            "filename": self.filename,
+            "size_bytes": self.size_bytes,
+            "upload": self.upload.to_dict() if self.upload is not None else None,
+            "active_streams": self.active_streams,
+            "frames_processed": self.frames_processed,
+            "fps": self.fps(),
+            "idle_s": round(self.idle_seconds(), 1),
+            "created_at": self.created_at,
+        }
+
+
+class VideoSessionManager:
+    # Owns uploaded session videos: idle sessions expire after idle_ttl, the temp
+    # files share a disk quota (least recently used idle sessions are evicted
+    # first) and concurrent MJPEG streams are capped per process. Sessions that
+    # upload the same content (same digest) share one file.
+
+    def __init__(
+        self,
+        idle_ttl: float = DEFAULT_IDLE_TTL,
+        disk_quota: int = DEFAULT_DISK_QUOTA,
+        max_streams: int = DEFAULT_MAX_STREAMS,
+        reap_interval: float = DEFAULT_REAP_INTERVAL,
+    ):
+        if max_streams < 1:
+            raise ValueError(f"max_streams must be >= 1, got {max_streams}")
+        self.idle_ttl = idle_ttl
+        self.disk_quota = disk_quota
+        self.max_streams = max_streams
+        self.reap_interval = reap_interval
+
+        self._sessions: "OrderedDict[str, VideoSession]" = OrderedDict()
+        self._path_refs: Dict[str, int] = {}
+        self._lock = threading.RLock()
+        self._active_streams = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+        self._expired = 0
+        self._evicted = 0
+        self._deduplicated = 0
+        self._rejected_streams = 0
+
+    def start(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._reap_loop, name="session-reaper", daemon=True)
+        self._thread.start()
+        logger.info(
+            f"VideoSessionManager started (idle_ttl={self.idle_ttl}s, "
+            f"disk_quota={self.disk_quota}, max_streams={self.max_streams})"
+        )
+
+    def stop(self, remove_all: bool = True) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5.0)
+            self._thread = None
+        if remove_all:
+            with self._lock:
+                for session_id in list(self._sessions):
+                    self._remove_locked(session_id)
+        logger.info("VideoSessionManager stopped")
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def create(self, path: str, polygon_id: Optional[str] = None,
+               filename: Optional[str] = None, upload=None) -> VideoSession:
+        session = VideoSession(str(uuid.uuid4()), path, polygon_id, filename, upload)
+        with self._lock:
+            self._sessions[session.session_id] = session
+            self._path_refs[path] = self._path_refs.get(path, 0) + 1
+        return session
+
+    def get(self, session_id: str) -> Optional[VideoSession]:
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is not None:
+                session.touch()
+                self._sessions.move_to_end(session_id)
+            return session
+
+    def remove(self, session_id: str) -> bool:
+        with self._lock:
+            return self._remove_locked(session_id)
+
+    def _remove_locked(self, session_id: str) -> bool:
+        session = self._sessions.pop(session_id, None)
+        if session is None:
+            return False
+        self._release_path(session.path)
+        return True
+
+    def disk_usage(self) -> int:
+        with self._lock:
+            paths = set(self._path_refs)
+        total = 0
+        for path in paths:
+            try:
+                total += os.path.getsize(path)
+            except OSError:
+                pass
+        return total
+
+    def ensure_space(self, nbytes: int = 0) -> bool:
+        # Evicts idle sessions, least recently used first, until nbytes more fit.
+        with self._lock:
+            usage = self.disk_usage()
+            for session_id, session in list(self._sessions.items()):
+                if usage + nbytes <= self.disk_quota:
+                    break
+                if session.busy:
+                    continue
+                shared = self._path_refs.get(session.path, 1) > 1
+                size = 0 if shared else session.size_bytes
+                self._remove_locked(session_id)
+                self._evicted += 1
+                usage -= size
+                logger.info(f"Evicted session {session_id} ({size} bytes) to stay under disk quota")
+            return usage + nbytes <= self.disk_quota
+
+    def upload_finished(self, session: VideoSession) -> None:
+        digest = session.upload.digest if session.upload is not None else None
+        with self._lock:
+            # A stream may already be tailing this file; keep it in that case.
+            if digest and not session.active_streams:
+                for other in self._sessions.values():
+                    if (other is not session and other.upload is not None
+                            and other.upload.digest == digest and other.path != session.path
+                            and os.path.exists(other.path)):
+                        self._release_path(session.path)
+                        session.path = other.path
+                        self._path_refs[other.path] = self._path_refs.get(other.path, 0) + 1
+                        self._deduplicated += 1
+                        logger.info(f"Session {session.session_id} reuses identical upload of {other.session_id}")
+                        break
+        self.ensure_space()
+
+    def retain(self, session: VideoSession) -> str:
+        # Keeps the session's video on disk for another owner (e.g. an analysis
+        # job) even if the session itself expires; pair with release().
+        with self._lock:
+            self._path_refs[session.path] = self._path_refs.get(session.path, 0) + 1
+            return session.path
+
+    def release(self, path: str) -> None:
+        with self._lock:
+            self._release_path(path)
+
+    def _release_path(self, path: str) -> None:
+        refs = self._path_refs.get(path, 1) - 1
+        if refs <= 0:
+            self._path_refs.pop(path, None)
+            remove_file(path)
+        else:
+            self._path_refs[path] = refs
+
+    def begin_stream(self, session: Optional[VideoSession] = None) -> None:
+        with self._lock:
+            if self._active_streams >= self.max_streams:
+                self._rejected_streams += 1
+                raise StreamLimitError(self.max_streams)
+            self._active_streams += 1
+            if session is not None:
+                if session.active_streams == 0:
+                    session.stream_started_at = time.monotonic()
+                    session.stream_frames = 0
+                session.active_streams += 1
+                session.touch()
+
+    def end_stream(self, session: Optional[VideoSession] = None) -> None:
+        with self._lock:
+            self._active_streams = max(0, self._active_streams - 1)
+            if session is not None:
+                session.active_streams = max(0, session.active_streams - 1)
+                session.touch()
+
+    def reap(self) -> int:
+        expired = 0
+        with self._lock:
+            for session_id, session in list(self._sessions.items()):
+                # A running upload counts as activity; one that stalled for
+                # idle_ttl is treated as abandoned.
+                if session.active_streams or session.idle_seconds() < self.idle_ttl:
+                    continue
+                self._remove_locked(session_id)
+                expired += 1
+            self._expired += expired
+        if expired:
+            logger.info(f"Reaped {expired} idle video sessions")
+        self.ensure_space()
+        return expired
+
+    def _reap_loop(self) -> None:
+        while not self._stop.wait(self.reap_interval):
+            try:
+                self.reap()
+            except Exception as exc:
+                logger.warning(f"Session reaper failed: {exc}")
+
+    def stats(self) -> dict:
+        with self._lock:
+            states: Dict[str, int] = {}
+            for session in self._sessions.values():
+                states[session.state] = states.get(session.state, 0) + 1
+            return {
+                "sessions": len(self._sessions),
+                "states": states,
+                "active_streams": self._active_streams,
+                "max_streams": self.max_streams,
+                "disk_bytes": self.disk_usage(),
+                "disk_quota": self.disk_quota,
+                "idle_ttl_s": self.idle_ttl,
+                "expired": self._expired,
+                "evicted": self._evicted,
+                "deduplicated": self._deduplicated,
+                "rejected_streams": self._rejected_streams,
+            }
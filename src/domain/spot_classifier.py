@@ -0,0 +1,210 @@
+import ast
+import logging
+import time
+from typing import Dict, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from ..utils.configs import (
+    CLASSIFIER_CROP_SIZE as DEFAULT_CROP_SIZE,
+    ORT_INTER_OP_THREADS as DEFAULT_INTER_OP_THREADS,
+    ORT_INTRA_OP_THREADS as DEFAULT_INTRA_OP_THREADS,
+)
+from .backends import BackendResult
+
+logger = logging.getLogger(__name__)
+
+# Registry "backend" of spot classifiers: entries are keyed like detection
+# models, so classifiers get the same LRU, hot reload and /health stats.
+CLASSIFIER_BACKEND = "classifier"
+
+_OCCUPIED_LABELS = ("car", "occupied", "taken", "busy")
+_FREE_LABELS = ("free", "empty", "vacant", "available")
+
+
+def normalize_names(labels: Dict[int, str]) -> Dict[int, str]:
+    # Classifier labels mapped onto the detector's 'car' / 'free' classes, so
+    # thresholds and results read the same for both engines.
+    names = {}
+    for class_id, label in labels.items():
+        key = str(label).lower()
+        names[int(class_id)] = 'car' if key in _OCCUPIED_LABELS else 'free' if key in _FREE_LABELS else key
+    if 'car' not in names.values() or 'free' not in names.values():
+        raise ValueError(f"Classifier classes must include one of {_OCCUPIED_LABELS} and one of {_FREE_LABELS}, "
+                         f"got {list(labels.values())}")
+    return names
+
+
+def _quad(points) -> np.ndarray:
+    # Spot corners in file order; other shapes use their minimum-area rectangle.
+    pts = np.asarray(points, dtype=np.float32).reshape(-1, 2)
+    if len(pts) == 4:
+        return pts
+    return cv2.boxPoints(cv2.minAreaRect(pts)).astype(np.float32)
+
+
+class SpotCropper:
+    # Perspective warp of every spot of one polygon set at one resolution to a
+    # crop_size x crop_size crop. The per-spot homographies are folded into one
+    # remap table laid out as a grid of crops, so a frame is cut with a single
+    # cv2.remap call (remap tables are limited to 32767 px per side).
+    __slots__ = ("resolution", "crop_size", "count", "boxes", "_columns", "_rows", "_map1", "_map2")
+
+    def __init__(self, polygons: List[Dict], resolution: Tuple[int, int], crop_size: int = DEFAULT_CROP_SIZE):
+        s = int(crop_size)
+        self.resolution = resolution
+        self.crop_size = s
+        self.count = len(polygons)
+        w, h = resolution
+
+        quads = np.stack([_quad(p['points']) for p in polygons]) if polygons else np.empty((0, 4, 2), np.float32)
+        self.boxes = np.concatenate([quads.min(axis=1), quads.max(axis=1)], axis=1) if len(quads) else np.empty((0, 4))
+        self.boxes = self.boxes.clip(0, [w, h, w, h]).astype(np.float32)
+
+        corners = np.array([[0, 0], [s, 0], [s, s], [0, s]], dtype=np.float32)
+        homographies = np.stack([cv2.getPerspectiveTransform(corners, quad) for quad in quads]) \
+            if len(quads) else np.empty((0, 3, 3))
+        u, v = np.meshgrid(np.arange(s) + 0.5, np.arange(s) + 0.5)
+        grid = np.stack([u.ravel(), v.ravel(), np.ones(s * s)])
+        mapped = homographies @ grid
+        xs = (mapped[:, 0] / mapped[:, 2] - 0.5).reshape(-1, s, s)
+        ys = (mapped[:, 1] / mapped[:, 2] - 0.5).reshape(-1, s, s)
+
+        self._columns = max(1, int(np.ceil(np.sqrt(max(self.count, 1)))))
+        self._rows = max(1, int(np.ceil(self.count / self._columns)))
+        pad = self._rows * self._columns - self.count
+        tables = []
+        for table in (xs, ys):
+            table = np.concatenate([table, np.full((pad, s, s), -1.0)]) if pad else table
+            table = table.reshape(self._rows, self._columns, s, s).transpose(0, 2, 1, 3)
+            tables.append(np.ascontiguousarray(table.reshape(self._rows * s, self._columns * s), dtype=np.float32))
+        self._map1, self._map2 = cv2.convertMaps(tables[0], tables[1], cv2.CV_16SC2)
+
+    def crops(self, image: np.ndarray) -> np.ndarray:
+        # (count, crop_size, crop_size, 3) BGR crops in polygon order.
+        s = self.crop_size
+        sheet = cv2.remap(image, self._map1, self._map2, cv2.INTER_LINEAR, borderMode=cv2.BORDER_CONSTANT)
+        sheet = sheet.reshape(self._rows, s, self._columns, s, -1).transpose(0, 2, 1, 3, 4)
+        return sheet.reshape(self._rows * self._columns, s, s, -1)[:self.count]
+
+
+class _Classifier:
+    # classify(crops) -> (probs (N, C), speed ms for the call). predict() keeps
+    # the backend interface for the registry warmup; each BackendResult.data
+    # then holds the class probabilities of one image.
+    name = ""
+    precision = "fp32"
+    thread_safe = True
+    agreement: Optional[float] = None
+    input_size = DEFAULT_CROP_SIZE
+    names: Dict[int, str] = {}
+
+    def classify(self, crops: np.ndarray) -> Tuple[np.ndarray, Dict[str, float]]:
+        raise NotImplementedError
+
+    def predict(self, images, imgsz: int = 0, conf: float = 0.0, iou: float = 0.0) -> List[BackendResult]:
+        if isinstance(images, np.ndarray) and images.ndim == 3:
+            images = [images]
+        size = self.input_size
+        crops = np.stack([cv2.resize(image, (size, size), interpolation=cv2.INTER_AREA) for image in images])
+        probs, speed = self.classify(crops)
+        return [BackendResult(row, dict(speed)) for row in probs]
+
+
+class UltralyticsClassifier(_Classifier):
+    name = "torch"
+    thread_safe = False
+
+    def __init__(self, model_path: str, device: str = "cpu"):
+        from ultralytics import YOLO
+
+        self.model_path = model_path
+        self.device = device
+        self.model = YOLO(model_path, task="classify")
+        if self.model.task != "classify":
+            raise ValueError(f"{model_path} is a {self.model.task} model, not a classifier")
+        self.labels = dict(self.model.names)
+        self.names = normalize_names(self.labels)
+        args = getattr(self.model.model, "args", None) or {}
+        imgsz = args.get("imgsz") if isinstance(args, dict) else getattr(args, "imgsz", None)
+        self.input_size = int(imgsz[0] if isinstance(imgsz, (list, tuple)) else imgsz or DEFAULT_CROP_SIZE)
+
+    def classify(self, crops: np.ndarray) -> Tuple[np.ndarray, Dict[str, float]]:
+        results = self.model(list(crops), verbose=False, device=self.device, imgsz=self.input_size)
+        probs = np.stack([result.probs.data.cpu().numpy() for result in results]).astype(np.float32)
+        speed: Dict[str, float] = {}
+        for result in results:
+            for key, ms in result.speed.items():
+                if ms is not None:
+                    speed[key] = speed.get(key, 0.0) + ms
+        return probs, speed
+
+
+class OnnxClassifier(_Classifier):
+    name = "onnx"
+
+    def __init__(
+        self,
+        artifact: str,
+        device: str = "cpu",
+        intra_op_threads: int = DEFAULT_INTRA_OP_THREADS,
+        inter_op_threads: int = DEFAULT_INTER_OP_THREADS,
+    ):
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if intra_op_threads:
+            options.intra_op_num_threads = intra_op_threads
+        if inter_op_threads:
+            options.inter_op_num_threads = inter_op_threads
+        providers = ["CPUExecutionProvider"]
+        if device == "cuda" and "CUDAExecutionProvider" in ort.get_available_providers():
+            providers.insert(0, "CUDAExecutionProvider")
+        self.artifact = artifact
+        self.session = ort.InferenceSession(artifact, options, providers=providers)
+        model_input = self.session.get_inputs()[0]
+        self.input_name = model_input.name
+
+        meta = self.session.get_modelmeta().custom_metadata_map
+        self.labels = ast.literal_eval(meta.get("names", "{}"))
+        self.names = normalize_names(self.labels)
+        # Static dims are ints, dynamic ones are names (None when unknown).
+        batch, _, height = model_input.shape[:3]
+        imgsz = ast.literal_eval(meta.get("imgsz", "None"))
+        if isinstance(height, int):
+            self.input_size = height
+        elif imgsz:
+            self.input_size = int(imgsz[0] if isinstance(imgsz, (list, tuple)) else imgsz)
+        self.fixed_batch = batch if isinstance(batch, int) else None
+
+    def classify(self, crops: np.ndarray) -> Tuple[np.ndarray, Dict[str, float]]:
+        started = time.perf_counter()
+        size = self.input_size
+        if crops.shape[1:3] != (size, size):
+            crops = np.stack([cv2.resize(crop, (size, size), interpolation=cv2.INTER_AREA) for crop in crops])
+        blob = np.ascontiguousarray(crops[..., ::-1].transpose(0, 3, 1, 2), dtype=np.float32)
+        blob /= 255.0
+        preprocessed = time.perf_counter()
+
+        step = self.fixed_batch or len(blob)
+        outputs = [self.session.run(None, {self.input_name: blob[i:i + step]})[0] for i in range(0, len(blob), step)]
+        probs = np.concatenate(outputs).astype(np.float32)
+        inferred = time.perf_counter()
+        # Exports from ultralytics end in a softmax; plain logits do not.
+        if not np.allclose(probs.sum(axis=1), 1.0, atol=1e-3):
+            probs = np.exp(probs - probs.max(axis=1, keepdims=True))
+            probs /= probs.sum(axis=1, keepdims=True)
+        speed = {
+            "preprocess": (preprocessed - started) * 1000,
+            "inference": (inferred - preprocessed) * 1000,
+            "postprocess": (time.perf_counter() - inferred) * 1000,
+        }
+        return probs, speed
+
+
+def load_classifier(model_path: str, device: str = "cpu") -> _Classifier:
+    if model_path.endswith(".onnx"):
+        return OnnxClassifier(model_path, device)
+    return UltralyticsClassifier(model_path, device)
@@ -0,0 +1,194 @@
+import logging
+from typing import Callable, Dict, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from ..utils.configs import (
+    TEMPORAL_DIFF_THRESHOLD as DEFAULT_DIFF_THRESHOLD,
+    TEMPORAL_DIFF_WIDTH as DEFAULT_DIFF_WIDTH,
+    TEMPORAL_HYSTERESIS_FRAMES as DEFAULT_HYSTERESIS,
+    TEMPORAL_MAX_STALE_FRAMES as DEFAULT_MAX_STALE_FRAMES,
+    TEMPORAL_MIN_CHANGED_SPOTS as DEFAULT_MIN_CHANGED_SPOTS,
+)
+
+logger = logging.getLogger(__name__)
+
+
+def summarize_spots(spots: List[Dict]) -> Dict:
+    occupied_count = sum(1 for s in spots if s['status'] == 'occupied')
+    free_count = sum(1 for s in spots if s['status'] == 'free')
+    total_spots = len(spots)
+    unknown_count = total_spots - occupied_count - free_count
+    return {
+        'total_spots': total_spots,
+        'occupied_count': occupied_count,
+        'free_count': free_count,
+        'unknown_count': unknown_count,
+        'vacant_count': free_count + unknown_count,
+        'occupancy_rate': round((occupied_count / total_spots * 100) if total_spots > 0 else 0, 2),
+    }
+
+
+class _SpotMasks:
+    # Flat pixel indices of every polygon on the downscaled grayscale frame, so
+    # per-spot mean differences are a single bincount.
+
+    def __init__(self, polygons: List[Dict], resolution: Tuple[int, int], diff_width: int):
+        w, h = resolution
+        self.scale = min(1.0, diff_width / max(1, w))
+        self.size = (max(1, int(round(w * self.scale))), max(1, int(round(h * self.scale))))
+        dw, dh = self.size
+
+        indices, owners = [], []
+        for i, poly in enumerate(polygons):
+            pts = np.asarray(poly['points'], dtype=np.float64).reshape(-1, 2) * self.scale
+            if len(pts) < 3:
+                continue
+            x0, y0 = np.floor(pts.min(axis=0)).astype(int)
+            x1, y1 = np.ceil(pts.max(axis=0)).astype(int) + 1
+            x0, y0 = max(0, x0), max(0, y0)
+            x1, y1 = min(dw, x1), min(dh, y1)
+            if x1 <= x0 or y1 <= y0:
+                continue
+            mask = np.zeros((y1 - y0, x1 - x0), dtype=np.uint8)
+            cv2.fillPoly(mask, [np.round(pts - (x0, y0)).astype(np.int32)], 1)
+            ys, xs = np.nonzero(mask)
+            indices.append((ys + y0) * dw + (xs + x0))
+            owners.append(np.full(len(ys), i, dtype=np.intp))
+
+        self.spot_count = len(polygons)
+        self.indices = np.concatenate(indices) if indices else np.empty(0, dtype=np.intp)
+        self.owners = np.concatenate(owners) if owners else np.empty(0, dtype=np.intp)
+        self.counts = np.bincount(self.owners, minlength=self.spot_count).astype(np.float64)
+
+    def gray(self, frame: np.ndarray) -> np.ndarray:
+        small = frame
+        if (frame.shape[1], frame.shape[0]) != self.size:
+            small = cv2.resize(frame, self.size, interpolation=cv2.INTER_AREA)
+        return cv2.cvtColor(small, cv2.COLOR_BGR2GRAY) if small.ndim == 3 else small
+
+    def mean_diff(self, gray: np.ndarray, reference: np.ndarray) -> np.ndarray:
+        diff = cv2.absdiff(gray, reference).ravel()
+        sums = np.bincount(self.owners, weights=diff[self.indices], minlength=self.spot_count)
+        return np.divide(sums, self.counts, out=np.zeros(self.spot_count), where=self.counts > 0)
+
+
+class TemporalOccupancyTracker:
+    # Per-video-session occupancy state. Full inference only runs when enough
+    # spots changed (mean absolute gray difference inside the polygon, against
+    # the last analyzed frame) or the last inference is older than
+    # max_stale_frames; a spot's status only flips after the new status was seen
+    # on `hysteresis` consecutive inferences.
+
+    def __init__(
+        self,
+        detector,
+        infer_fn: Optional[Callable[[np.ndarray], dict]] = None,
+        hysteresis: int = DEFAULT_HYSTERESIS,
+        diff_threshold: float = DEFAULT_DIFF_THRESHOLD,
+        min_changed_spots: int = DEFAULT_MIN_CHANGED_SPOTS,
+        max_stale_frames: int = DEFAULT_MAX_STALE_FRAMES,
+        diff_width: int = DEFAULT_DIFF_WIDTH,
+    ):
+        if hysteresis < 1:
+            raise ValueError(f"hysteresis must be >= 1, got {hysteresis}")
+        if min_changed_spots < 1:
+            raise ValueError(f"min_changed_spots must be >= 1, got {min_changed_spots}")
+        self.detector = detector
+        self.infer_fn = infer_fn or detector.detect
+        self.hysteresis = hysteresis
+        self.diff_threshold = diff_threshold
+        self.min_changed_spots = min_changed_spots
+        self.max_stale_frames = max_stale_frames
+        self.diff_width = diff_width
+
+        self._masks: Optional[_SpotMasks] = None
+        self._resolution: Optional[Tuple[int, int]] = None
+        self._reference: Optional[np.ndarray] = None
+        self._last_inference_frame = -1
+        self._spots: List[Dict] = []
+        self._pending: List[Optional[str]] = []
+        self._pending_count: List[int] = []
+        self._detections = None
+
+        self.frames = 0
+        self.inferences = 0
+
+    def _reset(self, resolution: Tuple[int, int]) -> None:
+        polygons = self.detector._polygons_for_resolution(resolution)
+        self._masks = _SpotMasks(polygons, resolution, self.diff_width)
+        self._resolution = resolution
+        self._reference = None
+        self._spots = []
+
+    def _should_infer(self, gray: np.ndarray, frame_index: int) -> Tuple[bool, int]:
+        if self._reference is None or not self._spots:
+            return True, self._masks.spot_count
+        changed = int(np.count_nonzero(self._masks.mean_diff(gray, self._reference) > self.diff_threshold))
+        if changed >= self.min_changed_spots:
+            return True, changed
+        return frame_index - self._last_inference_frame >= self.max_stale_frames, changed
+
+    def _apply(self, result: dict, frame_index: int) -> None:
+        raw_spots = result.get('spots', [])
+        if len(raw_spots) != len(self._spots):
+            self._spots = [dict(spot, last_changed_frame=frame_index) for spot in raw_spots]
+            self._pending = [None] * len(raw_spots)
+            self._pending_count = [0] * len(raw_spots)
+            return
+
+        for i, raw in enumerate(raw_spots):
+            stable = self._spots[i]
+            if raw['status'] == stable['status']:
+                self._spots[i] = dict(raw, last_changed_frame=stable['last_changed_frame'])
+                self._pending[i] = None
+                self._pending_count[i] = 0
+                continue
+            if raw['status'] == self._pending[i]:
+                self._pending_count[i] += 1
+            else:
+                self._pending[i] = raw['status']
+                self._pending_count[i] = 1
+            if self._pending_count[i] >= self.hysteresis:
+                self._spots[i] = dict(raw, last_changed_frame=frame_index)
+                self._pending[i] = None
+                self._pending_count[i] = 0
+
+    def update(self, frame: np.ndarray, frame_index: int) -> dict:
+        resolution = (frame.shape[1], frame.shape[0])
+        if resolution != self._resolution:
+            self._reset(resolution)
+
+        self.frames += 1
+        gray = self._masks.gray(frame)
+        inferred, changed = self._should_infer(gray, frame_index)
+        if inferred:
+            result = self.infer_fn(frame)
+            self.inferences += 1
+            self._reference = gray
+            self._last_inference_frame = frame_index
+            self._detections = result.get('detections')
+            self._apply(result, frame_index)
+
+        spots = [dict(spot) for spot in self._spots]
+        return {
+            'spots': spots,
+            'summary': summarize_spots(spots),
+            'detections': self._detections,
+            'temporal': {
+                'inferred': inferred,
+                'changed_spots': changed,
+                'last_inference_frame': self._last_inference_frame,
+                **self.stats(),
+            },
+        }
+
+    def stats(self) -> dict:
+        skipped = self.frames - self.inferences
+        return {
+            'frames': self.frames,
+            'inferences': self.inferences,
+            'skipped': skipped,
+            'skip_ratio': round(skipped / self.frames, 4) if self.frames else 0.0,
+        }
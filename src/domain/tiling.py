@@ -0,0 +1,154 @@
+import logging
+from typing import Dict, List, Sequence, Tuple
+
+import cv2
+import numpy as np
+
+from ..utils.configs import (
+    TILE_NMS_THRESHOLD as DEFAULT_NMS_THRESHOLD,
+    TILE_OVERLAP as DEFAULT_OVERLAP,
+    TILE_POLYGON_MARGIN as DEFAULT_MARGIN,
+)
+
+logger = logging.getLogger(__name__)
+
+# The polygon union is rasterized at 1/8 of the frame to decide which tiles to keep.
+_MASK_SCALE = 0.125
+# A box within this many pixels of an inner tile edge is probably cut by it.
+_EDGE_PX = 2.0
+
+
+def _starts(lo: int, hi: int, size: int, limit: int, overlap: float) -> List[int]:
+    # Evenly spread tile origins covering [lo, hi) with at least `overlap`.
+    if hi - lo <= size:
+        start = (lo + hi - size) // 2
+        return [min(max(start, 0), limit - size)]
+    stride = max(1.0, size * (1.0 - overlap))
+    count = int(np.ceil((hi - lo - size) / stride)) + 1
+    starts = np.linspace(lo, hi - size, count).round().astype(int)
+    return sorted(set(min(max(int(s), 0), limit - size) for s in starts))
+
+
+class TilePlan:
+    # Tiles (x0, y0, x1, y1) in frame pixels that cover the spot polygons of
+    # one frame resolution. All tiles have the same size so they batch together.
+    __slots__ = ("resolution", "tiles", "coverage")
+
+    def __init__(self, resolution: Tuple[int, int], tiles: np.ndarray):
+        self.resolution = resolution
+        self.tiles = np.asarray(tiles, dtype=np.int64).reshape(-1, 4)
+        w, h = resolution
+        areas = (self.tiles[:, 2] - self.tiles[:, 0]) * (self.tiles[:, 3] - self.tiles[:, 1])
+        self.coverage = float(areas.sum()) / max(w * h, 1)
+
+    def __len__(self) -> int:
+        return len(self.tiles)
+
+    def crops(self, image: np.ndarray) -> List[np.ndarray]:
+        return [image[y0:y1, x0:x1] for x0, y0, x1, y1 in self.tiles.tolist()]
+
+    def merge(self, parts: Sequence[np.ndarray], threshold: float = DEFAULT_NMS_THRESHOLD) -> np.ndarray:
+        # parts[i]: (N, 6) [x1, y1, x2, y2, conf, cls] in pixels of tile i.
+        # Returns the detections of the whole frame in frame pixels.
+        w, h = self.resolution
+        rows, truncated, tile_ids = [], [], []
+        for i, ((x0, y0, x1, y1), data) in enumerate(zip(self.tiles.tolist(), parts)):
+            if len(data) == 0:
+                continue
+            data = np.array(data, dtype=np.float32, copy=True)
+            truncated.append(
+                ((x0 > 0) & (data[:, 0] <= _EDGE_PX))
+                | ((y0 > 0) & (data[:, 1] <= _EDGE_PX))
+                | ((x1 < w) & (data[:, 2] >= x1 - x0 - _EDGE_PX))
+                | ((y1 < h) & (data[:, 3] >= y1 - y0 - _EDGE_PX))
+            )
+            data[:, [0, 2]] += x0
+            data[:, [1, 3]] += y0
+            rows.append(data)
+            tile_ids.append(np.full(len(data), i))
+        if not rows:
+            return np.empty((0, 6), np.float32)
+        data = np.concatenate(rows)
+        if len(self.tiles) == 1:
+            return data
+        keep = merge_across_tiles(data, np.concatenate(truncated), np.concatenate(tile_ids), self.tiles, threshold)
+        return data[keep]
+
+
+def merge_across_tiles(data: np.ndarray, truncated: np.ndarray, tile_ids: np.ndarray,
+                       tiles: np.ndarray, threshold: float) -> np.ndarray:
+    # Greedy class-aware suppression between boxes of different tiles, by
+    # intersection over the smaller box so a car cut by a tile edge matches its
+    # full box in the neighbouring tile. Full boxes win over cut ones, then the
+    # higher confidence wins. Pairs from the same tile were already handled by
+    # the model's NMS, and only boxes reaching into another tile can have a
+    # duplicate, so the loop runs over the overlap bands only.
+    boxes = data[:, :4]
+    overlaps = (
+        (boxes[:, None, 0] < tiles[None, :, 2]) & (boxes[:, None, 2] > tiles[None, :, 0])
+        & (boxes[:, None, 1] < tiles[None, :, 3]) & (boxes[:, None, 3] > tiles[None, :, 1])
+    )
+    keep = np.ones(len(data), dtype=bool)
+    candidates = np.nonzero(overlaps.sum(axis=1) > 1)[0]
+    if len(candidates) < 2:
+        return keep
+
+    order = candidates[np.lexsort((-data[candidates, 4], truncated[candidates]))]
+    cb = boxes[order]
+    areas = np.maximum(cb[:, 2] - cb[:, 0], 0) * np.maximum(cb[:, 3] - cb[:, 1], 0)
+    classes = data[order, 5]
+    tiles_of = tile_ids[order]
+    suppressed = np.zeros(len(order), dtype=bool)
+    for i in range(len(order) - 1):
+        if suppressed[i]:
+            continue
+        rest = slice(i + 1, None)
+        iw = np.minimum(cb[i, 2], cb[rest, 2]) - np.maximum(cb[i, 0], cb[rest, 0])
+        ih = np.minimum(cb[i, 3], cb[rest, 3]) - np.maximum(cb[i, 1], cb[rest, 1])
+        inter = np.maximum(iw, 0) * np.maximum(ih, 0)
+        ios = inter / np.maximum(np.minimum(areas[i], areas[rest]), 1e-6)
+        suppressed[rest] |= (ios >= threshold) & (classes[rest] == classes[i]) & (tiles_of[rest] != tiles_of[i])
+    keep[order[suppressed]] = False
+    return keep
+
+
+def plan_tiles(polygons: List[Dict], resolution: Tuple[int, int], tile_size: int,
+               overlap: float = DEFAULT_OVERLAP, margin: int = DEFAULT_MARGIN) -> TilePlan:
+    w, h = resolution
+    tw, th = min(tile_size, w), min(tile_size, h)
+
+    mw, mh = max(1, int(np.ceil(w * _MASK_SCALE))), max(1, int(np.ceil(h * _MASK_SCALE)))
+    mask = np.zeros((mh, mw), np.uint8)
+    outlines = [np.round(np.asarray(p['points'], np.float64).reshape(-1, 2) * _MASK_SCALE).astype(np.int32)
+                for p in polygons if len(p['points'])]
+    cv2.fillPoly(mask, outlines, 1)
+    pad = int(np.ceil(margin * _MASK_SCALE))
+    if pad:
+        mask = cv2.dilate(mask, np.ones((2 * pad + 1, 2 * pad + 1), np.uint8))
+
+    ys, xs = np.nonzero(mask)
+    if len(xs) == 0:
+        # No spot inside the frame: fall back to a single whole-frame pass.
+        return TilePlan(resolution, [(0, 0, w, h)])
+    bx0 = max(0, int(xs.min() / _MASK_SCALE))
+    by0 = max(0, int(ys.min() / _MASK_SCALE))
+    bx1 = min(w, int(np.ceil((xs.max() + 1) / _MASK_SCALE)))
+    by1 = min(h, int(np.ceil((ys.max() + 1) / _MASK_SCALE)))
+
+    integral = cv2.integral(mask)
+    tiles = []
+    for y0 in _starts(by0, by1, th, h, overlap):
+        for x0 in _starts(bx0, bx1, tw, w, overlap):
+            # Keep the tile only if some spot (plus margin) falls inside it.
+            mx0, my0 = int(x0 * _MASK_SCALE), int(y0 * _MASK_SCALE)
+            mx1 = min(mw, int(np.ceil((x0 + tw) * _MASK_SCALE)))
+            my1 = min(mh, int(np.ceil((y0 + th) * _MASK_SCALE)))
+            area = integral[my1, mx1] - integral[my0, mx1] - integral[my1, mx0] + integral[my0, mx0]
+            if area > 0:
+                tiles.append((x0, y0, x0 + tw, y0 + th))
+    plan = TilePlan(resolution, tiles)
+    logger.info(
+        f"Tile plan {w}x{h}: {len(plan)} tiles of {tw}x{th} "
+        f"({plan.coverage:.0%} of the frame pixels, overlap {overlap:.0%})"
+    )
+    return plan
@@ -0,0 +1,301 @@
+import base64
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional
+
+import cv2
+
+from ..utils.configs import (
+    JOBS_BATCH_SIZE as DEFAULT_BATCH_SIZE,
+    JOBS_MAX_CONCURRENT as DEFAULT_MAX_CONCURRENT,
+    JOBS_MAX_RETAINED as DEFAULT_MAX_RETAINED,
+    JOBS_RESULT_TTL as DEFAULT_RESULT_TTL,
+)
+from ..utils import metrics
+from ..utils.draw_utils import annotate_frame
+from ..utils.upload_utils import remove_file
+
+logger = logging.getLogger(__name__)
+
+_FINISHED = ("done", "failed", "cancelled")
+
+
+class _JobCancelled(Exception):
+    pass
+
+
+class VideoJob:
+    __slots__ = (
+        "job_id", "video_path", "detector", "options", "state", "total_frames",
+        "frames_processed", "frames_read", "created_at", "started_at", "finished_at",
+        "error", "result_path", "cancel_event", "on_done", "future",
+    )
+
+    def __init__(self, video_path: str, detector, options: dict, on_done: Optional[Callable[[], None]] = None):
+        self.job_id = str(uuid.uuid4())
+        self.video_path = video_path
+        self.detector = detector
+        self.options = options
+        self.state = "queued"
+        self.total_frames = 0
+        self.frames_processed = 0
+        self.frames_read = 0
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.error: Optional[str] = None
+        self.result_path: Optional[str] = None
+        self.cancel_event = threading.Event()
+        self.on_done = on_done
+        self.future = None
+
+    @property
+    def finished(self) -> bool:
+        return self.state in _FINISHED
+
+    def to_dict(self) -> dict:
+        elapsed = None
+        fps = 0.0
+        if self.started_at is not None:
+            elapsed = (self.finished_at or time.time()) - self.started_at
+            fps = round(self.frames_processed / elapsed, 2) if elapsed > 0 else 0.0
+        progress = None
+        if self.total_frames:
+            progress = round(min(100.0, self.frames_read / self.total_frames * 100), 1)
+        if self.state == "done":
+            progress = 100.0
+        return {
+            "job_id": self.job_id,
+            "state": self.state,
+            "progress": progress,
+            "frames_processed": self.frames_processed,
+            "frames_read": self.frames_read,
+            "total_frames": self.total_frames,
+            "fps": fps,
+            "elapsed_s": round(elapsed, 2) if elapsed is not None else None,
+            "error": self.error,
+            "options": self.options,
+            "created_at": self.created_at,
+        }
+
+
+class _SummaryAccumulator:
+    def __init__(self):
+        self.frames = 0
+        self.total_spots = 0
+        self.occupied = 0
+        self.free = 0
+        self.rate = 0.0
+
+    def add(self, summary: dict) -> None:
+        if not summary:
+            return
+        self.frames += 1
+        self.total_spots = max(self.total_spots, summary.get('total_spots', 0))
+        self.occupied += summary.get('occupied_count', 0)
+        self.free += summary.get('free_count', 0)
+        self.rate += summary.get('occupancy_rate', 0.0)
+
+    def overall(self) -> dict:
+        # Mean over the analyzed frames.
+        n = max(self.frames, 1)
+        occupied = round(self.occupied / n)
+        free = round(self.free / n)
+        unknown = max(0, self.total_spots - occupied - free)
+        return {
+            'total_spots': self.total_spots,
+            'occupied_count': occupied,
+            'free_count': free,
+            'unknown_count': unknown,
+            'vacant_count': free + unknown,
+            'occupancy_rate': round(self.rate / n, 2),
+        }
+
+
+class VideoJobManager:
+    # Runs ParkingDetector.detect_video for recorded footage in the background.
+    # Frames are analyzed in batches without annotation/JPEG encoding (unless
+    # return_frames is set) and streamed into a JSON result file on disk shaped
+    # like VideoDetectionResponse.
+
+    def __init__(
+        self,
+        max_concurrent: int = DEFAULT_MAX_CONCURRENT,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        result_ttl: float = DEFAULT_RESULT_TTL,
+        max_retained: int = DEFAULT_MAX_RETAINED,
+    ):
+        if max_concurrent < 1:
+            raise ValueError(f"max_concurrent must be >= 1, got {max_concurrent}")
+        self.max_concurrent = max_concurrent
+        self.batch_size = batch_size
+        self.result_ttl = result_ttl
+        self.max_retained = max_retained
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrent, thread_name_prefix="video-job")
+        self._jobs: Dict[str, VideoJob] = {}
+        self._lock = threading.Lock()
+
+    def submit(self, video_path: str, detector, options: dict,
+               on_done: Optional[Callable[[], None]] = None) -> VideoJob:
+        self._prune()
+        job = VideoJob(video_path, detector, options, on_done)
+        with self._lock:
+            self._jobs[job.job_id] = job
+        job.future = self._executor.submit(metrics.bind_context(self._run), job)
+        logger.info(f"Video job {job.job_id} queued ({video_path}, {options})")
+        return job
+
+    def get(self, job_id: str) -> Optional[VideoJob]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def list(self) -> List[VideoJob]:
+        self._prune()
+        with self._lock:
+            return sorted(self._jobs.values(), key=lambda job: job.created_at, reverse=True)
+
+    def cancel(self, job_id: str) -> bool:
+        job = self.get(job_id)
+        if job is None:
+            return False
+        job.cancel_event.set()
+        if job.future is not None and job.future.cancel():
+            self._finish(job, "cancelled")
+        return True
+
+    def remove(self, job_id: str) -> bool:
+        if not self.cancel(job_id):
+            return False
+        with self._lock:
+            job = self._jobs.pop(job_id, None)
+        if job is not None and job.finished and job.result_path:
+            remove_file(job.result_path)
+        return True
+
+    def _finish(self, job: VideoJob, state: str, error: Optional[str] = None) -> None:
+        job.state = state
+        job.error = error
+        job.finished_at = time.time()
+        if state != "done" and job.result_path:
+            remove_file(job.result_path)
+            job.result_path = None
+        if job.on_done is not None:
+            try:
+                job.on_done()
+            except Exception as exc:
+                logger.warning(f"Video job {job.job_id} cleanup failed: {exc}")
+            job.on_done = None
+        if job.job_id not in self._jobs and job.result_path:
+            # Removed while running: nobody can download the result any more.
+            remove_file(job.result_path)
+
+    def _run(self, job: VideoJob) -> None:
+        job.state = "running"
+        job.started_at = time.time()
+        cap = cv2.VideoCapture(job.video_path)
+        job.total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT) or 0) if cap.isOpened() else 0
+        cap.release()
+
+        fd, job.result_path = tempfile.mkstemp(prefix="parking_job_", suffix=".json")
+        opts = job.options
+        summary = _SummaryAccumulator()
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                f.write('{"frames": [')
+                results = job.detector.detect_video(
+                    job.video_path,
+                    skip_frames=opts.get("skip_frames"),
+                    sample_interval_ms=opts.get("sample_ms"),
+                    temporal=opts.get("temporal", False),
+                    batch_size=self.batch_size,
+                    return_frame=opts.get("return_frames", False),
+                )
+                try:
+                    for result in results:
+                        if job.cancel_event.is_set():
+                            raise _JobCancelled()
+                        frame = {
+                            "frame_number": result["frame_number"],
+                            "summary": result["summary"],
+                            "spots": result["spots"] if opts.get("include_spots") else [],
+                        }
+                        if opts.get("return_frames"):
+                            frame["annotated_frame_b64"] = self._encode_frame(result)
+                        f.write(("," if job.frames_processed else "") + json.dumps(frame))
+                        summary.add(result["summary"])
+                        job.frames_processed += 1
+                        job.frames_read = result.get("frames_read", job.frames_read)
+                finally:
+                    results.close()
+                f.write(
+                    '], "total_frames_processed": ' + json.dumps(job.frames_processed)
+                    + ', "total_frames_read": ' + json.dumps(job.frames_read)
+                    + ', "overall_summary": ' + json.dumps(summary.overall()) + '}'
+                )
+        except _JobCancelled:
+            self._finish(job, "cancelled")
+            logger.info(f"Video job {job.job_id} cancelled after {job.frames_processed} frames")
+            return
+        except Exception as exc:
+            self._finish(job, "failed", str(exc))
+            logger.error(f"Video job {job.job_id} failed: {exc}")
+            return
+
+        self._finish(job, "done")
+        logger.info(f"Video job {job.job_id} done: {job.to_dict()}")
+
+    @staticmethod
+    def _encode_frame(result: dict) -> str:
+        frame = annotate_frame(result["frame"], result["spots"], result["summary"])
+        with metrics.timed("encode"):
+            _, jpeg = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, 85])
+        return base64.b64encode(jpeg.tobytes()).decode("ascii")
+
+    def _prune(self) -> None:
+        now = time.time()
+        with self._lock:
+            finished = sorted(
+                (job for job in self._jobs.values() if job.finished),
+                key=lambda job: job.finished_at or 0,
+            )
+            excess = max(0, len(self._jobs) - self.max_retained)
+            expired = [
+                job for i, job in enumerate(finished)
+                if i < excess or now - (job.finished_at or now) > self.result_ttl
+            ]
+            for job in expired:
+                self._jobs.pop(job.job_id, None)
+        for job in expired:
+            if job.result_path:
+                remove_file(job.result_path)
+
+    def stats(self) -> dict:
+        with self._lock:
+            states: Dict[str, int] = {}
+            for job in self._jobs.values():
+                states[job.state] = states.get(job.state, 0) + 1
+            return {
+                "jobs": len(self._jobs),
+                "states": states,
+                "max_concurrent": self.max_concurrent,
+                "batch_size": self.batch_size,
+            }
+
+    def shutdown(self) -> None:
+        with self._lock:
+            jobs = list(self._jobs.values())
+        for job in jobs:
+            job.cancel_event.set()
+        self._executor.shutdown(wait=True, cancel_futures=True)
+        for job in jobs:
+            if not job.finished:
+                self._finish(job, "cancelled")
+            if job.result_path:
+                remove_file(job.result_path)
+        logger.info("VideoJobManager stopped")
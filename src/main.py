@@ -2,11 +2,30 @@ import logging
 from contextlib import asynccontextmanager
 
 from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 
-from src.domain.parking_detector import get_or_load_model
+from src.domain.batch_scheduler import BatchScheduler
+from src.domain.cameras import CameraManager
+from src.domain.inference_pool import InferencePool
+from src.domain.model_registry import MODEL_REGISTRY
+from src.domain.session_manager import VideoSessionManager
+from src.domain.video_jobs import VideoJobManager
 from src.routers import parking_router
-from src.utils.configs import DEVICE, MODEL_PATH
+from src.utils import metrics
+from src.utils.broadcast import BroadcastHub
+from src.utils.configs import (
+    BATCH_ENABLED,
+    BATCH_MAX_SIZE,
+    BATCH_MAX_WAIT_MS,
+    DEVICE,
+    IMAGE_SIZE,
+    INFERENCE_MAX_QUEUE,
+    INFERENCE_POOL_MODE,
+    INFERENCE_WORKERS,
+    METRICS_ENABLED,
+    MODEL_PATH,
+)
 
 logging.basicConfig(
     level=logging.INFO,
@@ -18,8 +37,12 @@ logger = logging.getLogger(__name__)
 async def lifespan(app: FastAPI):
     logger.info(f"[Startup] Đang load model từ '{MODEL_PATH}' trên device '{DEVICE}'...")
     try:
-        model = get_or_load_model(MODEL_PATH, DEVICE)
-        app.state.model = model
+        entry = MODEL_REGISTRY.entry(MODEL_PATH, DEVICE)
+        # Warm up before serving so the first requests don't pay for lazy init.
+        if BATCH_ENABLED and BATCH_MAX_SIZE > 1:
+            MODEL_REGISTRY.warmup(entry, IMAGE_SIZE, BATCH_MAX_SIZE)
+        MODEL_REGISTRY.warmup(entry, IMAGE_SIZE)
+        app.state.model_entry = entry
         app.state.model_path = MODEL_PATH
         app.state.device = DEVICE
         logger.info("[Startup] Model đã sẵn sàng!")
@@ -28,13 +51,51 @@ async def lifespan(app: FastAPI):
             f"[Startup] Không tìm thấy model tại '{MODEL_PATH}'. "
             "API vẫn chạy nhưng /detect sẽ báo lỗi 503."
         )
-        app.state.model = None
+        app.state.model_entry = None
         app.state.model_path = MODEL_PATH
         app.state.device = DEVICE
+    app.state.model_registry = MODEL_REGISTRY
+    MODEL_REGISTRY.start()
+
+    pool_mode = INFERENCE_POOL_MODE if app.state.model_entry is not None else "thread"
+    app.state.inference_pool = InferencePool(
+        max_workers=INFERENCE_WORKERS,
+        max_queue=INFERENCE_MAX_QUEUE,
+        mode=pool_mode,
+        model_path=MODEL_PATH,
+        device=DEVICE,
+    )
+    app.state.batch_scheduler = BatchScheduler(
+        BATCH_MAX_SIZE, BATCH_MAX_WAIT_MS, executor=app.state.inference_pool
+    )
+    app.state.batch_scheduler.start()
+    app.state.session_manager = VideoSessionManager()
+    app.state.session_manager.start()
+    app.state.job_manager = VideoJobManager()
+    app.state.broadcast_hub = BroadcastHub()
+
+    pool, scheduler = app.state.inference_pool, app.state.batch_scheduler
+
+    # Live cameras share the loaded model: frames from different cameras are
+    # batched together like concurrent /detect requests.
+    def _camera_submit(detector, frame):
+        if BATCH_ENABLED and pool.mode == "thread":
+            return scheduler.submit(detector, frame, force=True)
+        return pool.submit_detect(detector, frame, force=True)
+
+    app.state.camera_manager = CameraManager(_camera_submit)
+    app.state.camera_manager.start()
 
     yield
 
     logger.info("[Shutdown] Server đang tắt.")
+    app.state.camera_manager.stop()
+    app.state.broadcast_hub.stop()
+    app.state.job_manager.shutdown()
+    app.state.session_manager.stop()
+    app.state.batch_scheduler.stop()
+    app.state.inference_pool.shutdown()
+    MODEL_REGISTRY.stop()
 
 app = FastAPI(
     title="Parking Detection API",
@@ -56,11 +117,22 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+if METRICS_ENABLED:
+    app.add_middleware(metrics.MetricsMiddleware)
+
 app.include_router(parking_router, prefix="/api/v1")
 
+@app.get("/metrics", tags=["Root"], response_class=PlainTextResponse,
+         summary="Metrics dạng Prometheus text (histogram thời gian từng bước)")
+async def metrics_endpoint():
+    if not METRICS_ENABLED:
+        return PlainTextResponse("metrics disabled\n", status_code=404)
+    return PlainTextResponse(metrics.REGISTRY.render(), media_type=metrics.CONTENT_TYPE)
+
 @app.get("/", tags=["Root"])
 async def root():
-    model_status = "ready" if getattr(app.state, "model", None) is not None else "not loaded"
+    entry = getattr(app.state, "model_entry", None)
+    model_status = "ready" if entry is not None and entry.model is not None else "not loaded"
     return {
         "message": "Parking Detection API đang chạy",
         "model_status": model_status,
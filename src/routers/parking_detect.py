@@ -1,89 +1,516 @@
+import asyncio
+import contextvars
 import logging
 import os
 import tempfile
+import time
 import uuid
-from typing import Dict, List
+from typing import List, Optional, Tuple
 
 from fastapi import APIRouter, File, Form, HTTPException, Query, Request, UploadFile, status
-from starlette.responses import StreamingResponse
+from fastapi.exceptions import RequestValidationError
+from pydantic import ValidationError
+from starlette.responses import FileResponse, StreamingResponse
 
+from ..domain.cameras import Camera, CameraManager
+from ..domain.detector_registry import DetectorRegistry
+from ..domain.inference_pool import PoolSaturatedError
+from ..domain.ingest import ingest_image, ingest_stats
+from ..domain.model_registry import ModelRegistry
 from ..domain.parking_detector import ParkingDetector
-from ..schemas.parking_model import DetectRequest, DetectionConfig, DetectionResponse
-from ..utils.configs import POLYGON_PATH, POLYGONS_DIR
-from ..utils.polygon_utils import load_polygons
-from ..utils.video_utils import mjpeg_generator
+from ..domain.session_manager import StreamLimitError, VideoSession, VideoSessionManager
+from ..domain.temporal import TemporalOccupancyTracker
+from ..domain.video_jobs import VideoJob, VideoJobManager
+from ..schemas.parking_model import (
+    BatchDetectRequest,
+    BatchDetectionResponse,
+    CameraCreateRequest,
+    CameraResult,
+    DetectRequest,
+    DetectionConfig,
+    DetectionResponse,
+    VideoDetectionResponse,
+)
+from ..utils.configs import (
+    ADMIN_TOKEN,
+    AREA_ENGINES,
+    BATCH_ENABLED,
+    BATCH_MAX_ITEMS_PER_REQUEST,
+    CAMERA_MAX_CAMERAS,
+    CLASSIFIER_PATH,
+    POLYGON_PATH,
+    POLYGONS_DIR,
+    PROFILE_ENABLED,
+    SPOT_ENGINE,
+    STREAM_PIPELINE_ENABLED,
+    TILING_ENABLED,
+    UPLOAD_MAX_BYTES,
+)
+from ..utils import metrics, profiling
+from ..utils.event_utils import FrameDeltaEncoder, format_ndjson, format_sse
+from ..utils.broadcast import BroadcastHub, FrameBroadcaster, PooledChunkSource, Subscriber
+from ..utils.polygon_utils import load_polygons_cached
+from ..utils.upload_utils import (
+    UploadProgress,
+    UploadQuotaError,
+    UploadTooLargeError,
+    iter_upload_file,
+    remove_file,
+    save_stream_to_file,
+)
+from ..utils.video_pipeline import MJPEGPipeline
+from ..utils.video_utils import mjpeg_generator, result_generator
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/parking", tags=["Parking Detection"])
 
-_VIDEO_SESSIONS: Dict[str, str] = {}
+_DETECTORS = DetectorRegistry()
 
-def _get_polygons(polygon_id: str = None) -> List[dict]:
+def _get_polygon_set(polygon_id: str = None) -> Tuple[str, List[dict], int]:
     path = POLYGON_PATH
     if polygon_id:
         path = os.path.join(POLYGONS_DIR, f"{polygon_id}.json")
     
     try:
-        return load_polygons(path)
+        polygons, version = load_polygons_cached(path)
+        return path, polygons, version
     except FileNotFoundError:
         if polygon_id:
             logger.warning(f"Polygon {polygon_id} not found, falling back to default.")
-            return load_polygons(POLYGON_PATH)
+            return _get_polygon_set()
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Default polygon file not found.")
     except Exception as exc:
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(exc))
 
 
-def _make_detector(request: Request, polygons: List[dict], cfg: DetectionConfig) -> ParkingDetector:
-    if getattr(request.app.state, "model", None) is None:
+def _current_model(request: Request):
+    entry = getattr(request.app.state, "model_entry", None)
+    return entry.model if entry is not None else None
+
+
+def _make_detector(request: Request, polygon_id: str, cfg: DetectionConfig) -> ParkingDetector:
+    if _current_model(request) is None:
         raise HTTPException(
             status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
             detail="Model YOLO chưa được load. Kiểm tra MODEL_PATH và restart server.",
         )
+    path, polygons, version = _get_polygon_set(polygon_id)
+    model_path = request.app.state.model_path
+    device     = request.app.state.device
+    route      = request.scope.get("route")
+    # Label values stay bounded: route templates, and only polygon ids that
+    # resolved to their own file; anything else a client sends is "other".
+    polygon_label = polygon_id
+    if polygon_id and os.path.basename(path) != f"{polygon_id}.json":
+        polygon_label = "other"
+    metrics.bind(getattr(route, "path", "unmatched"), polygon_label, device)
+    tiled      = cfg.tiled if cfg.tiled is not None else TILING_ENABLED
+    engine     = AREA_ENGINES.get(os.path.splitext(os.path.basename(path))[0], SPOT_ENGINE)
+    params = (
+        model_path, device, cfg.car_confidence, cfg.free_confidence,
+        cfg.general_confidence, cfg.image_size, tiled, engine,
+    )
     try:
-        return ParkingDetector(
-            polygons=polygons,
-            model_path=request.app.state.model_path,
-            car_confidence=cfg.car_confidence,
-            free_confidence=cfg.free_confidence,
-            general_confidence=cfg.general_confidence,
-            device=request.app.state.device,
-            image_size=cfg.image_size,
+        return _DETECTORS.get_or_create(
+            path, version, params,
+            lambda: ParkingDetector(
+                polygons=polygons,
+                model_path=model_path,
+                car_confidence=cfg.car_confidence,
+                free_confidence=cfg.free_confidence,
+                general_confidence=cfg.general_confidence,
+                device=device,
+                image_size=cfg.image_size,
+                tiled=tiled,
+                engine=engine,
+                classifier_path=CLASSIFIER_PATH,
+                polygon_key=(path, version),
+            ),
         )
+    except FileNotFoundError as exc:
+        # Khu vực dùng engine classifier nhưng chưa có model phân loại.
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=str(exc))
     except ValueError as exc:
         raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=str(exc))
 
 
-async def _save_upload_to_temp(video: UploadFile) -> str:
-    suffix = os.path.splitext(video.filename or "video.mp4")[1] or ".mp4"
-    tmp = tempfile.NamedTemporaryFile(delete=False, suffix=suffix)
+def _check_admin(request: Request) -> None:
+    if ADMIN_TOKEN is not None and request.headers.get("x-admin-token") != ADMIN_TOKEN:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Sai hoặc thiếu X-Admin-Token.")
+
+
+def _start_profile(request: Request) -> Optional[profiling.RequestProfile]:
+    # ?profile=true hoặc header X-Profile: true. Gọi sau _make_detector, trước khi
+    # submit việc: pool/thread của request chạy trong bản sao context hiện tại.
+    flag = request.query_params.get("profile") or request.headers.get("x-profile")
+    if flag is None or flag.lower() not in ("1", "true", "yes"):
+        return None
+    if not PROFILE_ENABLED:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN,
+                            detail="Profiling đang tắt (PROFILE_ENABLED).")
+    _check_admin(request)
+    route = request.scope.get("route")
+    return profiling.start(getattr(route, "path", request.url.path))
+
+
+def _new_temp_path(filename: Optional[str]) -> str:
+    suffix = os.path.splitext(filename or "video.mp4")[1] or ".mp4"
+    fd, path = tempfile.mkstemp(suffix=suffix)
+    os.close(fd)
+    return path
+
+
+def _content_length(request: Request) -> Optional[int]:
     try:
-        tmp.write(await video.read())
-        tmp.flush()
-        tmp.close()
+        return int(request.headers["content-length"])
+    except (KeyError, ValueError):
+        return None
+
+
+def _too_large() -> HTTPException:
+    return HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                         detail=f"Video vượt quá giới hạn {UPLOAD_MAX_BYTES // (1024 * 1024)} MB.")
+
+
+def _no_space() -> HTTPException:
+    return HTTPException(status_code=status.HTTP_507_INSUFFICIENT_STORAGE,
+                         detail="Hết dung lượng lưu video tạm, thử lại sau.")
+
+
+async def _write_upload(chunks, progress: UploadProgress, reserve=None) -> UploadProgress:
+    # reserve(total) -> bool is re-checked as the file grows (disk quota).
+    if progress.expected_bytes is not None and progress.expected_bytes > UPLOAD_MAX_BYTES:
+        progress.finish(error="too large")
+        remove_file(progress.path)
+        raise _too_large()
+    try:
+        return await save_stream_to_file(chunks, progress, reserve=reserve)
+    except UploadTooLargeError:
+        remove_file(progress.path)
+        raise _too_large()
+    except UploadQuotaError:
+        remove_file(progress.path)
+        raise _no_space()
     except Exception as exc:
-        tmp.close()
-        os.unlink(tmp.name)
+        remove_file(progress.path)
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                             detail=f"Không đọc được video: {exc}")
-    return tmp.name
 
 
-@router.post("/detect", response_model=DetectionResponse, summary="Phát hiện xe từ ảnh (base64)")
-async def detect_parking(body: DetectRequest, request: Request):
-    detector = _make_detector(request, _get_polygons(body.polygon_id), body.config or DetectionConfig())
+async def _save_upload_to_temp(video: UploadFile, reserve=None) -> UploadProgress:
+    # Copied chunk by chunk: the upload is never held in memory as one bytes object.
+    progress = UploadProgress(_new_temp_path(video.filename), video.size)
+    return await _write_upload(iter_upload_file(video), progress, reserve)
+
+
+def _get_scheduler(request: Request):
+    return getattr(request.app.state, "batch_scheduler", None)
+
+
+def _get_pool(request: Request):
+    pool = getattr(request.app.state, "inference_pool", None)
+    if pool is None:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                            detail="Inference pool chưa sẵn sàng.")
+    return pool
+
+
+def _saturated(exc: PoolSaturatedError) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail=f"Server đang quá tải ({exc.queue_depth} yêu cầu đang chờ), thử lại sau.",
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
+
+def _check_capacity(pool) -> None:
+    if pool.is_saturated():
+        raise _saturated(PoolSaturatedError(pool.stats()["queue_depth"], pool.retry_after()))
+
+
+async def _run_detection(request: Request, items: List[tuple]) -> List[dict]:
+    pool      = _get_pool(request)
+    scheduler = _get_scheduler(request)
+    # Every image is admitted by the pool as it is submitted: a full pool raises
+    # PoolSaturatedError here, before anything of this request runs.
+    if BATCH_ENABLED and scheduler is not None and pool.mode == "thread":
+        futures = scheduler.submit_many(items)
+    else:
+        futures = []
+        try:
+            for item in items:
+                futures.append(pool.submit_detect(*item))
+        except PoolSaturatedError:
+            for future in futures:
+                future.cancel()
+            raise
+    return await asyncio.gather(*(asyncio.wrap_future(f) for f in futures))
+
+
+async def _iterate_in_pool(pool, iterator):
+    # Each frame is pulled on the inference pool so the event loop never runs
+    # decode/YOLO/encode itself. Streams are admitted up front, then forced in.
+    sentinel = object()
+    pending  = None
+    try:
+        while True:
+            pending = pool.submit(next, iterator, sentinel, force=True)
+            chunk   = await asyncio.wrap_future(pending)
+            if chunk is sentinel:
+                break
+            started = time.perf_counter()
+            yield chunk
+            metrics.observe_stage("write", time.perf_counter() - started)
+    finally:
+        if pending is not None and not pending.done():
+            pending.add_done_callback(lambda _f: iterator.close())
+        else:
+            iterator.close()
+
+
+async def _iterate_source(open_source, on_close):
+    # Decode/annotate/encode run on the source's own threads (or the inference
+    # pool); waiting for the next encoded chunk holds no thread, only opening and
+    # closing the source are handed to a worker thread.
+    loop   = asyncio.get_running_loop()
+    source = None
+    try:
+        # Opened in this request's context so the source's threads keep its metrics labels.
+        source = await loop.run_in_executor(None, contextvars.copy_context().run, open_source)
+        while True:
+            chunk = await source.next_chunk_async()
+            if chunk is None:
+                break
+            started = time.perf_counter()
+            yield chunk
+            metrics.observe_stage("write", time.perf_counter() - started)
+    finally:
+        def _shutdown():
+            try:
+                if source is not None:
+                    source.close()
+            finally:
+                on_close()
+
+        loop.run_in_executor(None, _shutdown)
+
+
+async def _iterate_subscriber(subscriber: Subscriber):
+    # Waiting for the next frame holds no thread: the producer wakes this
+    # coroutine, so extra viewers cost only socket writes.
+    try:
+        while True:
+            chunk = await subscriber.next_chunk_async()
+            if chunk is None:
+                break
+            started = time.perf_counter()
+            yield chunk
+            metrics.observe_stage("write", time.perf_counter() - started)
+    finally:
+        # Non-blocking: the last viewer leaving stops the pipeline on its own thread.
+        subscriber.close()
+
+
+def _mjpeg_source(pool, video_path: str, detector: ParkingDetector, skip_frames: int,
+                  sample_ms: Optional[float], temporal: bool = False,
+                  progress: Optional[UploadProgress] = None):
+    # Returns an object with next_chunk()/next_chunk_async()/close(); call it off the event loop.
+    if not STREAM_PIPELINE_ENABLED:
+        tracker = TemporalOccupancyTracker(detector) if temporal else None
+        return PooledChunkSource(pool, mjpeg_generator(video_path, detector, skip_frames,
+                                                       sample_interval_ms=sample_ms,
+                                                       tracker=tracker, progress=progress))
+
+    def _infer(frame):
+        return pool.submit_detect(detector, frame, force=True).result()
+
+    tracker = TemporalOccupancyTracker(detector, infer_fn=_infer) if temporal else None
+    return MJPEGPipeline(video_path, detector, skip_frames, sample_interval_ms=sample_ms,
+                         infer_fn=_infer, tracker=tracker, progress=progress)
+
+
+def _mjpeg_body(pool, video_path: str, detector: ParkingDetector, skip_frames: int,
+                sample_ms: Optional[float], on_close, temporal: bool = False,
+                progress: Optional[UploadProgress] = None):
+    def _open():
+        return _mjpeg_source(pool, video_path, detector, skip_frames, sample_ms, temporal, progress)
+
+    return _iterate_source(_open, on_close)
+
+
+_CONFIG_FIELDS = ("car_confidence", "free_confidence", "general_confidence", "image_size")
+
+_DETECT_OPENAPI = {
+    "requestBody": {
+        "required": True,
+        "content": {
+            "application/json": {"schema": {"$ref": "#/components/schemas/DetectRequest"}},
+            "image/jpeg": {"schema": {"type": "string", "format": "binary"}},
+            "image/png": {"schema": {"type": "string", "format": "binary"}},
+            "multipart/form-data": {
+                "schema": {
+                    "type": "object",
+                    "required": ["image"],
+                    "properties": {
+                        "image": {"type": "string", "format": "binary"},
+                        "polygon_id": {"type": "string"},
+                        **{name: {"type": "number"} for name in _CONFIG_FIELDS},
+                        "tiled": {"type": "boolean"},
+                    },
+                }
+            },
+        },
+    }
+}
+
+
+def _config_from_params(params) -> DetectionConfig:
+    values = {name: params[name] for name in _CONFIG_FIELDS + ("tiled",) if params.get(name) not in (None, "")}
+    try:
+        return DetectionConfig(**values)
+    except ValidationError as exc:
+        raise RequestValidationError(exc.errors())
+
+
+def _ingest(detector: ParkingDetector, buf) -> tuple:
     try:
-        result = detector.detect(body.to_numpy())
+        return ingest_image(buf, detector)
+    except ValueError as exc:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=str(exc))
+
+
+async def _ingest_in_pool(request: Request, inputs: List[tuple]) -> List[tuple]:
+    # JPEG decode, ROI crop and resize run on the pool, one task per image, so
+    # they never block the event loop and a batch is decoded in parallel.
+    pool    = _get_pool(request)
+    futures = []
+    try:
+        for detector, buf in inputs:
+            futures.append(pool.submit(_ingest, detector, buf))
+    except PoolSaturatedError:
+        for future in futures:
+            future.cancel()
+        raise
+    return await asyncio.gather(*(asyncio.wrap_future(f) for f in futures))
+
+
+async def _read_detect_input(request: Request) -> Tuple[Optional[str], DetectionConfig, bytes]:
+    content_type = request.headers.get("content-type", "").split(";", 1)[0].strip().lower()
+
+    if content_type.startswith("image/") or content_type == "application/octet-stream":
+        params = request.query_params
+        return params.get("polygon_id") or None, _config_from_params(params), await request.body()
+
+    if content_type == "multipart/form-data":
+        form   = await request.form()
+        upload = form.get("image")
+        if upload is None or isinstance(upload, str):
+            raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                                detail="Thiếu file 'image' trong form-data.")
+        params = {**request.query_params, **{k: v for k, v in form.items() if isinstance(v, str)}}
+        return params.get("polygon_id") or None, _config_from_params(params), await upload.read()
+
+    try:
+        body = DetectRequest.model_validate(await request.json())
+    except ValidationError as exc:
+        raise RequestValidationError(exc.errors())
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                            detail="Body phải là JSON, image/* hoặc multipart/form-data.")
+    return body.polygon_id, body.config or DetectionConfig(), body.image_bytes()
+
+
+@router.post(
+    "/detect",
+    response_model=DetectionResponse,
+    summary="Phát hiện xe từ ảnh (JSON base64, image/jpeg thô hoặc multipart)",
+    openapi_extra=_DETECT_OPENAPI,
+)
+async def detect_parking(request: Request):
+    polygon_id, cfg, buf = await _read_detect_input(request)
+    detector = _make_detector(request, polygon_id, cfg)
+    profile  = _start_profile(request)
+    if profile is not None:
+        return await _detect_profiled(request, detector, buf, profile)
+    try:
+        (image, transform, report), = await _ingest_in_pool(request, [(detector, buf)])
+        result, = await _run_detection(request, [(detector, image, transform)])
+    except HTTPException:
+        raise
+    except PoolSaturatedError as exc:
+        raise _saturated(exc)
     except Exception as exc:
         logger.exception(f"Lỗi detection ảnh: {exc}")
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(exc))
 
+    result["ingest"] = report
     s = result["summary"]
-    logger.info(f"detect (area={body.polygon_id}): {s['occupied_count']} occupied, {s['free_count']} free")
+    logger.info(f"detect (area={polygon_id}): {s['occupied_count']} occupied, {s['free_count']} free")
     return result
 
 
+async def _detect_profiled(request: Request, detector: ParkingDetector, buf,
+                           profile: profiling.RequestProfile) -> DetectionResponse:
+    # Decode + detect run together on one pool thread, outside the micro-batcher,
+    # so the timing tree (and the optional capture) covers only this request.
+    def _run():
+        with profile.capture():
+            image, transform, report = _ingest(detector, buf)
+            return detector.detect(image, transform), report
+
+    try:
+        result, report = await _get_pool(request).run(_run)
+    except HTTPException:
+        raise
+    except PoolSaturatedError as exc:
+        raise _saturated(exc)
+    except Exception as exc:
+        logger.exception(f"Lỗi detection ảnh (profile): {exc}")
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(exc))
+
+    result["ingest"] = report
+    with profiling.span("serialize"):
+        response = DetectionResponse.model_validate(result)
+    # Finished after the serialize span so the tree includes it; the response
+    # then goes through response_model like the non-profiled path.
+    response.profile = profile.finish()
+    return response
+
+
+@router.post(
+    "/detect/batch",
+    response_model=BatchDetectionResponse,
+    summary="Phát hiện xe từ nhiều ảnh trong 1 request (gộp batch khi inference)",
+)
+async def detect_parking_batch(body: BatchDetectRequest, request: Request):
+    if len(body.items) > BATCH_MAX_ITEMS_PER_REQUEST:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"Tối đa {BATCH_MAX_ITEMS_PER_REQUEST} ảnh mỗi request, nhận {len(body.items)}.",
+        )
+
+    inputs = [(_make_detector(request, item.polygon_id, item.config or DetectionConfig()), item.image_bytes())
+              for item in body.items]
+    try:
+        ingested = await _ingest_in_pool(request, inputs)
+        items    = [(detector, image, transform) for (detector, _), (image, transform, _) in zip(inputs, ingested)]
+        reports  = [report for _, _, report in ingested]
+        results  = await _run_detection(request, items)
+    except HTTPException:
+        raise
+    except PoolSaturatedError as exc:
+        raise _saturated(exc)
+    except Exception as exc:
+        logger.exception(f"Lỗi detection batch: {exc}")
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(exc))
+
+    for result, report in zip(results, reports):
+        result["ingest"] = report
+    logger.info(f"detect/batch: {len(results)} images")
+    return {"results": results}
+
+
 @router.get("/polygons", summary="Danh sách các file polygon có sẵn")
 async def list_polygons():
     if not os.path.exists(POLYGONS_DIR):
@@ -92,26 +519,138 @@ async def list_polygons():
     return sorted(files)
 
 
+def _get_sessions(request: Request) -> VideoSessionManager:
+    manager = getattr(request.app.state, "session_manager", None)
+    if manager is None:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                            detail="Session manager chưa sẵn sàng.")
+    return manager
+
+
+def _get_hub(request: Request) -> BroadcastHub:
+    hub = getattr(request.app.state, "broadcast_hub", None)
+    if hub is None:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                            detail="Broadcast hub chưa sẵn sàng.")
+    return hub
+
+
+def _get_session(request: Request, session_id: str) -> VideoSession:
+    session = _get_sessions(request).get(session_id)
+    if session is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,
+                            detail="Session không tồn tại hoặc đã hết hạn.")
+    return session
+
+
+def _reserve_disk(manager: VideoSessionManager, nbytes: Optional[int]) -> None:
+    # Up-front check on the announced size; _write_upload re-checks as bytes
+    # arrive, which also covers chunked uploads without Content-Length.
+    if not manager.ensure_space(nbytes or 0):
+        raise _no_space()
+
+
+def _begin_stream(manager: VideoSessionManager, session: Optional[VideoSession] = None) -> None:
+    try:
+        manager.begin_stream(session)
+    except StreamLimitError as exc:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=f"Đã đạt tối đa {exc.max_streams} stream đồng thời, thử lại sau.",
+            headers={"Retry-After": str(exc.retry_after)},
+        )
+
+
 @router.post("/session/upload", summary="Upload video, nhận session_id để stream")
 async def upload_video_session(
+    request: Request,
     video: UploadFile = File(...),
     polygon_id: str = Form(default=None)
 ):
-    session_id = str(uuid.uuid4())
-    tmp_path   = await _save_upload_to_temp(video)
-    _VIDEO_SESSIONS[session_id] = {
-        "path": tmp_path,
-        "polygon_id": polygon_id
-    }
-    logger.info(f"Session {session_id}: {video.filename} (area={polygon_id}) → {tmp_path}")
+    manager  = _get_sessions(request)
+    _reserve_disk(manager, video.size)
+    # The temp file is not tracked by the manager until the session exists.
+    progress = await _save_upload_to_temp(video, reserve=manager.ensure_space)
+    session  = manager.create(progress.path, polygon_id, video.filename, upload=progress)
+    manager.upload_finished(session)
+    session_id = session.session_id
+    logger.info(f"Session {session_id}: {video.filename} (area={polygon_id}) → {session.path}")
     return {
         "session_id": session_id,
         "filename":   video.filename,
         "polygon_id": polygon_id,
         "stream_url": f"/api/v1/parking/session/{session_id}/stream",
+        "upload":     progress.to_dict(),
     }
 
 
+@router.post("/session", summary="Tạo session, sau đó PUT video lên upload_url (có thể stream khi đang upload)")
+async def create_video_session(
+    request: Request,
+    polygon_id: Optional[str] = Query(default=None),
+    filename:   Optional[str] = Query(default=None, description="Tên file gốc (để giữ phần mở rộng)"),
+):
+    session    = _get_sessions(request).create(_new_temp_path(filename), polygon_id, filename)
+    session_id = session.session_id
+    logger.info(f"Session {session_id}: tạo mới (area={polygon_id})")
+    return {
+        "session_id": session_id,
+        "polygon_id": polygon_id,
+        "upload_url": f"/api/v1/parking/session/{session_id}/video",
+        "stream_url": f"/api/v1/parking/session/{session_id}/stream",
+    }
+
+
+@router.get("/session/{session_id}", summary="Trạng thái session (upload, số frame đã xử lý, fps)")
+async def get_video_session(session_id: str, request: Request):
+    return _get_session(request, session_id).to_dict()
+
+
+@router.delete("/session/{session_id}", summary="Xoá session và file video tạm")
+async def delete_video_session(session_id: str, request: Request):
+    if not _get_sessions(request).remove(session_id):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,
+                            detail="Session không tồn tại hoặc đã hết hạn.")
+    logger.info(f"Session {session_id}: đã xoá")
+    return {"session_id": session_id, "deleted": True}
+
+
+@router.put("/session/{session_id}/video", summary="Upload video (raw body) cho session, ghi thẳng xuống đĩa")
+async def upload_session_video(session_id: str, request: Request):
+    manager = _get_sessions(request)
+    session = _get_session(request, session_id)
+    if session.upload is not None:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT,
+                            detail="Session đã có video.")
+
+    expected = _content_length(request)
+    _reserve_disk(manager, expected)
+    progress = UploadProgress(session.path, expected)
+    session.upload = progress
+
+    def _reserve(total: int) -> bool:
+        # session.path is already counted in the manager's disk usage.
+        return manager.ensure_space(total - progress.bytes_received)
+
+    try:
+        await _write_upload(request.stream(), progress, _reserve)
+    except HTTPException:
+        manager.remove(session_id)
+        raise
+    manager.upload_finished(session)
+    logger.info(f"Session {session_id}: đã nhận {progress.bytes_received} bytes → {session.path}")
+    return {"session_id": session_id, **progress.to_dict()}
+
+
+@router.get("/session/{session_id}/upload", summary="Tiến độ upload video của session")
+async def session_upload_progress(session_id: str, request: Request):
+    progress = _get_session(request, session_id).upload
+    if progress is None:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT,
+                            detail="Session chưa bắt đầu upload video.")
+    return {"session_id": session_id, **progress.to_dict()}
+
+
 @router.get(
     "/session/{session_id}/stream",
     summary="Stream MJPEG từ video đã upload (dùng <img> tag)",
@@ -123,44 +662,128 @@ async def stream_session(
     car_confidence:     float = Query(default=0.40),
     free_confidence:    float = Query(default=0.25),
     general_confidence: float = Query(default=0.25),
-    skip_frames:        int   = Query(default=2),
+    skip_frames:        int   = Query(default=2, ge=0),
+    sample_ms:          Optional[float] = Query(default=None, gt=0,
+                                                description="Phân tích mỗi N ms video (thay cho skip_frames)"),
+    temporal:           bool  = Query(default=False,
+                                      description="Chỉ chạy lại YOLO khi các ô thay đổi, làm mượt trạng thái theo thời gian"),
 ):
-    if session_id not in _VIDEO_SESSIONS:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,
-                            detail="Session không tồn tại hoặc đã hết hạn.")
-    
-    session_data = _VIDEO_SESSIONS[session_id]
-    video_path = session_data["path"]
-    polygon_id = session_data["polygon_id"]
+    manager  = _get_sessions(request)
+    session  = _get_session(request, session_id)
+    progress = session.upload
 
-    if not os.path.exists(video_path):
-        _VIDEO_SESSIONS.pop(session_id, None)
+    if progress is None:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT,
+                            detail="Session chưa bắt đầu upload video.")
+    if not os.path.exists(session.path):
+        manager.remove(session_id)
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,
                             detail="File video không còn tồn tại.")
 
     cfg      = DetectionConfig(car_confidence=car_confidence,
                                free_confidence=free_confidence,
                                general_confidence=general_confidence)
-    detector = _make_detector(request, _get_polygons(polygon_id), cfg)
+    detector = _make_detector(request, session.polygon_id, cfg)
+    pool     = _get_pool(request)
+    hub      = _get_hub(request)
+    profile  = _start_profile(request)
+    # A profiled viewer gets its own pipeline so the tree only has its frames.
+    key      = (session_id, detector.car_confidence, detector.free_confidence,
+                detector.general_confidence, skip_frames, sample_ms, temporal,
+                profile.profile_id if profile is not None else None)
 
-    def _generator_with_cleanup():
-        try:
-            yield from mjpeg_generator(video_path, detector, skip_frames)
-        finally:
-            _VIDEO_SESSIONS.pop(session_id, None)
-            try:
-                os.unlink(video_path)
-                logger.info(f"Đã xoá temp file, session={session_id}")
-            except Exception:
-                pass
+    # Viewers with the same session + thresholds share one analysis pipeline.
+    # The session (and its video) stays until DELETE, idle TTL or quota eviction.
+    def _factory():
+        _check_capacity(pool)
+        _begin_stream(manager, session)
 
+        def _stopped():
+            manager.end_stream(session)
+            if profile is not None:
+                profile.finish()
+            logger.info(f"Session {session_id}: kết thúc stream ({session.frames_processed} frames)")
+
+        return FrameBroadcaster(
+            lambda: _mjpeg_source(pool, session.path, detector, skip_frames, sample_ms, temporal, progress),
+            on_frame=session.record_frame,
+            on_stop=_stopped,
+            name=f"session-{session_id[:8]}",
+        )
+
+    subscriber = hub.subscribe(key, _factory)
     return StreamingResponse(
-        _generator_with_cleanup(),
+        _iterate_subscriber(subscriber),
         media_type="multipart/x-mixed-replace; boundary=frame",
         headers={"Cache-Control": "no-cache"},
     )
 
 
+_EVENT_MEDIA_TYPES = {"sse": "text/event-stream", "ndjson": "application/x-ndjson"}
+
+
+@router.get(
+    "/session/{session_id}/events",
+    summary="Stream kết quả từng frame dạng SSE / NDJSON (chỉ gửi ô đổi trạng thái + summary)",
+    response_class=StreamingResponse,
+)
+async def stream_session_events(
+    session_id: str,
+    request: Request,
+    format:             Optional[str] = Query(default=None, pattern="^(sse|ndjson)$",
+                                              description="sse | ndjson (mặc định theo header Accept, không có thì sse)"),
+    car_confidence:     float = Query(default=0.40),
+    free_confidence:    float = Query(default=0.25),
+    general_confidence: float = Query(default=0.25),
+    skip_frames:        int   = Query(default=2, ge=0),
+    sample_ms:          Optional[float] = Query(default=None, gt=0),
+    temporal:           bool  = Query(default=False),
+):
+    manager  = _get_sessions(request)
+    session  = _get_session(request, session_id)
+    progress = session.upload
+    if progress is None:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT,
+                            detail="Session chưa bắt đầu upload video.")
+    if format is None:
+        format = "ndjson" if "application/x-ndjson" in request.headers.get("accept", "") else "sse"
+
+    cfg      = DetectionConfig(car_confidence=car_confidence,
+                               free_confidence=free_confidence,
+                               general_confidence=general_confidence)
+    detector = _make_detector(request, session.polygon_id, cfg)
+    pool     = _get_pool(request)
+    profile  = _start_profile(request)
+    _check_capacity(pool)
+    _begin_stream(manager, session)
+    tracker  = TemporalOccupancyTracker(detector) if temporal else None
+
+    def _events():
+        encoder = FrameDeltaEncoder()
+        try:
+            for frame_index, result in result_generator(session.path, detector, skip_frames,
+                                                        sample_interval_ms=sample_ms,
+                                                        tracker=tracker, progress=progress):
+                with profiling.span("serialize"):
+                    delta = encoder.encode(frame_index, result)
+                    chunk = format_sse(delta, "frame") if format == "sse" else format_ndjson(delta)
+                session.record_frame()
+                yield chunk
+            if format == "sse":
+                # Lets EventSource clients close instead of reconnecting and re-running the video.
+                yield format_sse({"frames_processed": session.frames_processed}, "end")
+        finally:
+            manager.end_stream(session)
+            if profile is not None:
+                profile.finish()
+
+    return StreamingResponse(
+        _iterate_in_pool(pool, _events()),
+        media_type=_EVENT_MEDIA_TYPES[format],
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 @router.post(
     "/detect/stream",
     summary="Upload + stream MJPEG trong 1 request (POST)",
@@ -172,36 +795,272 @@ async def stream_video_post(
     car_confidence:      float      = Form(default=0.40),
     free_confidence:     float      = Form(default=0.25),
     general_confidence:  float      = Form(default=0.25),
-    skip_frames:         int        = Form(default=2),
+    skip_frames:         int        = Form(default=2, ge=0),
+    sample_ms:           Optional[float] = Form(default=None, gt=0),
+    temporal:            bool       = Form(default=False),
 ):
     cfg      = DetectionConfig(car_confidence=car_confidence,
                                free_confidence=free_confidence,
                                general_confidence=general_confidence)
-    detector = _make_detector(request, _get_polygons(), cfg)
-    tmp_path = await _save_upload_to_temp(video)
+    detector = _make_detector(request, None, cfg)
+    pool     = _get_pool(request)
+    manager  = _get_sessions(request)
+    profile  = _start_profile(request)
+    _check_capacity(pool)
+    _begin_stream(manager)
+    try:
+        tmp_path = (await _save_upload_to_temp(video)).path
+    except BaseException:
+        manager.end_stream()
+        raise
 
-    async def _cleanup():
-        try:
-            for chunk in mjpeg_generator(tmp_path, detector, skip_frames):
-                yield chunk
-        finally:
-            try:
-                os.unlink(tmp_path)
-            except Exception:
-                pass
+    def _cleanup():
+        manager.end_stream()
+        remove_file(tmp_path)
+        if profile is not None:
+            profile.finish()
 
     return StreamingResponse(
-        _cleanup(),
+        _mjpeg_body(pool, tmp_path, detector, skip_frames, sample_ms, _cleanup, temporal),
         media_type="multipart/x-mixed-replace; boundary=frame",
     )
 
 
+def _get_jobs(request: Request) -> VideoJobManager:
+    jobs = getattr(request.app.state, "job_manager", None)
+    if jobs is None:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                            detail="Job manager chưa sẵn sàng.")
+    return jobs
+
+
+def _get_job(request: Request, job_id: str) -> VideoJob:
+    job = _get_jobs(request).get(job_id)
+    if job is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,
+                            detail="Job không tồn tại hoặc đã hết hạn.")
+    return job
+
+
+def _job_response(job: VideoJob) -> dict:
+    return {
+        **job.to_dict(),
+        "status_url": f"/api/v1/parking/jobs/{job.job_id}",
+        "result_url": f"/api/v1/parking/jobs/{job.job_id}/result",
+    }
+
+
+@router.post(
+    "/jobs",
+    status_code=status.HTTP_202_ACCEPTED,
+    summary="Tạo job phân tích video offline (trả kết quả từng frame dạng JSON, không render MJPEG)",
+)
+async def create_video_job(
+    request: Request,
+    video:              Optional[UploadFile] = File(default=None),
+    session_id:         Optional[str]   = Form(default=None, description="Phân tích video của session đã upload"),
+    polygon_id:         Optional[str]   = Form(default=None),
+    car_confidence:     float           = Form(default=0.40),
+    free_confidence:    float           = Form(default=0.25),
+    general_confidence: float           = Form(default=0.25),
+    skip_frames:        int             = Form(default=2, ge=0),
+    sample_ms:          Optional[float] = Form(default=None, gt=0),
+    temporal:           bool            = Form(default=False),
+    return_frames:      bool            = Form(default=False, description="Kèm frame đã vẽ (JPEG base64), chậm hơn"),
+    include_spots:      bool            = Form(default=False, description="Kèm trạng thái từng ô trong mỗi frame"),
+):
+    if (video is None) == (session_id is None):
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                            detail="Cần đúng một trong hai: file video hoặc session_id.")
+    jobs = _get_jobs(request)
+
+    if session_id is not None:
+        manager    = _get_sessions(request)
+        session    = _get_session(request, session_id)
+        if session.upload is None or not session.upload.done or session.upload.error:
+            raise HTTPException(status_code=status.HTTP_409_CONFLICT,
+                                detail="Video của session chưa upload xong.")
+        polygon_id = polygon_id or session.polygon_id
+    cfg      = DetectionConfig(car_confidence=car_confidence,
+                               free_confidence=free_confidence,
+                               general_confidence=general_confidence)
+    detector = _make_detector(request, polygon_id, cfg)
+
+    if session_id is not None:
+        video_path = manager.retain(session)
+        on_done    = lambda: manager.release(video_path)
+    else:
+        video_path = (await _save_upload_to_temp(video)).path
+        on_done    = lambda: remove_file(video_path)
+
+    options = {
+        "polygon_id":    polygon_id,
+        "skip_frames":   skip_frames,
+        "sample_ms":     sample_ms,
+        "temporal":      temporal,
+        "return_frames": return_frames,
+        "include_spots": include_spots,
+    }
+    job = jobs.submit(video_path, detector, options, on_done=on_done)
+    return _job_response(job)
+
+
+@router.get("/jobs", summary="Danh sách job phân tích video")
+async def list_video_jobs(request: Request):
+    return [_job_response(job) for job in _get_jobs(request).list()]
+
+
+@router.get("/jobs/{job_id}", summary="Trạng thái / tiến độ job")
+async def get_video_job(job_id: str, request: Request):
+    return _job_response(_get_job(request, job_id))
+
+
+@router.get(
+    "/jobs/{job_id}/result",
+    summary="Tải kết quả job (JSON theo VideoDetectionResponse)",
+    response_class=FileResponse,
+    responses={200: {"model": VideoDetectionResponse}},
+)
+async def download_video_job(job_id: str, request: Request):
+    job = _get_job(request, job_id)
+    if job.state != "done" or not job.result_path:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT,
+                            detail=f"Job chưa có kết quả (trạng thái: {job.state}).")
+    return FileResponse(job.result_path, media_type="application/json", filename=f"{job_id}.json")
+
+
+@router.delete("/jobs/{job_id}", summary="Huỷ job và xoá kết quả")
+async def delete_video_job(job_id: str, request: Request):
+    if not _get_jobs(request).remove(job_id):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,
+                            detail="Job không tồn tại hoặc đã hết hạn.")
+    return {"job_id": job_id, "deleted": True}
+
+
+def _get_cameras(request: Request) -> CameraManager:
+    cameras = getattr(request.app.state, "camera_manager", None)
+    if cameras is None:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                            detail="Camera manager chưa sẵn sàng.")
+    return cameras
+
+
+def _get_camera(request: Request, camera_id: str) -> Camera:
+    camera = _get_cameras(request).get(camera_id)
+    if camera is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,
+                            detail="Camera không tồn tại.")
+    return camera
+
+
+@router.post("/cameras", status_code=status.HTTP_201_CREATED,
+             summary="Đăng ký nguồn camera live (RTSP/HTTP/file) để phân tích liên tục")
+async def add_camera(body: CameraCreateRequest, request: Request):
+    # The source can be any URL or local file the server can open.
+    _check_admin(request)
+    cameras = _get_cameras(request)
+    if len(cameras.list()) >= CAMERA_MAX_CAMERAS:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT,
+                            detail=f"Đã đạt tối đa {CAMERA_MAX_CAMERAS} camera.")
+    if body.camera_id is not None and cameras.get(body.camera_id) is not None:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT,
+                            detail=f"Camera {body.camera_id} đã tồn tại.")
+
+    detector  = _make_detector(request, body.polygon_id, body.config or DetectionConfig())
+    source    = int(body.source) if body.source.isdigit() else body.source
+    camera_id = body.camera_id or uuid.uuid4().hex[:8]
+    camera    = Camera(camera_id, source, detector, body.target_fps,
+                       priority=body.priority, polygon_id=body.polygon_id, loop=body.loop)
+    try:
+        cameras.add(camera)
+    except ValueError as exc:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(exc))
+    return camera.to_dict()
+
+
+@router.get("/cameras", summary="Danh sách camera và kết quả gần nhất")
+async def list_cameras(request: Request):
+    return [camera.to_dict() for camera in _get_cameras(request).list()]
+
+
+@router.get("/cameras/{camera_id}", summary="Trạng thái một camera")
+async def get_camera(camera_id: str, request: Request):
+    return _get_camera(request, camera_id).to_dict()
+
+
+@router.get("/cameras/{camera_id}/latest", response_model=CameraResult,
+            summary="Kết quả phân tích mới nhất của camera (đọc từ bộ nhớ)")
+async def get_camera_latest(camera_id: str, request: Request):
+    latest = _get_camera(request, camera_id).latest
+    if latest is None:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT,
+                            detail="Camera chưa có kết quả.")
+    return latest
+
+
+@router.delete("/cameras/{camera_id}", summary="Gỡ camera")
+async def delete_camera(camera_id: str, request: Request):
+    _check_admin(request)
+    cameras = _get_cameras(request)
+    removed = await asyncio.get_running_loop().run_in_executor(None, cameras.remove, camera_id)
+    if not removed:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,
+                            detail="Camera không tồn tại.")
+    return {"camera_id": camera_id, "deleted": True}
+
+
+def _get_models(request: Request) -> ModelRegistry:
+    _check_admin(request)
+    registry = getattr(request.app.state, "model_registry", None)
+    if registry is None:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                            detail="Model registry chưa sẵn sàng.")
+    return registry
+
+
+@router.post("/admin/models/reload",
+             summary="Load lại model từ file và hoán đổi khi đã sẵn sàng (request đang chạy dùng model cũ)")
+async def reload_models(request: Request, model_path: Optional[str] = Query(None)):
+    registry = _get_models(request)
+    entries  = await asyncio.get_running_loop().run_in_executor(None, registry.reload, model_path)
+    if not entries:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,
+                            detail="Không có model nào đang được load khớp với model_path.")
+    failed = [e.to_dict() for e in entries if e.last_error is not None]
+    if failed:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                            detail={"message": "Load lại model thất bại, vẫn dùng model cũ.", "models": failed})
+    return {"reloaded": [e.to_dict() for e in entries]}
+
+
 @router.get("/health", summary="Kiểm tra trạng thái service")
 async def health_check(request: Request):
+    scheduler = _get_scheduler(request)
+    pool      = getattr(request.app.state, "inference_pool", None)
+    sessions  = getattr(request.app.state, "session_manager", None)
+    jobs      = getattr(request.app.state, "job_manager", None)
+    hub       = getattr(request.app.state, "broadcast_hub", None)
+    cameras   = getattr(request.app.state, "camera_manager", None)
+    registry  = getattr(request.app.state, "model_registry", None)
+    model     = _current_model(request)
     return {
         "status":          "ok",
-        "model_loaded":    getattr(request.app.state, "model", None) is not None,
+        "model_loaded":    model is not None,
         "device":          getattr(request.app.state, "device", "unknown"),
+        "backend":         model.name if model is not None else None,
+        "precision":       model.precision if model is not None else None,
+        "spot_agreement":  model.agreement if model is not None else None,
+        "models":          registry.stats() if registry is not None else None,
         "polygon_file":    POLYGON_PATH,
-        "active_sessions": len(_VIDEO_SESSIONS),
+        "spot_engine":     SPOT_ENGINE,
+        "area_engines":    AREA_ENGINES,
+        "active_sessions": len(sessions) if sessions is not None else 0,
+        "sessions":        sessions.stats() if sessions is not None else None,
+        "jobs":            jobs.stats() if jobs is not None else None,
+        "broadcast":       hub.stats() if hub is not None else None,
+        "cameras":         cameras.stats() if cameras is not None else None,
+        "batching":        scheduler.stats() if scheduler is not None else None,
+        "inference_pool":  pool.stats() if pool is not None else None,
+        "detector_cache":  _DETECTORS.stats(),
+        "ingest":          ingest_stats(),
     }
\ No newline at end of file
@@ -8,8 +8,12 @@ from .parking_model import (
     PolygonConfig,
     DetectionConfig,
     DetectRequest,
+    BatchDetectRequest,
+    BatchDetectionResponse,
     FrameDetectionResult,
     VideoDetectionResponse,
+    CameraCreateRequest,
+    CameraResult,
 )
 
 __all__ = [
@@ -21,8 +25,12 @@ __all__ = [
     "PolygonConfig",
     "DetectionConfig",
     "DetectRequest",
+    "BatchDetectRequest",
+    "BatchDetectionResponse",
     "FrameDetectionResult",
     "VideoDetectionResponse",
+    "CameraCreateRequest",
+    "CameraResult",
 ]
 
 
@@ -34,6 +34,7 @@ class ParkingSpot(BaseModel):
     polygon: List[List[float]] = Field(..., description="Polygon points")
     detection_type: Optional[str] = Field(None, description="'car' hoặc 'free'")
     detected_object: Optional[DetectedObject] = Field(None, description="Object info (nếu có)")
+    last_changed_frame: Optional[int] = Field(None, description="Frame gần nhất spot đổi trạng thái (chế độ temporal)")
     
     @validator('status')
     def validate_status(cls, v):
@@ -55,6 +56,13 @@ class DetectionResponse(BaseModel):
     spots: List[ParkingSpot] = Field(..., description="Tất cả parking spots")
     summary: DetectionSummary = Field(..., description="Summary statistics")
     detections: Optional[Dict] = Field(None, description="Raw data (optional)")
+    ingest: Optional[Dict] = Field(None, description="Thông tin decode/crop ảnh đầu vào (optional)")
+    profile: Optional[Dict] = Field(None, description="Cây thời gian từng bước khi gọi với profile=true (optional)")
+
+    @validator('detections', pre=True)
+    def serialize_detections(cls, v):
+        # Domain trả về Detections dạng mảng; chỉ chuyển sang dict khi trả ra API.
+        return v.to_dict() if hasattr(v, 'to_dict') else v
 
 class PolygonConfig(BaseModel):
     id: int
@@ -67,6 +75,7 @@ class DetectionConfig(BaseModel):
     general_confidence: float = 0.25
     device: str = "cpu"
     image_size: int = 640
+    tiled: Optional[bool] = Field(default=None, description="Chia ảnh thành tile quanh các ô đỗ (mặc định theo TILING_ENABLED)")
 
 
 class DetectRequest(BaseModel):
@@ -74,16 +83,18 @@ class DetectRequest(BaseModel):
     polygon_id: Optional[str] = Field(default=None, description="Tên file polygon (không kèm .json)")
     config: Optional[DetectionConfig] = Field(default=None, description="Cấu hình confidence (tuỳ chọn)")
 
-    def to_numpy(self) -> np.ndarray:
+    def image_bytes(self) -> bytes:
         b64 = self.image.split(",", 1)[-1] if "," in self.image else self.image
         try:
-            image_bytes = base64.b64decode(b64)
+            return base64.b64decode(b64)
         except Exception as exc:
             raise HTTPException(
                 status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
                 detail=f"Không thể giải mã base64: {exc}",
             )
-        nparr = np.frombuffer(image_bytes, np.uint8)
+
+    def to_numpy(self) -> np.ndarray:
+        nparr = np.frombuffer(self.image_bytes(), np.uint8)
         img = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
         if img is None:
             raise HTTPException(
@@ -93,6 +104,14 @@ class DetectRequest(BaseModel):
         return img
 
 
+class BatchDetectRequest(BaseModel):
+    items: List[DetectRequest] = Field(..., min_length=1, description="Danh sách ảnh, mỗi ảnh kèm polygon_id/config riêng")
+
+
+class BatchDetectionResponse(BaseModel):
+    results: List[DetectionResponse] = Field(..., description="Kết quả theo đúng thứ tự items gửi lên")
+
+
 class FrameDetectionResult(BaseModel):
     frame_number: int = Field(..., description="Số thứ tự frame (0-indexed)")
     summary: DetectionSummary = Field(..., description="Thống kê parking spots trong frame này")
@@ -107,4 +126,22 @@ class VideoDetectionResponse(BaseModel):
     total_frames_processed: int = Field(..., description="Số frame đã được detect")
     total_frames_read: int = Field(..., description="Tổng số frame đã đọc (gồm cả frame bỏ qua)")
     frames: List[FrameDetectionResult] = Field(..., description="Kết quả từng frame")
-    overall_summary: DetectionSummary = Field(..., description="Thống kê trung bình toàn video")
\ No newline at end of file
+    overall_summary: DetectionSummary = Field(..., description="Thống kê trung bình toàn video")
+
+
+class CameraCreateRequest(BaseModel):
+    camera_id: Optional[str] = Field(default=None, description="ID camera (tự sinh nếu bỏ trống)")
+    source: str = Field(..., description="RTSP/HTTP URL, đường dẫn file (giả lập camera) hoặc chỉ số webcam")
+    polygon_id: Optional[str] = Field(default=None, description="Tên file polygon (không kèm .json)")
+    config: Optional[DetectionConfig] = Field(default=None, description="Cấu hình confidence (tuỳ chọn)")
+    target_fps: float = Field(default=1.0, gt=0, le=30, description="Số lần phân tích mỗi giây")
+    priority: int = Field(default=0, description="Ưu tiên khi scheduler chạy chế độ priority (cao hơn trước)")
+    loop: bool = Field(default=False, description="Phát lặp lại khi nguồn là file")
+
+
+class CameraResult(DetectionResponse):
+    camera_id: str = Field(..., description="ID camera")
+    frame_number: int = Field(..., description="Frame của nguồn đã phân tích")
+    captured_at: float = Field(..., description="Thời điểm lấy frame (epoch giây)")
+    analyzed_at: float = Field(..., description="Thời điểm có kết quả (epoch giây)")
+    latency_ms: float = Field(..., description="Thời gian inference (ms)")
@@ -0,0 +1,37 @@
+import asyncio
+import threading
+from typing import List, Tuple
+
+
+def _resolve(future: asyncio.Future) -> None:
+    if not future.done():
+        future.set_result(None)
+
+
+class ThreadWaiters:
+    # Coroutines waiting for data produced on a worker thread. A waiting
+    # coroutine holds an asyncio future, not a thread; wake() is called from the
+    # producer thread and resolves every pending future on its own loop.
+
+    def __init__(self):
+        self._waiters: List[Tuple[asyncio.AbstractEventLoop, asyncio.Future]] = []
+        self._lock = threading.Lock()
+
+    def add(self) -> asyncio.Future:
+        # Call from the event loop, under the lock that guards the data, after
+        # checking there is nothing to take yet.
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        with self._lock:
+            self._waiters.append((loop, future))
+        return future
+
+    def wake(self) -> None:
+        with self._lock:
+            waiters, self._waiters = self._waiters, []
+        for loop, future in waiters:
+            try:
+                loop.call_soon_threadsafe(_resolve, future)
+            except RuntimeError:
+                # Loop already closed: nobody is waiting any more.
+                pass
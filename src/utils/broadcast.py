@@ -0,0 +1,311 @@
+import asyncio
+import logging
+import threading
+from collections import deque
+from typing import Callable, Dict, Hashable, List, Optional
+
+from . import metrics
+from .async_utils import ThreadWaiters
+from .configs import STREAM_RING_SIZE
+
+logger = logging.getLogger(__name__)
+
+_PENDING = object()
+
+
+class PooledChunkSource:
+    # Pulls chunks from a generator on the inference pool, one next() at a time.
+    # close() may be called from another thread while a next() is running.
+    # next_chunk_async() awaits the pool future, so no extra thread waits on it.
+
+    def __init__(self, pool, iterator):
+        self.pool = pool
+        self.iterator = iterator
+        self._next = metrics.bind_context(next)
+        self._lock = threading.Lock()
+        self._closed = False
+        self._running = False
+
+    def _begin(self) -> bool:
+        with self._lock:
+            if self._closed:
+                return False
+            self._running = True
+            return True
+
+    def _finish(self) -> bool:
+        with self._lock:
+            self._running = False
+            closed = self._closed
+        if closed:
+            self.iterator.close()
+        return closed
+
+    def next_chunk(self) -> Optional[bytes]:
+        if not self._begin():
+            return None
+        try:
+            chunk = self.pool.submit(self._next, self.iterator, None, force=True).result()
+        finally:
+            closed = self._finish()
+        return None if closed else chunk
+
+    async def next_chunk_async(self) -> Optional[bytes]:
+        if not self._begin():
+            return None
+        try:
+            future = self.pool.submit(self._next, self.iterator, None, force=True)
+        except BaseException:
+            self._finish()
+            raise
+        # Finished when next() returns, not when the reader stops waiting: a
+        # cancelled reader must not let close() run inside the generator.
+        future.add_done_callback(lambda _: self._finish())
+        chunk = await asyncio.wrap_future(future)
+        with self._lock:
+            closed = self._closed
+        return None if closed else chunk
+
+    def close(self) -> None:
+        with self._lock:
+            self._closed = True
+            running = self._running
+        if not running:
+            self.iterator.close()
+
+
+class Subscriber:
+    __slots__ = ("broadcaster", "last_seq", "skipped", "closed")
+
+    def __init__(self, broadcaster: "FrameBroadcaster", last_seq: int):
+        self.broadcaster = broadcaster
+        self.last_seq = last_seq
+        self.skipped = 0
+        self.closed = False
+
+    def next_chunk(self) -> Optional[bytes]:
+        return self.broadcaster._next_for(self)
+
+    async def next_chunk_async(self) -> Optional[bytes]:
+        # Same as next_chunk() without holding a thread while waiting.
+        return await self.broadcaster._next_for_async(self)
+
+    def close(self) -> None:
+        # Never blocks: stopping the source is left to a background thread.
+        if not self.closed:
+            self.closed = True
+            self.broadcaster._unsubscribe(self)
+
+
+class FrameBroadcaster:
+    # One producer thread publishes encoded frames into a ring buffer; each
+    # subscriber reads at its own pace. A subscriber that falls out of the ring
+    # jumps to the newest frame. The source is opened on the producer thread and
+    # closed when the last subscriber leaves or the source ends. Async readers
+    # wait on futures woken by the producer, so an idle viewer holds no thread.
+
+    def __init__(
+        self,
+        open_source: Callable[[], object],
+        ring_size: int = STREAM_RING_SIZE,
+        on_frame: Optional[Callable[[], None]] = None,
+        on_stop: Optional[Callable[[], None]] = None,
+        name: str = "broadcast",
+    ):
+        if ring_size < 1:
+            raise ValueError(f"ring_size must be >= 1, got {ring_size}")
+        self.name = name
+        self._open_source = open_source
+        self._on_frame = on_frame
+        # None once the producer has stopped and the callbacks have run.
+        self._on_stop: Optional[List[Callable[[], None]]] = [on_stop] if on_stop is not None else []
+        self._ring: deque = deque(maxlen=ring_size)
+        self._seq = 0
+        self._cond = threading.Condition()
+        self._waiters = ThreadWaiters()
+        self._source = None
+        self._subscribers = 0
+        self._finished = False
+        self._stopping = False
+        self.published = 0
+        self.skipped = 0
+        self._thread = threading.Thread(target=metrics.bind_context(self._produce),
+                                        name=f"{name}-producer", daemon=True)
+        self._thread.start()
+
+    @property
+    def finished(self) -> bool:
+        return self._finished or self._stopping
+
+    @property
+    def subscribers(self) -> int:
+        return self._subscribers
+
+    def _produce(self) -> None:
+        source = None
+        try:
+            source = self._open_source()
+            with self._cond:
+                self._source = source
+                stopping = self._stopping
+            while not stopping:
+                chunk = source.next_chunk()
+                if chunk is None:
+                    break
+                with self._cond:
+                    self._seq += 1
+                    self._ring.append((self._seq, chunk))
+                    self.published += 1
+                    self._notify()
+                    stopping = self._stopping
+                if self._on_frame is not None:
+                    self._on_frame()
+        except Exception as exc:
+            logger.warning(f"[{self.name}] Lỗi nguồn stream: {exc}")
+        finally:
+            with self._cond:
+                self._finished = True
+                self._notify()
+            if source is not None:
+                source.close()
+            with self._cond:
+                callbacks, self._on_stop = self._on_stop, None
+            for callback in callbacks:
+                callback()
+
+    def add_stop_callback(self, callback: Callable[[], None]) -> None:
+        # Runs once the producer has stopped, right away if it already has.
+        with self._cond:
+            if self._on_stop is not None:
+                self._on_stop.append(callback)
+                return
+        callback()
+
+    def _notify(self) -> None:
+        # Call with self._cond held.
+        self._cond.notify_all()
+        self._waiters.wake()
+
+    def subscribe(self) -> Optional[Subscriber]:
+        with self._cond:
+            if self.finished:
+                return None
+            self._subscribers += 1
+            # Start from the newest buffered frame, not the beginning of the ring.
+            return Subscriber(self, max(0, self._seq - 1))
+
+    def _unsubscribe(self, subscriber: Subscriber) -> None:
+        with self._cond:
+            self._subscribers -= 1
+            self.skipped += subscriber.skipped
+            self._notify()
+            if self._subscribers > 0 or self._finished:
+                return
+            self._stopping = True
+            source = self._source
+        if source is not None:
+            # Closing joins the source's threads; the leaving viewer (often on
+            # the event loop) must not wait for that.
+            threading.Thread(target=source.close, name=f"{self.name}-close", daemon=True).start()
+
+    def _poll(self, subscriber: Subscriber):
+        # Call with self._cond held. Next chunk, None at the end, or _PENDING.
+        if subscriber.closed:
+            return None
+        if self._ring and self._ring[-1][0] > subscriber.last_seq:
+            oldest = self._ring[0][0]
+            if subscriber.last_seq + 1 < oldest:
+                seq, chunk = self._ring[-1]
+                subscriber.skipped += seq - subscriber.last_seq - 1
+            else:
+                seq, chunk = self._ring[subscriber.last_seq + 1 - oldest]
+            subscriber.last_seq = seq
+            return chunk
+        if self._finished:
+            return None
+        return _PENDING
+
+    def _next_for(self, subscriber: Subscriber) -> Optional[bytes]:
+        with self._cond:
+            while True:
+                chunk = self._poll(subscriber)
+                if chunk is not _PENDING:
+                    return chunk
+                self._cond.wait(1.0)
+
+    async def _next_for_async(self, subscriber: Subscriber) -> Optional[bytes]:
+        while True:
+            with self._cond:
+                chunk = self._poll(subscriber)
+                if chunk is not _PENDING:
+                    return chunk
+                waiter = self._waiters.add()
+            await waiter
+
+    def stop(self) -> None:
+        with self._cond:
+            self._stopping = True
+            source = self._source
+            self._notify()
+        if source is not None:
+            source.close()
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {
+                "subscribers": self._subscribers,
+                "published": self.published,
+                "skipped": self.skipped,
+                "finished": self._finished,
+            }
+
+
+class BroadcastHub:
+    # One FrameBroadcaster per key (e.g. session + thresholds); viewers of the
+    # same key share its analysis.
+
+    def __init__(self, ring_size: int = STREAM_RING_SIZE):
+        self.ring_size = ring_size
+        self._broadcasters: Dict[Hashable, FrameBroadcaster] = {}
+        self._lock = threading.Lock()
+
+    def subscribe(self, key: Hashable, factory: Callable[[], FrameBroadcaster]) -> Subscriber:
+        with self._lock:
+            self._prune()
+            broadcaster = self._broadcasters.get(key)
+            subscriber = broadcaster.subscribe() if broadcaster is not None else None
+            if subscriber is not None:
+                return subscriber
+            broadcaster = factory()
+            self._broadcasters[key] = broadcaster
+            subscriber = broadcaster.subscribe()
+        # Drop the entry when its producer stops, not on the next stats() call.
+        broadcaster.add_stop_callback(lambda: self._discard(key, broadcaster))
+        return subscriber
+
+    def _prune(self) -> None:
+        for key, broadcaster in list(self._broadcasters.items()):
+            if broadcaster.finished:
+                del self._broadcasters[key]
+
+    def _discard(self, key: Hashable, broadcaster: FrameBroadcaster) -> None:
+        with self._lock:
+            if self._broadcasters.get(key) is broadcaster:
+                del self._broadcasters[key]
+
+    def stats(self) -> dict:
+        with self._lock:
+            self._prune()
+            broadcasters = list(self._broadcasters.values())
+        return {
+            "broadcasters": len(broadcasters),
+            "subscribers": sum(b.subscribers for b in broadcasters),
+            "published": sum(b.published for b in broadcasters),
+        }
+
+    def stop(self) -> None:
+        with self._lock:
+            broadcasters = list(self._broadcasters.values())
+            self._broadcasters.clear()
+        for broadcaster in broadcasters:
+            broadcaster.stop()
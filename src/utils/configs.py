@@ -17,4 +17,94 @@ IOU_THRESHOLD = 0.7
 
 DEVICE = "cuda" if torch.cuda.is_available() else "cpu"
 
-IMAGE_SIZE = 640
\ No newline at end of file
+IMAGE_SIZE = 640
+
+INFERENCE_BACKEND = "torch"          # "torch" | "onnx" | "openvino" (exported next to MODEL_PATH on first load)
+ORT_INTRA_OP_THREADS = 0             # 0 = onnxruntime default (one per physical core)
+ORT_INTER_OP_THREADS = 1
+OPENVINO_THREADS = 0
+
+MODEL_PRECISION = "fp32"             # "fp32" | "fp16" | "int8_dynamic" | "int8_static"
+QUANT_CALIBRATION_DIR = "data/calibration"   # sample frames/videos for calibration and the accuracy gate
+QUANT_CALIBRATION_FRAMES = 64
+QUANT_MIN_AGREEMENT = 0.98           # per-spot status agreement with fp32 required to use a variant
+
+MODEL_CACHE_MAX_MODELS = 4           # loaded models kept in memory (least recently used evicted first)
+MODEL_CACHE_MAX_BYTES = 4 * 1024 ** 3
+MODEL_WATCH_INTERVAL = 5.0           # seconds between model file checks for hot reload; 0 disables
+MODEL_WARMUP_RUNS = 2                # dummy inferences at IMAGE_SIZE before a model serves requests
+ADMIN_TOKEN = None                   # if set, admin endpoints require the X-Admin-Token header
+
+BATCH_ENABLED = True
+BATCH_MAX_SIZE = 8
+BATCH_MAX_WAIT_MS = 10.0
+BATCH_MAX_ITEMS_PER_REQUEST = 32
+
+INFERENCE_POOL_MODE = "thread"
+INFERENCE_WORKERS = 2
+INFERENCE_MAX_QUEUE = 16
+
+DETECTOR_CACHE_SIZE = 32
+POLYGON_STAT_INTERVAL = 1.0
+
+INGEST_REDUCED_DECODE = True
+INGEST_CROP_TO_POLYGONS = True
+INGEST_ROI_MARGIN = 0.05
+INGEST_BASELINE_EVERY = 100
+
+VIDEO_SEEK_MIN_FRAMES = 60
+
+STREAM_PIPELINE_ENABLED = True
+STREAM_QUEUE_DEPTH = 4
+STREAM_DROP_POLICY = "drop_oldest"   # "drop_oldest" | "block"
+STREAM_RING_SIZE = 8                 # encoded frames kept for viewers of a shared stream
+
+TEMPORAL_HYSTERESIS_FRAMES = 2      # inferences a new status must persist before it is reported
+TEMPORAL_DIFF_THRESHOLD = 12.0      # mean abs gray difference (0-255) that marks a spot as changed
+TEMPORAL_MIN_CHANGED_SPOTS = 1
+TEMPORAL_MAX_STALE_FRAMES = 125     # source frames between forced inferences
+TEMPORAL_DIFF_WIDTH = 320
+
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+UPLOAD_MAX_BYTES = 2 * 1024 ** 3
+UPLOAD_HASH_ALGO = "sha256"          # None to skip hashing
+UPLOAD_STREAM_MIN_BYTES = 2 * 1024 * 1024   # bytes on disk before a stream may start on a partial upload
+UPLOAD_REOPEN_MIN_BYTES = 1024 * 1024       # new bytes needed before re-opening a growing file
+UPLOAD_STALL_TIMEOUT = 30.0
+UPLOAD_QUOTA_STEP = 4 * 1024 * 1024         # disk quota is re-checked each time an upload grows by this much
+
+SESSION_IDLE_TTL = 600.0
+SESSION_REAP_INTERVAL = 30.0
+SESSION_DISK_QUOTA = 20 * 1024 ** 3
+SESSION_MAX_STREAMS = 8
+
+JOBS_MAX_CONCURRENT = 1
+JOBS_BATCH_SIZE = 8
+JOBS_RESULT_TTL = 24 * 3600.0
+JOBS_MAX_RETAINED = 200
+
+CAMERA_SCHEDULER_POLICY = "round_robin"   # "round_robin" | "priority"
+CAMERA_MAX_IN_FLIGHT = INFERENCE_WORKERS
+CAMERA_MAX_CAMERAS = 64
+CAMERA_RECONNECT_DELAY = 2.0
+
+METRICS_ENABLED = True               # per-stage histograms on /metrics; False makes instrumentation a no-op
+METRICS_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+PROFILE_ENABLED = False              # allow ?profile=true / X-Profile: true (per-request timing tree)
+PROFILE_DIR = "data/profiles"        # timing trees (.json) and profiler captures are written here
+PROFILE_CAPTURE = None               # None | "cprofile" | "pyinstrument" (falls back to cprofile if missing)
+PROFILE_CAPTURE_RATE = 1.0           # fraction of profiled /detect requests that also get a capture
+
+TILING_ENABLED = False               # default for detectors; /detect can override with config.tiled
+TILE_SIZE = None                     # tile side in frame pixels; None = image_size (tiles inferred at native resolution)
+TILE_OVERLAP = 0.2                   # minimum overlap between neighbouring tiles (fraction of the tile side)
+TILE_POLYGON_MARGIN = 32             # pixels around the spot polygons that tiles must also cover
+TILE_NMS_THRESHOLD = 0.5             # intersection over the smaller box above which boxes from two tiles are merged
+TILE_MAX_BATCH = 32                  # tiles per model call
+
+SPOT_ENGINE = "detector"             # "detector" (YOLO boxes, center in polygon) | "classifier" (one crop per spot)
+AREA_ENGINES = {}                    # per polygon file (name without .json), e.g. {"area_3": "classifier"}
+CLASSIFIER_PATH = "models/spot_classifier.pt"   # ultralytics classify .pt or .onnx; classes car/occupied and free/empty
+CLASSIFIER_CROP_SIZE = 64            # crop side when the model does not fix its input size
+CLASSIFIER_MAX_BATCH = 256           # crops per model call
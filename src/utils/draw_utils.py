@@ -1,17 +1,27 @@
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
 import cv2
 import numpy as np
 
+from . import metrics
+
 SPOT_COLORS: dict = {
     "occupied": (40,  40, 220),   
     "free":     (50, 205,  70),   
     "unknown":  (20, 190, 230),   
 }
+_DEFAULT_COLOR = (120, 120, 120)
+_BADGE_FILL    = (12, 12, 20)
+_BADGE_TEXT    = (240, 240, 240)
+_HUD_FILL      = (10, 12, 22)
 
 def draw_spot_fills(frame: np.ndarray, spots: list, alpha: float = 0.22) -> None:
     overlay = frame.copy()
     for spot in spots:
         polygon = np.array(spot["polygon"], np.int32)
-        color   = SPOT_COLORS.get(spot["status"], (120, 120, 120))
+        color   = SPOT_COLORS.get(spot["status"], _DEFAULT_COLOR)
         cv2.fillPoly(overlay, [polygon], color)
     cv2.addWeighted(overlay, alpha, frame, 1.0 - alpha, 0, frame)
 
@@ -19,41 +29,52 @@ def draw_spot_borders_and_badges(frame: np.ndarray, spots: list) -> None:
     h, w = frame.shape[:2]
     s_factor = w / 1280.0
     
-    font = cv2.FONT_HERSHEY_DUPLEX
-    scale = max(0.25, 0.38 * s_factor)
-    thick = max(1, int(1 * s_factor))
-    pad = max(2, int(4 * s_factor))
-    line_thick = max(1, int(2 * s_factor))
+    font, scale, thick, pad, line_thick = _badge_style(s_factor)
 
     for spot in spots:
         polygon = np.array(spot["polygon"], np.int32)
-        color   = SPOT_COLORS.get(spot["status"], (120, 120, 120))
+        color   = SPOT_COLORS.get(spot["status"], _DEFAULT_COLOR)
 
         cv2.polylines(frame, [polygon], True, color, line_thick, cv2.LINE_AA)
 
-        cx = int(np.mean(polygon[:, 0]))
-        cy = int(np.mean(polygon[:, 1]))
-
         label = f"#{spot['id']}"
-        (tw, th), _ = cv2.getTextSize(label, font, scale, thick)
-
-        bx1, by1 = cx - tw // 2 - pad, cy - th - pad
-        bx2, by2 = cx + tw // 2 + pad, cy + pad
+        (bx1, by1, bx2, by2), origin = _badge_geometry(polygon, label, font, scale, thick, pad)
 
-        cv2.rectangle(frame, (bx1, by1), (bx2, by2), (12, 12, 20), -1)
+        cv2.rectangle(frame, (bx1, by1), (bx2, by2), _BADGE_FILL, -1)
         cv2.rectangle(frame, (bx1, by1), (bx2, by2), color, 1, cv2.LINE_AA)
 
-        cv2.putText(frame, label, (cx - tw // 2, cy - 2),
-                    font, scale, (240, 240, 240), thick, cv2.LINE_AA)
+        cv2.putText(frame, label, origin, font, scale, _BADGE_TEXT, thick, cv2.LINE_AA)
+
+def _badge_style(s_factor: float) -> Tuple[int, float, int, int, int]:
+    font = cv2.FONT_HERSHEY_DUPLEX
+    scale = max(0.25, 0.38 * s_factor)
+    thick = max(1, int(1 * s_factor))
+    pad = max(2, int(4 * s_factor))
+    line_thick = max(1, int(2 * s_factor))
+    return font, scale, thick, pad, line_thick
+
+def _badge_geometry(polygon: np.ndarray, label: str, font: int, scale: float, thick: int, pad: int):
+    cx = int(np.mean(polygon[:, 0]))
+    cy = int(np.mean(polygon[:, 1]))
+    (tw, th), _ = cv2.getTextSize(label, font, scale, thick)
+    box = (cx - tw // 2 - pad, cy - th - pad, cx + tw // 2 + pad, cy + pad)
+    return box, (cx - tw // 2, cy - 2)
 
 def draw_hud_bar(frame: np.ndarray, summary: dict) -> None:
     h, w = frame.shape[:2]
     s_factor = w / 1280.0
-    hud_h = int(46 * s_factor) if w > 640 else 32
+    hud_h = _hud_height(w)
     
     hud = frame.copy()
-    cv2.rectangle(hud, (0, 0), (w, hud_h), (10, 12, 22), -1)
+    cv2.rectangle(hud, (0, 0), (w, hud_h), _HUD_FILL, -1)
     cv2.addWeighted(hud, 0.82, frame, 0.18, 0, frame)
+    _draw_hud_items(frame, summary, s_factor, hud_h)
+
+def _hud_height(w: int) -> int:
+    return int(46 * (w / 1280.0)) if w > 640 else 32
+
+def _draw_hud_items(frame: np.ndarray, summary: dict, s_factor: float, hud_h: int) -> None:
+    w = frame.shape[1]
     cv2.line(frame, (0, hud_h), (w, hud_h), (50, 90, 140), 1)
 
     total    = summary.get("total_spots", 0)
@@ -90,8 +111,151 @@ def draw_hud_bar(frame: np.ndarray, summary: dict) -> None:
         if x < w - 20:
             cv2.line(frame, (x - 10, int(hud_h*0.3)), (x - 10, int(hud_h*0.7)), (40, 60, 90), 1)
 
-def annotate_frame(frame: np.ndarray, spots: list, summary: dict) -> np.ndarray:
-    draw_spot_fills(frame, spots)
-    draw_spot_borders_and_badges(frame, spots)
-    draw_hud_bar(frame, summary)
-    return frame
\ No newline at end of file
+class _SpotLayout:
+    # Everything about a polygon set at one frame size that does not change
+    # between frames: integer polygons, the fill ROI (union of polygon bounding
+    # boxes) with its overlay buffer, and pre-rendered label badges.
+    __slots__ = (
+        "shape", "ids", "polygons", "points", "roi", "roi_points", "overlay",
+        "line_thick", "badges", "badge_rects",
+    )
+
+    def __init__(self, shape: Tuple[int, int], spots: list):
+        h, w = shape
+        self.shape = shape
+        self.ids = [spot["id"] for spot in spots]
+        self.polygons = [spot["polygon"] for spot in spots]
+        self.points = [np.array(polygon, np.int32) for polygon in self.polygons]
+
+        stacked = np.concatenate(self.points)
+        x0 = int(np.clip(stacked[:, 0].min(), 0, w))
+        y0 = int(np.clip(stacked[:, 1].min(), 0, h))
+        x1 = int(np.clip(stacked[:, 0].max() + 1, x0, w))
+        y1 = int(np.clip(stacked[:, 1].max() + 1, y0, h))
+        self.roi = (x0, y0, x1, y1)
+        offset = np.array([x0, y0], np.int32)
+        self.roi_points = [points - offset for points in self.points]
+        self.overlay = np.empty((y1 - y0, x1 - x0, 3), np.uint8)
+
+        font, scale, thick, pad, self.line_thick = _badge_style(w / 1280.0)
+        self.badges: List[Tuple[int, int, int, int, np.ndarray]] = []
+        self.badge_rects: List[np.ndarray] = []
+        for spot, points in zip(spots, self.points):
+            label = f"#{spot['id']}"
+            (bx1, by1, bx2, by2), (ox, oy) = _badge_geometry(points, label, font, scale, thick, pad)
+            sprite = np.empty((by2 - by1 + 1, bx2 - bx1 + 1, 3), np.uint8)
+            sprite[:] = _BADGE_FILL
+            cv2.putText(sprite, label, (ox - bx1, oy - by1), font, scale, _BADGE_TEXT, thick, cv2.LINE_AA)
+            cx1, cy1 = max(bx1, 0), max(by1, 0)
+            cx2, cy2 = min(bx2 + 1, w), min(by2 + 1, h)
+            if cx1 < cx2 and cy1 < cy2:
+                sprite = sprite[cy1 - by1:cy2 - by1, cx1 - bx1:cx2 - bx1]
+                self.badges.append((cx1, cy1, cx2, cy2, np.ascontiguousarray(sprite)))
+            self.badge_rects.append(np.array([[bx1, by1], [bx2, by1], [bx2, by2], [bx1, by2]], np.int32))
+
+    def matches(self, shape: Tuple[int, int], spots: list) -> bool:
+        if shape != self.shape or len(spots) != len(self.polygons):
+            return False
+        # Spots built by ParkingDetector share the cached polygon lists, so the
+        # identity check is the common case; equality covers deserialized spots.
+        for spot, spot_id, polygon in zip(spots, self.ids, self.polygons):
+            if spot["id"] != spot_id:
+                return False
+            if spot["polygon"] is not polygon and spot["polygon"] != polygon:
+                return False
+        return True
+
+
+class _HudLayout:
+    __slots__ = ("hud_h", "s_factor", "fill")
+
+    def __init__(self, w: int):
+        self.hud_h = _hud_height(w)
+        self.s_factor = w / 1280.0
+        self.fill = np.empty((self.hud_h + 1, w, 3), np.uint8)
+        self.fill[:] = _HUD_FILL
+
+
+class AnnotationRenderer:
+    # Same picture as draw_spot_fills + draw_spot_borders_and_badges +
+    # draw_hud_bar, but static geometry is cached per polygon set/frame size,
+    # blending only touches the polygon ROI and the HUD strip, and the label
+    # badges are blitted from pre-rendered sprites. Holds reusable buffers, so
+    # an instance must not be shared between threads.
+
+    def __init__(self, alpha: float = 0.22, max_layouts: int = 4):
+        self.alpha = alpha
+        self.max_layouts = max_layouts
+        self._layouts: "OrderedDict[int, _SpotLayout]" = OrderedDict()
+        self._huds: Dict[int, _HudLayout] = {}
+        self._next_key = 0
+
+    def _layout(self, shape: Tuple[int, int], spots: list) -> _SpotLayout:
+        for key, layout in self._layouts.items():
+            if layout.matches(shape, spots):
+                self._layouts.move_to_end(key)
+                return layout
+        layout = _SpotLayout(shape, spots)
+        self._layouts[self._next_key] = layout
+        self._next_key += 1
+        while len(self._layouts) > self.max_layouts:
+            self._layouts.popitem(last=False)
+        return layout
+
+    def render(self, frame: np.ndarray, spots: list, summary: dict) -> np.ndarray:
+        if spots:
+            layout = self._layout(frame.shape[:2], spots)
+            groups: Dict[str, List[int]] = {}
+            for i, spot in enumerate(spots):
+                groups.setdefault(spot["status"], []).append(i)
+            self._draw_fills(frame, layout, groups)
+            self._draw_borders_and_badges(frame, layout, groups)
+        self._draw_hud(frame, summary)
+        return frame
+
+    def _draw_fills(self, frame: np.ndarray, layout: _SpotLayout, groups: Dict[str, List[int]]) -> None:
+        x0, y0, x1, y1 = layout.roi
+        if x0 >= x1 or y0 >= y1:
+            return
+        roi = frame[y0:y1, x0:x1]
+        overlay = layout.overlay
+        np.copyto(overlay, roi)
+        for status, indices in groups.items():
+            color = SPOT_COLORS.get(status, _DEFAULT_COLOR)
+            cv2.fillPoly(overlay, [layout.roi_points[i] for i in indices], color)
+        cv2.addWeighted(overlay, self.alpha, roi, 1.0 - self.alpha, 0, roi)
+
+    @staticmethod
+    def _draw_borders_and_badges(frame: np.ndarray, layout: _SpotLayout, groups: Dict[str, List[int]]) -> None:
+        for status, indices in groups.items():
+            color = SPOT_COLORS.get(status, _DEFAULT_COLOR)
+            cv2.polylines(frame, [layout.points[i] for i in indices], True, color,
+                          layout.line_thick, cv2.LINE_AA)
+        for x1, y1, x2, y2, sprite in layout.badges:
+            frame[y1:y2, x1:x2] = sprite
+        for status, indices in groups.items():
+            color = SPOT_COLORS.get(status, _DEFAULT_COLOR)
+            cv2.polylines(frame, [layout.badge_rects[i] for i in indices], True, color, 1, cv2.LINE_AA)
+
+    def _draw_hud(self, frame: np.ndarray, summary: dict) -> None:
+        w = frame.shape[1]
+        hud = self._huds.get(w)
+        if hud is None:
+            hud = self._huds[w] = _HudLayout(w)
+        strip = frame[:hud.hud_h + 1]
+        cv2.addWeighted(hud.fill[:strip.shape[0]], 0.82, strip, 0.18, 0, strip)
+        _draw_hud_items(frame, summary, hud.s_factor, hud.hud_h)
+
+
+_local = threading.local()
+
+def annotate_frame(frame: np.ndarray, spots: list, summary: dict,
+                   renderer: Optional[AnnotationRenderer] = None) -> np.ndarray:
+    if renderer is None:
+        # One renderer per thread: stream pipelines and jobs each annotate on
+        # their own threads and keep their cached layouts there.
+        renderer = getattr(_local, "renderer", None)
+        if renderer is None:
+            renderer = _local.renderer = AnnotationRenderer()
+    with metrics.timed("annotate"):
+        return renderer.render(frame, spots, summary)
\ No newline at end of file
@@ -0,0 +1,32 @@
+import json
+from typing import Dict, Optional
+
+
+def format_sse(data: dict, event: Optional[str] = None) -> bytes:
+    lines = f"event: {event}\n" if event else ""
+    return (lines + f"data: {json.dumps(data, separators=(',', ':'))}\n\n").encode("utf-8")
+
+
+def format_ndjson(data: dict) -> bytes:
+    return (json.dumps(data, separators=(",", ":")) + "\n").encode("utf-8")
+
+
+class FrameDeltaEncoder:
+    # Turns full per-frame results into FrameDetectionResult-shaped deltas: the
+    # first frame carries every spot, later frames only the spots whose status
+    # changed since the previous frame (the summary is always included).
+
+    def __init__(self):
+        self._statuses: Dict[object, str] = {}
+
+    def encode(self, frame_number: int, result: dict) -> dict:
+        changed = []
+        for spot in result.get("spots", []):
+            if self._statuses.get(spot["id"]) != spot["status"]:
+                self._statuses[spot["id"]] = spot["status"]
+                changed.append(dict(spot))
+        return {
+            "frame_number": frame_number,
+            "summary": result.get("summary", {}),
+            "spots": changed,
+        }
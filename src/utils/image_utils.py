@@ -1,5 +1,6 @@
 import base64
-from typing import Optional
+import struct
+from typing import Optional, Tuple
 
 import cv2
 import numpy as np
@@ -16,6 +17,74 @@ def resize_image(image: np.ndarray, width: int, height: int,
     return cv2.resize(image, (width, height), interpolation=interpolation)
 
 
+def decode_image_bytes(buf, flags: int = cv2.IMREAD_COLOR) -> np.ndarray:
+    # np.frombuffer chỉ tạo view trên buffer (bytes/bytearray/memoryview), không copy.
+    nparr = np.frombuffer(buf, np.uint8)
+    if nparr.size == 0:
+        raise ValueError("Ảnh rỗng.")
+    img = cv2.imdecode(nparr, flags)
+    if img is None:
+        raise ValueError("Không đọc được ảnh. Hãy đảm bảo đây là JPEG/PNG hợp lệ.")
+    return img
+
+
+_PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+# SOF0..SOF15 trừ DHT (C4), JPG (C8), DAC (CC).
+_JPEG_SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+
+_REDUCED_FLAGS = (
+    (8, cv2.IMREAD_REDUCED_COLOR_8),
+    (4, cv2.IMREAD_REDUCED_COLOR_4),
+    (2, cv2.IMREAD_REDUCED_COLOR_2),
+)
+
+
+def is_jpeg(buf) -> bool:
+    return bytes(memoryview(buf)[:2]) == b"\xff\xd8"
+
+
+def read_image_size(buf) -> Optional[Tuple[int, int]]:
+    # Đọc (width, height) từ header JPEG/PNG mà không decode ảnh.
+    mv = memoryview(buf)
+    if bytes(mv[:8]) == _PNG_SIGNATURE and len(mv) >= 24:
+        w, h = struct.unpack(">II", mv[16:24])
+        return int(w), int(h)
+    if not is_jpeg(mv):
+        return None
+
+    i = 2
+    n = len(mv)
+    while i + 4 <= n:
+        if mv[i] != 0xFF:
+            return None
+        marker = mv[i + 1]
+        if marker == 0xFF:
+            i += 1
+            continue
+        if marker == 0x01 or 0xD0 <= marker <= 0xD8:
+            i += 2
+            continue
+        seg_len = struct.unpack(">H", mv[i + 2:i + 4])[0]
+        if marker in _JPEG_SOF_MARKERS:
+            if i + 9 > n:
+                return None
+            h, w = struct.unpack(">HH", mv[i + 5:i + 9])
+            return int(w), int(h)
+        if marker == 0xDA:
+            return None
+        i += 2 + seg_len
+    return None
+
+
+def choose_reduced_decode(size: Tuple[int, int], target: int) -> Tuple[int, int]:
+    # Chọn hệ số thu nhỏ lớn nhất (8/4/2) mà cạnh dài sau decode vẫn >= target.
+    longest = max(size)
+    for factor, flag in _REDUCED_FLAGS:
+        if longest / factor >= target:
+            return flag, factor
+    return cv2.IMREAD_COLOR, 1
+
+
 def base64_to_numpy(b64_str: str) -> np.ndarray:
     if "," in b64_str:
         b64_str = b64_str.split(",", 1)[1]
@@ -0,0 +1,233 @@
+import bisect
+import contextvars
+import functools
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from . import profiling
+from .configs import METRICS_BUCKETS, METRICS_ENABLED
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+STAGE_LABELS = ("endpoint", "polygon_id", "device")
+
+# (endpoint, polygon_id, device) of the work running in this context. Set once
+# per request/stream/camera; threads and pools that continue that work run in
+# a copy of the caller's context (see bind_context).
+_LABELS: contextvars.ContextVar = contextvars.ContextVar("metrics_labels", default=("other", "default", "unknown"))
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class Counter:
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, labels: Tuple[str, ...] = (), value: float = 1.0) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + value
+
+    def collect(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            items = sorted(self._values.items())
+        for labels, value in items:
+            lines.append(f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}")
+        return lines
+
+
+class Histogram:
+    # Cumulative buckets are computed at export time; observe() only bumps one
+    # bucket counter, the sum and the count.
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = METRICS_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._values: Dict[Tuple[str, ...], list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, labels: Tuple[str, ...], value: float) -> None:
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._values.get(labels)
+            if series is None:
+                series = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def collect(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = sorted((labels, (list(s[0]), s[1], s[2])) for labels, s in self._values.items())
+        for labels, (counts, total, count) in items:
+            cumulative = 0
+            for bound, n in zip(self.buckets + (float("inf"),), counts):
+                cumulative += n
+                le = 'le="' + _format_value(bound) + '"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, labels, le)} {cumulative}")
+            label_text = _format_labels(self.labelnames, labels)
+            lines.append(f"{self.name}_sum{label_text} {_format_value(total)}")
+            lines.append(f"{self.name}_count{label_text} {count}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: List[object] = []
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        metric = Counter(name, documentation, labelnames)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = METRICS_BUCKETS) -> Histogram:
+        metric = Histogram(name, documentation, labelnames, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics:
+            lines.extend(metric.collect())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+STAGE_SECONDS = REGISTRY.histogram(
+    "parking_stage_seconds",
+    "Time spent in one pipeline stage (decode, inference, postprocess, occupancy, annotate, encode, write).",
+    ("stage",) + STAGE_LABELS,
+)
+FRAMES = REGISTRY.counter("parking_frames_total", "Frames analyzed (occupancy computed).", STAGE_LABELS)
+HTTP_SECONDS = REGISTRY.histogram(
+    "parking_http_request_duration_seconds",
+    "HTTP request duration until the last body byte was sent.",
+    ("endpoint", "method", "status"),
+)
+
+
+def enabled() -> bool:
+    return METRICS_ENABLED
+
+
+def bind(endpoint: str, polygon_id: Optional[str] = None, device: Optional[str] = None) -> None:
+    if METRICS_ENABLED:
+        _LABELS.set((endpoint, polygon_id or "default", device or "unknown"))
+
+
+def labels() -> Tuple[str, str, str]:
+    return _LABELS.get()
+
+
+def bind_context(fn: Callable) -> Callable:
+    # fn will run on another thread in a copy of the caller's context, so stage
+    # metrics recorded there keep the request's labels. The copy must not be
+    # entered by two threads at once: wrap once per thread/task.
+    return functools.partial(contextvars.copy_context().run, fn)
+
+
+class _StageTimer:
+    __slots__ = ("stage", "started", "span")
+
+    def __init__(self, stage: str):
+        self.stage = stage
+        # Inside a profiled request the stage is also a node of its timing tree.
+        self.span = profiling.span(stage)
+
+    def __enter__(self):
+        self.span.__enter__()
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        elapsed = time.perf_counter() - self.started
+        if METRICS_ENABLED:
+            STAGE_SECONDS.observe((self.stage,) + _LABELS.get(), elapsed)
+        self.span.__exit__(*exc)
+        return False
+
+
+class _NullTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+def timed(stage: str):
+    # with metrics.timed("inference"): ...  -- a shared no-op when disabled.
+    if not METRICS_ENABLED and not profiling.active():
+        return _NULL_TIMER
+    return _StageTimer(stage)
+
+
+def observe_stage(stage: str, seconds: float, **info) -> Optional[profiling.Span]:
+    # Returns the profile node of the stage when the request is profiled.
+    if METRICS_ENABLED:
+        STAGE_SECONDS.observe((stage,) + _LABELS.get(), seconds)
+    return profiling.add_span(stage, seconds * 1000, **info)
+
+
+def count_frames(n: int = 1) -> None:
+    if METRICS_ENABLED:
+        FRAMES.inc(_LABELS.get(), n)
+
+
+class MetricsMiddleware:
+    # Pure ASGI so streaming responses are not buffered; the route template
+    # (not the raw path) is used as the endpoint label to keep cardinality low.
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not enabled():
+            await self.app(scope, receive, send)
+            return
+        started = time.perf_counter()
+        status = {"code": 500}
+
+        async def _send(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, _send)
+        finally:
+            route = scope.get("route")
+            endpoint = getattr(route, "path", None) or "unmatched"
+            HTTP_SECONDS.observe((endpoint, scope.get("method", ""), str(status["code"])),
+                                 time.perf_counter() - started)
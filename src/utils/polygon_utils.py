@@ -1,6 +1,14 @@
 import json
+import os
+import threading
+import time
 from pathlib import Path
-from typing import List
+from typing import Dict, List, Tuple
+
+from .configs import POLYGON_STAT_INTERVAL
+
+_POLYGON_CACHE: Dict[str, dict] = {}
+_POLYGON_CACHE_LOCK = threading.Lock()
 
 
 def load_polygons(path: str) -> List[dict]:
@@ -15,4 +23,32 @@ def load_polygons(path: str) -> List[dict]:
                 poly["id"] = i + 1
         return data
     except (json.JSONDecodeError, TypeError) as exc:
-        raise ValueError(f"File polygon không hợp lệ: {exc}") from exc
\ No newline at end of file
+        raise ValueError(f"File polygon không hợp lệ: {exc}") from exc
+
+
+# Trả về (polygons, version) với version = mtime_ns của file. Danh sách được dùng
+# chung giữa các request nên không được sửa trực tiếp.
+def load_polygons_cached(path: str) -> Tuple[List[dict], int]:
+    key = os.path.abspath(path)
+    now = time.monotonic()
+    entry = _POLYGON_CACHE.get(key)
+    if entry is not None and now - entry["checked_at"] < POLYGON_STAT_INTERVAL:
+        return entry["polygons"], entry["version"]
+
+    try:
+        version = os.stat(key).st_mtime_ns
+    except FileNotFoundError:
+        _POLYGON_CACHE.pop(key, None)
+        raise FileNotFoundError(f"Không tìm thấy file polygon: {path}")
+
+    with _POLYGON_CACHE_LOCK:
+        entry = _POLYGON_CACHE.get(key)
+        if entry is None or entry["version"] != version:
+            entry = {"polygons": load_polygons(key), "version": version}
+            _POLYGON_CACHE[key] = entry
+        entry["checked_at"] = now
+        return entry["polygons"], entry["version"]
+
+
+def clear_polygon_cache() -> None:
+    _POLYGON_CACHE.clear()
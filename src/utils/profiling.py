@@ -0,0 +1,215 @@
+import contextvars
+import cProfile
+import json
+import logging
+import os
+import random
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+from .configs import PROFILE_CAPTURE, PROFILE_CAPTURE_RATE, PROFILE_DIR, PROFILE_ENABLED
+
+logger = logging.getLogger(__name__)
+
+_CAPTURES = ("cprofile", "pyinstrument")
+
+# Innermost open span of the profiled request running in this context. Like
+# the metrics labels it follows the work onto pool and pipeline threads.
+_CURRENT: contextvars.ContextVar = contextvars.ContextVar("profile_span", default=None)
+
+
+class Span:
+    # One node of the timing tree. Entering a span that already exists under
+    # the same parent adds to it, so a stream of many frames keeps one node per
+    # stage with a count instead of growing without bound.
+    __slots__ = ("name", "count", "ms", "max_ms", "info", "children")
+
+    def __init__(self, name: str):
+        self.name = name
+        self.count = 0
+        self.ms = 0.0
+        self.max_ms = 0.0
+        self.info: Dict[str, object] = {}
+        self.children: Dict[str, "Span"] = {}
+
+    def child(self, name: str) -> "Span":
+        return self.children.setdefault(name, Span(name))
+
+    def record(self, ms: float) -> None:
+        self.count += 1
+        self.ms += ms
+        self.max_ms = max(self.max_ms, ms)
+
+    def add(self, name: str, ms: float, **info) -> "Span":
+        span = self.child(name)
+        span.record(ms)
+        span.info.update(info)
+        return span
+
+    def to_dict(self) -> dict:
+        data = {"name": self.name, "ms": round(self.ms, 3)}
+        if self.count > 1:
+            data["count"] = self.count
+            data["mean_ms"] = round(self.ms / self.count, 3)
+            data["max_ms"] = round(self.max_ms, 3)
+        data.update(self.info)
+        if self.children:
+            data["children"] = [child.to_dict() for child in list(self.children.values())]
+        return data
+
+
+class _SpanTimer:
+    __slots__ = ("name", "info", "span", "token", "started")
+
+    def __init__(self, name: str, info: dict):
+        self.name = name
+        self.info = info
+
+    def __enter__(self):
+        self.span = _CURRENT.get().child(self.name)
+        self.token = _CURRENT.set(self.span)
+        self.started = time.perf_counter()
+        return self.span
+
+    def __exit__(self, *exc):
+        self.span.record((time.perf_counter() - self.started) * 1000)
+        self.span.info.update(self.info)
+        _CURRENT.reset(self.token)
+        return False
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return None
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+def active() -> bool:
+    return PROFILE_ENABLED and _CURRENT.get() is not None
+
+
+def span(name: str, **info):
+    # with profiling.span("serialize"): ...  -- no-op outside a profiled request.
+    if not active():
+        return _NULL_SPAN
+    return _SpanTimer(name, info)
+
+
+def add_span(name: str, ms: float, **info) -> Optional[Span]:
+    if not active():
+        return None
+    return _CURRENT.get().add(name, ms, **info)
+
+
+def add_model_speed(results) -> None:
+    # Model-internal stages as reported by the backend (ultralytics Results.speed,
+    # ms per image), summed over the images of the call.
+    parent = _CURRENT.get() if PROFILE_ENABLED else None
+    if parent is None or not results:
+        return
+    totals: Dict[str, float] = {}
+    for result in results:
+        for key, ms in (getattr(result, "speed", None) or {}).items():
+            if ms is not None:
+                totals[key] = totals.get(key, 0.0) + ms
+    for key, ms in totals.items():
+        parent.add(f"model.{key}", ms, images=len(results))
+
+
+class RequestProfile:
+    def __init__(self, endpoint: str, capture: Optional[str] = PROFILE_CAPTURE,
+                 capture_rate: float = PROFILE_CAPTURE_RATE, out_dir: str = PROFILE_DIR):
+        if capture is not None and capture not in _CAPTURES:
+            raise ValueError(f"capture must be one of {_CAPTURES}, got {capture}")
+        self.profile_id = uuid.uuid4().hex[:12]
+        self.endpoint = endpoint
+        self.out_dir = out_dir
+        self.capture_mode = capture if capture is not None and random.random() < capture_rate else None
+        self.capture_path: Optional[str] = None
+        self.root = Span("request")
+        self.started = time.perf_counter()
+        self.created_at = time.time()
+        self._finished: Optional[dict] = None
+        self._lock = threading.Lock()
+
+    def activate(self) -> None:
+        # Call from the request's own context before any work is submitted.
+        _CURRENT.set(self.root)
+
+    @contextmanager
+    def capture(self):
+        # Profiles the calling thread only; /detect runs its whole pipeline on
+        # one pool thread when profiled, so that thread is where it matters.
+        if self.capture_mode is None:
+            yield
+            return
+        os.makedirs(self.out_dir, exist_ok=True)
+        if self.capture_mode == "pyinstrument":
+            try:
+                from pyinstrument import Profiler
+            except ImportError:
+                logger.warning("pyinstrument is not installed, capturing with cProfile")
+                self.capture_mode = "cprofile"
+            else:
+                profiler = Profiler(async_mode="disabled")
+                profiler.start()
+                try:
+                    yield
+                finally:
+                    profiler.stop()
+                    self.capture_path = os.path.join(self.out_dir, f"{self.profile_id}.html")
+                    with open(self.capture_path, "w", encoding="utf-8") as f:
+                        f.write(profiler.output_html())
+                return
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            yield
+        finally:
+            profiler.disable()
+            self.capture_path = os.path.join(self.out_dir, f"{self.profile_id}.prof")
+            profiler.dump_stats(self.capture_path)
+
+    def to_dict(self) -> dict:
+        elapsed = (time.perf_counter() - self.started) * 1000
+        root = self.root.to_dict()
+        root["ms"] = round(elapsed, 3)
+        return {
+            "profile_id": self.profile_id,
+            "endpoint": self.endpoint,
+            "created_at": self.created_at,
+            "capture": self.capture_path,
+            "tree": root,
+        }
+
+    def finish(self) -> dict:
+        # Idempotent: streams may end from several places.
+        with self._lock:
+            if self._finished is not None:
+                return self._finished
+            self._finished = data = self.to_dict()
+        try:
+            os.makedirs(self.out_dir, exist_ok=True)
+            with open(os.path.join(self.out_dir, f"{self.profile_id}.json"), "w", encoding="utf-8") as f:
+                json.dump(data, f, indent=2)
+        except OSError as exc:
+            logger.warning(f"Cannot write profile {self.profile_id}: {exc}")
+        stages = ", ".join(f"{c['name']}={c['ms']:.1f}ms" for c in data["tree"].get("children", []))
+        logger.info(f"Profile {self.profile_id} ({self.endpoint}): {data['tree']['ms']:.1f}ms [{stages}]")
+        return data
+
+
+def start(endpoint: str) -> RequestProfile:
+    profile = RequestProfile(endpoint)
+    profile.activate()
+    return profile
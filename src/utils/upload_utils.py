@@ -0,0 +1,146 @@
+import asyncio
+import hashlib
+import os
+import threading
+import time
+from typing import AsyncIterator, Callable, Optional
+
+from .configs import (
+    UPLOAD_CHUNK_SIZE,
+    UPLOAD_HASH_ALGO,
+    UPLOAD_MAX_BYTES,
+    UPLOAD_QUOTA_STEP,
+)
+
+
+class UploadTooLargeError(ValueError):
+    def __init__(self, max_bytes: int):
+        super().__init__(f"Video vượt quá giới hạn {max_bytes} bytes")
+        self.max_bytes = max_bytes
+
+
+class UploadQuotaError(RuntimeError):
+    def __init__(self, nbytes: int):
+        super().__init__(f"Không đủ dung lượng để ghi {nbytes} bytes")
+        self.nbytes = nbytes
+
+
+class UploadProgress:
+    # Shared between the writer (request handler) and readers that tail the
+    # partially written file (video streams).
+
+    def __init__(self, path: str, expected_bytes: Optional[int] = None):
+        self.path = path
+        self.expected_bytes = expected_bytes
+        self.bytes_received = 0
+        self.digest: Optional[str] = None
+        self.error: Optional[str] = None
+        self.started_at = time.time()
+        self.finished_at: Optional[float] = None
+        self.updated_at = time.monotonic()
+        self._cond = threading.Condition()
+        self._done = False
+
+    @property
+    def done(self) -> bool:
+        return self._done
+
+    def advance(self, n: int) -> None:
+        with self._cond:
+            self.bytes_received += n
+            self.updated_at = time.monotonic()
+            self._cond.notify_all()
+
+    def finish(self, digest: Optional[str] = None, error: Optional[str] = None) -> None:
+        with self._cond:
+            self.digest = digest
+            self.error = error
+            self.finished_at = time.time()
+            self._done = True
+            self._cond.notify_all()
+
+    def wait_for_bytes(self, min_bytes: int, timeout: float) -> bool:
+        # True once min_bytes are on disk or the upload ended, False on timeout.
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while self.bytes_received < min_bytes and not self._done:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+            return True
+
+    def to_dict(self) -> dict:
+        elapsed = (self.finished_at or time.time()) - self.started_at
+        percent = None
+        if self.expected_bytes:
+            percent = round(min(100.0, self.bytes_received / self.expected_bytes * 100), 1)
+        return {
+            "bytes_received": self.bytes_received,
+            "expected_bytes": self.expected_bytes,
+            "percent": percent,
+            "done": self._done,
+            "error": self.error,
+            "digest": self.digest,
+            "elapsed_s": round(elapsed, 2),
+            "rate_mb_s": round(self.bytes_received / max(elapsed, 1e-6) / 1e6, 2),
+        }
+
+
+async def iter_upload_file(upload, chunk_size: int = UPLOAD_CHUNK_SIZE) -> AsyncIterator[bytes]:
+    # Chunks of a Starlette UploadFile without reading it into memory at once.
+    while True:
+        chunk = await upload.read(chunk_size)
+        if not chunk:
+            break
+        yield chunk
+
+
+async def save_stream_to_file(
+    chunks: AsyncIterator[bytes],
+    progress: UploadProgress,
+    max_bytes: int = UPLOAD_MAX_BYTES,
+    hash_algo: Optional[str] = UPLOAD_HASH_ALGO,
+    reserve: Optional[Callable[[int], bool]] = None,
+    reserve_step: int = UPLOAD_QUOTA_STEP,
+) -> UploadProgress:
+    # Writes chunks to progress.path as they arrive. Disk writes run off the
+    # event loop; readers can open the file while it is still growing.
+    # reserve(total) is asked, off the loop, whether the file may grow to total
+    # bytes: on the first chunk, then every reserve_step bytes.
+    loop = asyncio.get_running_loop()
+    hasher = hashlib.new(hash_algo) if hash_algo else None
+    next_check = 0
+    try:
+        with open(progress.path, "wb") as f:
+            async for chunk in chunks:
+                if not chunk:
+                    continue
+                total = progress.bytes_received + len(chunk)
+                if total > max_bytes:
+                    raise UploadTooLargeError(max_bytes)
+                if reserve is not None and total > next_check:
+                    if not await loop.run_in_executor(None, reserve, total):
+                        raise UploadQuotaError(total)
+                    next_check = total + reserve_step
+                await loop.run_in_executor(None, _write_chunk, f, chunk, hasher)
+                progress.advance(len(chunk))
+    except BaseException as exc:
+        progress.finish(error=str(exc) or type(exc).__name__)
+        raise
+    progress.finish(digest=hasher.hexdigest() if hasher else None)
+    return progress
+
+
+def _write_chunk(f, chunk: bytes, hasher) -> None:
+    f.write(chunk)
+    f.flush()
+    if hasher is not None:
+        hasher.update(chunk)
+
+
+def remove_file(path: str) -> None:
+    try:
+        os.unlink(path)
+    except OSError:
+        pass
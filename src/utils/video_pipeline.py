@@ -0,0 +1,234 @@
+import logging
+import threading
+import time
+from collections import deque
+from typing import Callable, Iterator, Optional
+
+import cv2
+import numpy as np
+
+from . import metrics
+from .async_utils import ThreadWaiters
+from .configs import STREAM_DROP_POLICY, STREAM_QUEUE_DEPTH
+from .draw_utils import annotate_frame
+from .video_utils import FrameSampler, open_upload, release_video
+
+logger = logging.getLogger(__name__)
+
+_END = object()
+_DROP_POLICIES = ("drop_oldest", "block")
+
+
+class StageQueue:
+    # Bounded queue between two pipeline stages. With drop_oldest=True a full
+    # queue discards its oldest item instead of blocking the producer.
+    # get_async() lets the event loop consume without a waiting thread.
+
+    def __init__(self, maxsize: int, drop_oldest: bool = False):
+        if maxsize < 1:
+            raise ValueError(f"maxsize must be >= 1, got {maxsize}")
+        self.maxsize = maxsize
+        self.drop_oldest = drop_oldest
+        self.dropped = 0
+        self._items: deque = deque()
+        self._cond = threading.Condition()
+        self._waiters = ThreadWaiters()
+        self._closed = False
+
+    def put(self, item) -> bool:
+        with self._cond:
+            # The end marker is always accepted so consumers are never left waiting.
+            while item is not _END and len(self._items) >= self.maxsize and not self._closed:
+                if self.drop_oldest:
+                    self._items.popleft()
+                    self.dropped += 1
+                    break
+                self._cond.wait(0.1)
+            if self._closed:
+                return False
+            self._items.append(item)
+            self._cond.notify_all()
+            self._waiters.wake()
+            return True
+
+    def get(self):
+        with self._cond:
+            while not self._items:
+                if self._closed:
+                    return _END
+                self._cond.wait(0.1)
+            item = self._items.popleft()
+            self._cond.notify_all()
+            return item
+
+    async def get_async(self):
+        while True:
+            with self._cond:
+                if self._items:
+                    item = self._items.popleft()
+                    self._cond.notify_all()
+                    return item
+                if self._closed:
+                    return _END
+                waiter = self._waiters.add()
+            await waiter
+
+    def close(self) -> None:
+        with self._cond:
+            self._closed = True
+            self._items.clear()
+            self._cond.notify_all()
+            self._waiters.wake()
+
+
+class MJPEGPipeline:
+    # decode -> infer -> annotate+encode run in their own threads connected by
+    # bounded queues; iterating the pipeline is the HTTP writer stage. The decode
+    # thread owns the capture and releases it on exit, so close() never frees it
+    # while a grab() (possibly waiting on a growing upload) is still running.
+
+    def __init__(
+        self,
+        video_path: str,
+        detector,
+        skip: int = 2,
+        jpeg_quality: int = 85,
+        sample_interval_ms: Optional[float] = None,
+        queue_depth: int = STREAM_QUEUE_DEPTH,
+        drop_policy: str = STREAM_DROP_POLICY,
+        infer_fn: Optional[Callable[[np.ndarray], dict]] = None,
+        tracker=None,
+        progress=None,
+    ):
+        if drop_policy not in _DROP_POLICIES:
+            raise ValueError(f"drop_policy must be one of {_DROP_POLICIES}, got {drop_policy}")
+        self._stop = threading.Event()
+        self.cap = open_upload(video_path, progress, stop=self._stop)
+        self.sampler = FrameSampler(self.cap, skip, sample_interval_ms)
+        self.jpeg_quality = jpeg_quality
+        self.infer_fn = infer_fn or detector.detect
+        self.tracker = tracker
+
+        self._decoded = StageQueue(queue_depth)
+        self._inferred = StageQueue(queue_depth)
+        self._encoded = StageQueue(queue_depth, drop_oldest=drop_policy == "drop_oldest")
+        self._started_at = time.perf_counter()
+        self.frames_inferred = 0
+        self.frames_sent = 0
+
+        self._threads = [
+            threading.Thread(target=metrics.bind_context(self._decode_stage), name="mjpeg-decode", daemon=True),
+            threading.Thread(target=metrics.bind_context(self._infer_stage), name="mjpeg-infer", daemon=True),
+            threading.Thread(target=metrics.bind_context(self._encode_stage), name="mjpeg-encode", daemon=True),
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def _decode_stage(self) -> None:
+        try:
+            for frame_index, frame in self.sampler:
+                if self._stop.is_set() or not self._decoded.put((frame_index, frame)):
+                    break
+        except Exception as exc:
+            logger.warning(f"[MJPEGPipeline] Lỗi decode: {exc}")
+        finally:
+            release_video(self.cap)
+            self._decoded.put(_END)
+
+    def _infer_stage(self) -> None:
+        try:
+            while True:
+                item = self._decoded.get()
+                if item is _END:
+                    break
+                frame_index, frame = item
+                try:
+                    if self.tracker is not None:
+                        result = self.tracker.update(frame, frame_index)
+                    else:
+                        result = self.infer_fn(frame)
+                    self.frames_inferred += 1
+                except Exception as exc:
+                    logger.warning(f"[MJPEGPipeline] Frame {frame_index} lỗi: {exc}")
+                    result = None
+                if not self._inferred.put((frame_index, frame, result)):
+                    break
+        finally:
+            self._inferred.put(_END)
+
+    def _encode_stage(self) -> None:
+        try:
+            while True:
+                item = self._inferred.get()
+                if item is _END:
+                    break
+                frame_index, frame, result = item
+                if result is not None:
+                    try:
+                        frame = annotate_frame(frame, result["spots"], result["summary"])
+                    except Exception as exc:
+                        logger.warning(f"[MJPEGPipeline] Frame {frame_index} lỗi annotate: {exc}")
+                with metrics.timed("encode"):
+                    ok, jpeg = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, self.jpeg_quality])
+                if not ok:
+                    continue
+                chunk = (
+                    b"--frame\r\n"
+                    b"Content-Type: image/jpeg\r\n\r\n"
+                    + jpeg.tobytes()
+                    + b"\r\n"
+                )
+                if not self._encoded.put(chunk):
+                    break
+        finally:
+            self._encoded.put(_END)
+
+    def next_chunk(self) -> Optional[bytes]:
+        chunk = self._encoded.get()
+        if chunk is _END:
+            return None
+        self.frames_sent += 1
+        return chunk
+
+    async def next_chunk_async(self) -> Optional[bytes]:
+        chunk = await self._encoded.get_async()
+        if chunk is _END:
+            return None
+        self.frames_sent += 1
+        return chunk
+
+    def __iter__(self) -> Iterator[bytes]:
+        try:
+            while True:
+                chunk = self.next_chunk()
+                if chunk is None:
+                    break
+                yield chunk
+        finally:
+            self.close()
+
+    def stats(self) -> dict:
+        elapsed = max(time.perf_counter() - self._started_at, 1e-6)
+        stats = {
+            "frames_decoded": self.sampler.frames_decoded,
+            "frames_inferred": self.frames_inferred,
+            "frames_sent": self.frames_sent,
+            "frames_dropped": self._encoded.dropped,
+            "fps": round(self.frames_sent / elapsed, 2),
+        }
+        if self.tracker is not None:
+            stats["temporal"] = self.tracker.stats()
+        return stats
+
+    def close(self) -> None:
+        if self._stop.is_set():
+            return
+        self._stop.set()
+        for q in (self._decoded, self._inferred, self._encoded):
+            q.close()
+        for thread in self._threads:
+            if thread is not threading.current_thread():
+                thread.join(timeout=5.0)
+        if self._threads[0].is_alive():
+            logger.warning("[MJPEGPipeline] Decode chưa dừng sau 5s, capture sẽ được giải phóng khi nó thoát")
+        logger.info(f"[MJPEGPipeline] Đóng pipeline: {self.stats()}")
@@ -1,13 +1,25 @@
 import logging
-from typing import Generator, Optional, Union
+import threading
+import time
+from typing import Generator, Iterator, Optional, Tuple, Union
 
 import cv2
 import numpy as np
 
+from .configs import (
+    UPLOAD_REOPEN_MIN_BYTES,
+    UPLOAD_STALL_TIMEOUT,
+    UPLOAD_STREAM_MIN_BYTES,
+    VIDEO_SEEK_MIN_FRAMES,
+)
+from . import metrics
 from .draw_utils import annotate_frame
 
 logger = logging.getLogger(__name__)
 
+# How often a capture waiting for upload bytes checks its stop event.
+_STOP_POLL_S = 0.2
+
 def open_video(source: Union[int, str]) -> cv2.VideoCapture:
     cap = cv2.VideoCapture(source)
     if not cap.isOpened():
@@ -15,6 +27,114 @@ def open_video(source: Union[int, str]) -> cv2.VideoCapture:
         raise ValueError(f"Không thể mở video: {source}")
     return cap
 
+class GrowingVideoCapture:
+    # cv2.VideoCapture over a file that is still being uploaded. Opening waits for
+    # the container header; hitting EOF before the upload ends waits for more
+    # bytes, re-opens the file and seeks back to the current frame. Setting the
+    # stop event ends a wait early: grab() then reports the end of the video.
+
+    def __init__(self, path: str, progress, min_bytes: int = UPLOAD_STREAM_MIN_BYTES,
+                 stop: Optional[threading.Event] = None):
+        self.path = path
+        self.progress = progress
+        self.stop = stop
+        self.position = 0
+        self._cap: Optional[cv2.VideoCapture] = None
+        self._bytes_at_open = 0
+        if not self._open(min_bytes):
+            raise ValueError(f"Đã dừng trước khi mở được video: {self.path}")
+
+    def _wait_for(self, min_bytes: int) -> bool:
+        # False when stopped, raises when the upload stalls.
+        deadline = time.monotonic() + UPLOAD_STALL_TIMEOUT
+        while True:
+            if self.stop is not None and self.stop.is_set():
+                return False
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise ValueError(f"Upload bị treo quá {UPLOAD_STALL_TIMEOUT}s: {self.path}")
+            timeout = remaining if self.stop is None else min(remaining, _STOP_POLL_S)
+            if self.progress.wait_for_bytes(min_bytes, timeout):
+                return True
+
+    def _open(self, min_bytes: int) -> bool:
+        if not self._wait_for(min_bytes):
+            return False
+        while True:
+            self._bytes_at_open = self.progress.bytes_received
+            cap = cv2.VideoCapture(self.path)
+            if cap.isOpened():
+                self._cap = cap
+                return True
+            cap.release()
+            if self.progress.done:
+                raise ValueError(f"Không thể mở video: {self.path}")
+            # e.g. an MP4 whose moov atom is written last: nothing to do until it lands.
+            if not self._wait_for(self._bytes_at_open + UPLOAD_REOPEN_MIN_BYTES):
+                return False
+
+    def _reopen(self) -> bool:
+        self._cap.release()
+        self._cap = None
+        if not self._open(0):
+            return False
+        if self.position:
+            self._cap.set(cv2.CAP_PROP_POS_FRAMES, self.position)
+        return True
+
+    def grab(self) -> bool:
+        while True:
+            if self._cap is None:
+                return False
+            if self._cap.grab():
+                self.position += 1
+                return True
+            grown = self.progress.bytes_received - self._bytes_at_open
+            if self.progress.done:
+                if grown <= 0:
+                    return False
+            elif not self._wait_for(self._bytes_at_open + UPLOAD_REOPEN_MIN_BYTES):
+                return False
+            logger.debug(f"[GrowingVideoCapture] Mở lại {self.path} tại frame {self.position}")
+            if not self._reopen():
+                return False
+
+    def retrieve(self):
+        if self._cap is None:
+            return False, None
+        return self._cap.retrieve()
+
+    def read(self):
+        if not self.grab():
+            return False, None
+        return self.retrieve()
+
+    def set(self, prop: int, value) -> bool:
+        if self._cap is None:
+            return False
+        ok = self._cap.set(prop, value)
+        if ok and prop == cv2.CAP_PROP_POS_FRAMES:
+            self.position = int(value)
+        return ok
+
+    def get(self, prop: int):
+        return self._cap.get(prop) if self._cap is not None else 0.0
+
+    def isOpened(self) -> bool:
+        return self._cap is not None and self._cap.isOpened()
+
+    def release(self) -> None:
+        if self._cap is not None:
+            self._cap.release()
+            self._cap = None
+
+
+def open_upload(path: str, progress=None, stop: Optional[threading.Event] = None):
+    # Video that may still be uploading: tail it while the upload is in progress.
+    if progress is None or progress.done:
+        return open_video(path)
+    return GrowingVideoCapture(path, progress, stop=stop)
+
 def read_frame(cap: cv2.VideoCapture) -> Optional[np.ndarray]:
     if cap is None:
         return None
@@ -25,32 +145,124 @@ def release_video(cap: Optional[cv2.VideoCapture]) -> None:
     if cap is not None:
         cap.release()
 
+class FrameSampler:
+    # Yields (frame_index, frame) for the frames that will be analyzed. Skipped
+    # frames are only grab()-ed (demuxed, not converted to BGR); with a time-based
+    # interval spanning many frames we seek instead of grabbing each one.
+
+    def __init__(
+        self,
+        cap: cv2.VideoCapture,
+        skip: int = 0,
+        sample_interval_ms: Optional[float] = None,
+        max_errors: int = 10,
+    ):
+        if skip < 0:
+            raise ValueError(f"skip must be non-negative, got {skip}")
+        self.cap = cap
+        self.max_errors = max_errors
+        self.fps = cap.get(cv2.CAP_PROP_FPS) or 0.0
+        self.step = skip + 1
+        if sample_interval_ms:
+            if self.fps > 0:
+                self.step = max(1, int(round(self.fps * sample_interval_ms / 1000.0)))
+            else:
+                logger.warning("[FrameSampler] Video không có FPS, dùng skip thay cho sample_interval_ms")
+        self.seek = self.step >= VIDEO_SEEK_MIN_FRAMES
+        self.frames_read = 0
+        self.frames_decoded = 0
+
+    def _advance(self, target: int) -> bool:
+        if self.seek and target - self.frames_read > 1:
+            if not self.cap.set(cv2.CAP_PROP_POS_FRAMES, target):
+                return False
+            self.frames_read = target
+            return True
+        while self.frames_read < target:
+            if not self.cap.grab():
+                return False
+            self.frames_read += 1
+        return True
+
+    def __iter__(self) -> Iterator[Tuple[int, np.ndarray]]:
+        consecutive_errors = 0
+        target = 0
+        while self.cap.isOpened():
+            try:
+                with metrics.timed("decode"):
+                    if not self._advance(target):
+                        break
+                    if not self.cap.grab():
+                        break
+                    self.frames_read += 1
+                    ok, frame = self.cap.retrieve()
+                if not ok or frame is None:
+                    raise ValueError("retrieve() failed")
+            except Exception as exc:
+                consecutive_errors += 1
+                logger.warning(
+                    f"[FrameSampler] Lỗi đọc frame {target}: {exc} "
+                    f"({consecutive_errors}/{self.max_errors})"
+                )
+                if consecutive_errors >= self.max_errors:
+                    logger.error("[FrameSampler] Quá nhiều lỗi, dừng đọc video")
+                    break
+                target = self.frames_read + self.step - 1
+                continue
+            consecutive_errors = 0
+            self.frames_decoded += 1
+            yield target, frame
+            target += self.step
+
+def result_generator(
+    video_path: str,
+    detector,
+    skip: int = 2,
+    sample_interval_ms: Optional[float] = None,
+    tracker=None,
+    progress=None,
+) -> Generator[Tuple[int, dict], None, None]:
+    # Detection results only: no annotation or JPEG encoding.
+    cap = open_upload(video_path, progress)
+
+    try:
+        for frame_index, frame in FrameSampler(cap, skip, sample_interval_ms):
+            try:
+                if tracker is not None:
+                    result = tracker.update(frame, frame_index)
+                else:
+                    result = detector.detect(frame)
+            except Exception as exc:
+                logger.warning(f"[result_generator] Frame {frame_index} lỗi: {exc}")
+                continue
+            yield frame_index, result
+    finally:
+        release_video(cap)
+
 def mjpeg_generator(
     video_path: str,
     detector,
     skip: int = 2,
     jpeg_quality: int = 85,
+    sample_interval_ms: Optional[float] = None,
+    tracker=None,
+    progress=None,
 ) -> Generator[bytes, None, None]:
-    cap         = open_video(video_path)
-    frame_index = 0
+    cap = open_upload(video_path, progress)
 
     try:
-        while cap.isOpened():
-            frame = read_frame(cap)
-            if frame is None:
-                break
-
-            frame_index += 1
-            if frame_index % (skip + 1) != 0:
-                continue
-
+        for frame_index, frame in FrameSampler(cap, skip, sample_interval_ms):
             try:
-                result = detector.detect(frame)
+                if tracker is not None:
+                    result = tracker.update(frame, frame_index)
+                else:
+                    result = detector.detect(frame)
                 frame  = annotate_frame(frame, result["spots"], result["summary"])
             except Exception as exc:
                 logger.warning(f"[mjpeg_generator] Frame {frame_index} lỗi: {exc}")
 
-            _, jpeg = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, jpeg_quality])
+            with metrics.timed("encode"):
+                _, jpeg = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, jpeg_quality])
             yield (
                 b"--frame\r\n"
                 b"Content-Type: image/jpeg\r\n\r\n"
@@ -0,0 +1,107 @@
+import asyncio
+import threading
+import time
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from src.domain.batch_scheduler import BatchScheduler
+from src.domain.inference_pool import InferencePool, PoolSaturatedError
+from src.routers import parking_detect
+
+
+class _Detector:
+    # Stand-in for ParkingDetector: inference blocks until `release` is set.
+    inference_key = ("stub",)
+
+    def __init__(self):
+        self.release = threading.Event()
+
+    def _predict(self, images):
+        self.release.wait(5.0)
+        return [None] * len(images)
+
+    def process_result(self, image, result, transform=None):
+        return {"summary": {}, "spots": []}
+
+    def detect(self, image, transform=None):
+        self.release.wait(5.0)
+        return {"summary": {}, "spots": []}
+
+
+@pytest.fixture
+def pool():
+    pool = InferencePool(max_workers=1, max_queue=1)
+    yield pool
+    pool.shutdown(wait=False)
+
+
+@pytest.fixture
+def scheduler(pool):
+    scheduler = BatchScheduler(max_batch_size=4, max_wait_ms=1, executor=pool)
+    scheduler.start()
+    yield scheduler
+    scheduler.stop()
+
+
+def _image():
+    return np.zeros((8, 8, 3), np.uint8)
+
+
+def _wait_idle(pool):
+    # Slots are freed by future callbacks, which may run just after result() returns.
+    deadline = time.monotonic() + 2.0
+    while pool.stats()["in_flight"] and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return pool.stats()["in_flight"]
+
+
+def test_pool_rejects_beyond_capacity(pool):
+    done = threading.Event()
+    futures = [pool.submit(done.wait, 5.0) for _ in range(pool.capacity)]
+    with pytest.raises(PoolSaturatedError) as info:
+        pool.submit(done.wait, 5.0)
+    assert info.value.retry_after >= 1
+    # Forced work (streams already admitted) is never rejected.
+    futures.append(pool.submit(done.wait, 5.0, force=True))
+    done.set()
+    assert all(f.result(timeout=5) for f in futures)
+    assert pool.stats()["rejected"] == 1
+
+
+def test_scheduler_admits_each_image(pool, scheduler):
+    detector = _Detector()
+    futures = scheduler.submit_many([(detector, _image())] * pool.capacity)
+    with pytest.raises(PoolSaturatedError):
+        scheduler.submit(detector, _image())
+    detector.release.set()
+    assert len([f.result(timeout=5) for f in futures]) == pool.capacity
+    # Slots are freed as each image's future completes.
+    assert _wait_idle(pool) == 0
+    assert scheduler.submit(detector, _image()).result(timeout=5) is not None
+
+
+def test_scheduler_submit_many_is_all_or_nothing(pool, scheduler):
+    detector = _Detector()
+    with pytest.raises(PoolSaturatedError):
+        scheduler.submit_many([(detector, _image())] * (pool.capacity + 1))
+    assert _wait_idle(pool) == 0
+    detector.release.set()
+
+
+def test_run_detection_maps_saturation_to_503(pool, scheduler):
+    detector = _Detector()
+    request = SimpleNamespace(app=SimpleNamespace(state=SimpleNamespace(
+        inference_pool=pool, batch_scheduler=scheduler)))
+    busy = scheduler.submit_many([(detector, _image())] * pool.capacity)
+
+    with pytest.raises(PoolSaturatedError) as info:
+        asyncio.run(parking_detect._run_detection(request, [(detector, _image(), None)]))
+    error = parking_detect._saturated(info.value)
+    assert error.status_code == 503
+    assert int(error.headers["Retry-After"]) >= 1
+
+    detector.release.set()
+    for future in busy:
+        future.result(timeout=5)
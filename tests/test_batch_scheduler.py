@@ -0,0 +1,91 @@
+import numpy as np
+import pytest
+
+from benchmarks.stub_model import StubBackend, StubClassifier
+from src.domain.batch_scheduler import BatchScheduler
+from src.domain.parking_detector import ENGINE_CLASSIFIER, ParkingDetector
+
+
+def _lot(count, y=20):
+    return [
+        {"id": i + 1, "points": [[20 + 60 * i, y], [70 + 60 * i, y], [70 + 60 * i, y + 80], [20 + 60 * i, y + 80]]}
+        for i in range(count)
+    ]
+
+
+class _Detector:
+    # Records the images its _predict saw.
+    def __init__(self, key):
+        self.inference_key = key
+        self.seen = []
+
+    def _predict(self, images):
+        self.seen.extend(id(image) for image in images)
+        return [None] * len(images)
+
+    def process_result(self, image, result, transform=None):
+        return id(image)
+
+
+@pytest.fixture
+def scheduler():
+    # A long wait so that everything submitted together lands in one round.
+    scheduler = BatchScheduler(max_batch_size=8, max_wait_ms=50)
+    scheduler.start()
+    yield scheduler
+    scheduler.stop()
+
+
+def test_classifier_lots_with_different_polygons_are_not_batched_together(scheduler):
+    model = StubClassifier()
+    lot_a = ParkingDetector(_lot(2), model=model, engine="classifier")
+    lot_b = ParkingDetector(_lot(3, y=150), model=model, engine="classifier")
+    assert lot_a.inference_key != lot_b.inference_key
+
+    # Empty asphalt with one car, under spot 3 of lot B.
+    image = np.full((360, 640, 3), (78, 80, 82), np.uint8)
+    image[150:230, 140:190] = 255
+    a, b = scheduler.submit_many([(lot_a, image), (lot_b, image)])
+    assert [s["status"] for s in a.result(timeout=5)["spots"]] == ["free", "free"]
+    assert [s["status"] for s in b.result(timeout=5)["spots"]] == ["free", "free", "occupied"]
+    assert scheduler.stats()["batches"] == 2
+
+
+def test_each_batch_only_holds_one_inference_key(scheduler):
+    first, second = _Detector(("a",)), _Detector(("b",))
+    images = [np.zeros((8, 8, 3), np.uint8) for _ in range(4)]
+    futures = scheduler.submit_many([(first, images[0]), (second, images[1]),
+                                     (first, images[2]), (second, images[3])])
+    assert [f.result(timeout=5) for f in futures] == [id(image) for image in images]
+    assert first.seen == [id(images[0]), id(images[2])]
+    assert second.seen == [id(images[1]), id(images[3])]
+
+
+# Every input _predict reads, per engine: changing one must change the key.
+_PREDICT_INPUTS = {
+    ("detector", False): {"image_size": 960, "general_confidence": 0.5},
+    ("detector", True): {"image_size": 960, "general_confidence": 0.5, "tile_size": 480,
+                         "tile_overlap": 0.3, "polygons": _lot(3)},
+    # Crops use the classifier's own input size and no detection threshold.
+    ("classifier", False): {"polygons": _lot(3)},
+}
+
+
+@pytest.mark.parametrize("engine, tiled", list(_PREDICT_INPUTS))
+def test_inference_key_covers_every_predict_input(engine, tiled):
+    def new_model():
+        return StubClassifier() if engine == ENGINE_CLASSIFIER else StubBackend(_lot(2), (640, 360))
+
+    model = new_model()
+
+    def detector(**overrides):
+        kwargs = dict(polygons=_lot(2), model=model, engine=engine, tiled=tiled)
+        kwargs.update(overrides)
+        return ParkingDetector(**kwargs)
+
+    base = detector()
+    assert detector(model=new_model()).inference_key != base.inference_key
+    for name, value in _PREDICT_INPUTS[engine, tiled].items():
+        assert detector(**{name: value}).inference_key != base.inference_key, name
+    # Thresholds only apply in process_result, per detector.
+    assert detector(car_confidence=0.9, free_confidence=0.9).inference_key == base.inference_key
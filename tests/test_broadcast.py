@@ -0,0 +1,143 @@
+import asyncio
+import queue
+import threading
+
+from src.utils.broadcast import BroadcastHub, FrameBroadcaster
+
+_END = object()
+
+
+class _Source:
+    # Chunks are pushed by the test; next_chunk() blocks like a real pipeline.
+    def __init__(self):
+        self.chunks: "queue.Queue" = queue.Queue()
+        self.closed = threading.Event()
+
+    def push(self, *chunks):
+        for chunk in chunks:
+            self.chunks.put(chunk)
+
+    def next_chunk(self):
+        while not self.closed.is_set():
+            try:
+                chunk = self.chunks.get(timeout=0.05)
+            except queue.Empty:
+                continue
+            return None if chunk is _END else chunk
+        return None
+
+    def close(self):
+        self.closed.set()
+
+
+def _wait_published(broadcaster, count):
+    for _ in range(200):
+        if broadcaster.published >= count:
+            return
+        threading.Event().wait(0.01)
+    raise AssertionError(f"only {broadcaster.published} of {count} chunks published")
+
+
+def test_last_subscriber_leaving_closes_the_source():
+    source = _Source()
+    broadcaster = FrameBroadcaster(lambda: source, ring_size=4)
+    first, second = broadcaster.subscribe(), broadcaster.subscribe()
+    source.push(b"a")
+    assert first.next_chunk() == b"a"
+
+    first.close()
+    assert not source.closed.wait(0.1)
+    second.close()
+    assert source.closed.wait(2.0)
+    assert broadcaster.finished
+    assert broadcaster.subscribe() is None
+
+
+def test_slow_subscriber_jumps_to_the_newest_frame():
+    source = _Source()
+    broadcaster = FrameBroadcaster(lambda: source, ring_size=2)
+    slow = broadcaster.subscribe()
+    source.push(b"1", b"2", b"3", b"4", b"5")
+    _wait_published(broadcaster, 5)
+
+    assert slow.next_chunk() == b"5"
+    assert slow.skipped == 4
+    source.push(_END)
+    assert slow.next_chunk() is None
+    slow.close()
+
+
+def test_async_viewers_are_woken_without_threads():
+    source = _Source()
+    broadcaster = FrameBroadcaster(lambda: source, ring_size=4)
+
+    async def main():
+        viewers = [broadcaster.subscribe() for _ in range(50)]
+        threads = threading.active_count()
+        reads = asyncio.gather(*(viewer.next_chunk_async() for viewer in viewers))
+        await asyncio.sleep(0.05)
+        assert threading.active_count() == threads
+        source.push(b"frame")
+        assert await asyncio.wait_for(reads, 2.0) == [b"frame"] * 50
+        return viewers
+
+    viewers = asyncio.run(main())
+    for viewer in viewers:
+        viewer.close()
+    assert source.closed.wait(2.0)
+
+
+def test_disconnect_while_waiting_cleans_up():
+    source = _Source()
+    broadcaster = FrameBroadcaster(lambda: source, ring_size=4)
+
+    async def main():
+        viewer = broadcaster.subscribe()
+        read = asyncio.ensure_future(viewer.next_chunk_async())
+        await asyncio.sleep(0.05)
+        # The client went away: the read is cancelled, then the viewer closed.
+        read.cancel()
+        viewer.close()
+        result, = await asyncio.gather(read, return_exceptions=True)
+        assert isinstance(result, asyncio.CancelledError)
+
+    asyncio.run(main())
+    assert broadcaster.subscribers == 0
+    assert source.closed.wait(2.0)
+
+
+def test_hub_shares_a_broadcaster_per_key_until_it_finishes():
+    hub = BroadcastHub(ring_size=4)
+    sources = []
+
+    def factory():
+        sources.append(_Source())
+        return FrameBroadcaster(lambda: sources[-1], ring_size=4)
+
+    first = hub.subscribe("session", factory)
+    second = hub.subscribe("session", factory)
+    assert first.broadcaster is second.broadcaster
+    assert hub.stats()["subscribers"] == 2
+
+    first.close()
+    second.close()
+    third = hub.subscribe("session", factory)
+    assert third.broadcaster is not first.broadcaster
+    assert len(sources) == 2
+    hub.stop()
+
+
+def test_hub_drops_a_broadcaster_when_its_stream_ends():
+    hub = BroadcastHub(ring_size=4)
+    source = _Source()
+    viewer = hub.subscribe("session", lambda: FrameBroadcaster(lambda: source, ring_size=4))
+    source.push(_END)
+    assert viewer.next_chunk() is None
+
+    # No stats() call: the producer's stop removes the entry by itself.
+    for _ in range(200):
+        if not hub._broadcasters:
+            break
+        threading.Event().wait(0.01)
+    assert not hub._broadcasters
+    viewer.close()
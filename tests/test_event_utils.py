@@ -0,0 +1,18 @@
+from src.utils.event_utils import FrameDeltaEncoder
+
+
+def _result(*statuses):
+    spots = [{"id": i + 1, "status": status} for i, status in enumerate(statuses)]
+    return {"summary": {"total_spots": len(spots)}, "spots": spots}
+
+
+def test_first_frame_has_every_spot_then_only_changes():
+    encoder = FrameDeltaEncoder()
+    first = encoder.encode(0, _result("free", "occupied"))
+    assert [s["id"] for s in first["spots"]] == [1, 2]
+
+    second = encoder.encode(5, _result("free", "occupied"))
+    assert second == {"frame_number": 5, "summary": {"total_spots": 2}, "spots": []}
+
+    third = encoder.encode(10, _result("occupied", "occupied"))
+    assert third["spots"] == [{"id": 1, "status": "occupied"}]
@@ -0,0 +1,79 @@
+import asyncio
+import os
+
+import pytest
+
+from src.domain.session_manager import StreamLimitError, VideoSessionManager
+from src.utils.upload_utils import UploadProgress, UploadQuotaError, save_stream_to_file
+
+
+def _upload(manager, directory, name, data, digest=None):
+    path = os.path.join(directory, name)
+    with open(path, "wb") as f:
+        f.write(data)
+    progress = UploadProgress(path, len(data))
+    progress.advance(len(data))
+    progress.finish(digest=digest)
+    session = manager.create(path, upload=progress)
+    manager.upload_finished(session)
+    return session
+
+
+def test_quota_evicts_least_recently_used_idle_sessions(tmp_path):
+    manager = VideoSessionManager(disk_quota=250)
+    old = _upload(manager, tmp_path, "old.mp4", b"a" * 100)
+    streaming = _upload(manager, tmp_path, "streaming.mp4", b"b" * 100)
+    manager.begin_stream(streaming)
+
+    assert manager.ensure_space(100)
+    assert manager.get(old.session_id) is None
+    assert not os.path.exists(old.path)
+    # A session with an active stream is never evicted.
+    assert not manager.ensure_space(200)
+    assert manager.get(streaming.session_id) is streaming
+    assert manager.stats()["evicted"] == 1
+
+
+def test_identical_uploads_share_one_file(tmp_path):
+    manager = VideoSessionManager()
+    first = _upload(manager, tmp_path, "first.mp4", b"x" * 64, digest="same")
+    second = _upload(manager, tmp_path, "second.mp4", b"x" * 64, digest="same")
+
+    assert second.path == first.path
+    assert not os.path.exists(os.path.join(tmp_path, "second.mp4"))
+    assert manager.disk_usage() == 64
+    assert manager.stats()["deduplicated"] == 1
+
+    manager.remove(first.session_id)
+    assert os.path.exists(second.path)
+    manager.remove(second.session_id)
+    assert not os.path.exists(second.path)
+
+
+def test_stream_limit(tmp_path):
+    manager = VideoSessionManager(max_streams=1)
+    manager.begin_stream()
+    with pytest.raises(StreamLimitError):
+        manager.begin_stream()
+    manager.end_stream()
+    manager.begin_stream()
+
+
+def test_upload_stops_when_quota_is_exhausted(tmp_path):
+    progress = UploadProgress(os.path.join(tmp_path, "upload.mp4"))
+    asked = []
+
+    def reserve(total):
+        asked.append(total)
+        return total <= 3000
+
+    async def chunks():
+        for _ in range(10):
+            yield b"\0" * 1000
+
+    with pytest.raises(UploadQuotaError):
+        asyncio.run(save_stream_to_file(chunks(), progress, reserve=reserve, reserve_step=2000))
+    # Checked on the first chunk, then every reserve_step bytes.
+    assert asked == [1000, 4000]
+    assert progress.done and progress.error
+    assert progress.bytes_received == 3000
@@ -0,0 +1,104 @@
+import numpy as np
+
+from src.domain.backends import BackendResult
+from src.domain.batch_scheduler import BatchScheduler
+from src.domain.parking_detector import ParkingDetector
+from src.domain.tiling import TilePlan, plan_tiles
+
+# Two 600 px tiles overlapping on x = 400..600.
+_PLAN = TilePlan((1000, 500), [(0, 0, 600, 500), (400, 0, 1000, 500)])
+
+
+def _boxes(*rows):
+    return np.array(rows, dtype=np.float32).reshape(-1, 6)
+
+
+def test_car_cut_by_tile_edge_merges_into_full_box():
+    # Tile 0 sees the car cut at its right edge (x 500..600 in frame pixels),
+    # tile 1 sees it whole (x 450..580); the full box wins despite lower confidence.
+    left = _boxes([500, 100, 600, 200, 0.9, 0])
+    right = _boxes([50, 100, 180, 200, 0.6, 0])
+    merged = _PLAN.merge([left, right])
+    assert merged.tolist() == [[450, 100, 580, 200, np.float32(0.6), 0]]
+
+
+def test_seam_duplicates_of_other_classes_are_kept():
+    left = _boxes([500, 100, 600, 200, 0.9, 0])
+    right = _boxes([50, 100, 180, 200, 0.6, 1])
+    assert len(_PLAN.merge([left, right])) == 2
+
+
+def test_boxes_from_the_same_tile_are_left_to_the_model_nms():
+    left = _boxes([420, 100, 520, 200, 0.9, 0], [425, 105, 520, 200, 0.8, 0])
+    assert len(_PLAN.merge([left, _boxes()])) == 2
+
+
+def test_boxes_outside_the_overlap_are_untouched():
+    left = _boxes([10, 10, 60, 60, 0.9, 0])
+    right = _boxes([500, 300, 560, 360, 0.9, 0])
+    merged = _PLAN.merge([left, right])
+    assert sorted(merged[:, 0].tolist()) == [10, 900]
+
+
+def test_plan_covers_every_polygon():
+    polygons = [
+        {"id": 1, "points": [[100, 900], [300, 900], [300, 1000], [100, 1000]]},
+        {"id": 2, "points": [[3500, 1800], [3700, 1800], [3700, 2000], [3500, 2000]]},
+    ]
+    plan = plan_tiles(polygons, (3840, 2160), 640, overlap=0.2, margin=0)
+    assert 0 < plan.coverage < 1
+    for polygon in polygons:
+        pts = np.asarray(polygon["points"])
+        assert any(
+            x0 <= pts[:, 0].min() and pts[:, 0].max() <= x1 and y0 <= pts[:, 1].min() and pts[:, 1].max() <= y1
+            for x0, y0, x1, y1 in plan.tiles.tolist()
+        )
+
+
+def test_plan_without_spots_in_frame_is_one_full_frame_tile():
+    plan = plan_tiles([{"id": 1, "points": []}], (1920, 1080), 640)
+    assert plan.tiles.tolist() == [[0, 0, 1920, 1080]]
+
+
+class _BrightCars:
+    # Reports the white pixels of each image (tile) as one car box, so a car is
+    # only found when a tile actually covers it.
+    name = "stub"
+    precision = "fp32"
+    thread_safe = True
+    agreement = None
+    names = {0: "car", 1: "free"}
+
+    def predict(self, images, imgsz, conf, iou):
+        results = []
+        for image in [images] if isinstance(images, np.ndarray) else images:
+            ys, xs = np.nonzero(image[:, :, 0] > 200)
+            rows = [[xs.min(), ys.min(), xs.max() + 1, ys.max() + 1, 0.9, 0]] if len(xs) else []
+            results.append(BackendResult(_boxes(*rows), {}))
+        return results
+
+
+def _spot(x, y):
+    return [[x, y], [x + 80, y], [x + 80, y + 80], [x, y + 80]]
+
+
+def test_tiled_lots_with_different_polygons_are_not_batched_together():
+    # Both lots span the 1920x1080 frame, on opposite diagonals.
+    model = _BrightCars()
+    lot_a = ParkingDetector([{"id": 1, "points": _spot(40, 40)}, {"id": 2, "points": _spot(1800, 980)}],
+                            model=model, tiled=True, tile_size=320)
+    lot_b = ParkingDetector([{"id": 1, "points": _spot(1800, 40)}, {"id": 2, "points": _spot(40, 980)}],
+                            model=model, tiled=True, tile_size=320)
+    assert lot_a.inference_key != lot_b.inference_key
+
+    # One car, in spot 1 of lot B: outside every tile of lot A.
+    image = np.zeros((1080, 1920, 3), np.uint8)
+    image[50:110, 1810:1870] = 255
+    scheduler = BatchScheduler(max_batch_size=8, max_wait_ms=50)
+    scheduler.start()
+    try:
+        a, b = scheduler.submit_many([(lot_a, image), (lot_b, image)])
+        assert [s["status"] for s in b.result(timeout=5)["spots"]][0] == "occupied"
+        assert "occupied" not in [s["status"] for s in a.result(timeout=5)["spots"]]
+    finally:
+        scheduler.stop()